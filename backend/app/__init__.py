@@ -3,13 +3,16 @@ from flask_cors import CORS
 
 from .config import get_config
 from .firebase_client import init_firebase_app
+from .http_middleware import init_http_middleware
 from .routes import register_routes
+from .utils.json_provider import FastJSONProvider
 from flask import Flask
 from flask_cors import CORS
 
 def create_app(config_name: str | None = None) -> Flask:
     """Application factory so tests and CLI share consistent setup."""
     app = Flask(__name__)
+    app.json = FastJSONProvider(app)
 
     # get_config currently returns a class (DevelopmentConfig / ProductionConfig)
     config_cls = get_config(config_name)
@@ -20,5 +23,6 @@ def create_app(config_name: str | None = None) -> Flask:
     CORS(app, resources={r"/api/*": {"origins": "*"}})
     init_firebase_app(app)
     register_routes(app)
+    init_http_middleware(app)
 
     return app
@@ -0,0 +1,120 @@
+from __future__ import annotations
+
+import gzip
+import os
+from dataclasses import dataclass
+
+from flask import Flask, Response, g, request
+
+from app.services.catalog_service import get_catalog
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional, gzip only otherwise
+    brotli = None
+
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "1024"))  # smaller bodies go out as-is
+COMPRESS_LEVEL = int(os.getenv("COMPRESS_LEVEL", "6"))  # gzip level; brotli uses quality 4
+COMPRESSIBLE_MIMETYPES = {"application/json", "text/html", "text/plain", "text/csv"}
+
+
+@dataclass(frozen=True, slots=True)
+class CachePolicy:
+    cache_control: str
+    catalog_etag: bool = False  # body depends only on the catalog: validate with its version
+    body_etag: bool = False  # hash the body so repeat fetches can get 304
+
+
+# Keyed by endpoint, falling back to blueprint name; GET/HEAD 200/304 responses only.
+CACHE_POLICIES: dict[str, CachePolicy] = {
+    # Track metadata only changes when the catalog is republished
+    "tracks": CachePolicy("public, max-age=3600, stale-while-revalidate=86400", catalog_etag=True),
+    # Enrichment embeds Spotify/iTunes lookups that change independently of the catalog
+    "tracks.get_enriched_track": CachePolicy("private, no-cache", body_etag=True),
+    "spotify": CachePolicy("private, no-cache", body_etag=True),
+    # The library route sets its own ETag; make clients revalidate every time
+    "library": CachePolicy("private, no-cache"),
+    # Every search is logged as a search event, so none may be answered from a cache
+    "search": CachePolicy("no-store"),
+}
+
+
+def init_http_middleware(app: Flask) -> None:
+    """Conditional GETs before the view runs; cache headers and compression after."""
+    app.before_request(_answer_conditional_request)
+    app.after_request(_finalize_response)
+
+
+def _policy() -> CachePolicy | None:
+    if request.method not in ("GET", "HEAD"):
+        return None
+    return CACHE_POLICIES.get(request.endpoint or "") or CACHE_POLICIES.get(request.blueprint or "")
+
+
+def _catalog_etag() -> str | None:
+    catalog = get_catalog()
+    return f"catalog-{catalog.version}" if catalog is not None else None
+
+
+def _answer_conditional_request() -> Response | None:
+    """Answer 304 from the catalog version alone, before any service is built."""
+    policy = _policy()
+    if policy is None or not policy.catalog_etag:
+        return None
+    etag = _catalog_etag()
+    g.catalog_etag = etag
+    if etag is not None and request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+        response.set_etag(etag, weak=True)
+        return response
+    return None
+
+
+def _finalize_response(response: Response) -> Response:
+    policy = _policy()
+    if policy is not None and response.status_code in (200, 304):
+        response.headers.setdefault("Cache-Control", policy.cache_control)
+        etag = g.get("catalog_etag")
+        if response.status_code == 200 and policy.catalog_etag and etag is not None:
+            response.set_etag(etag, weak=True)
+        elif response.status_code == 200 and policy.body_etag and not response.is_streamed:
+            response.add_etag()
+            response.make_conditional(request)
+    return _compress(response)
+
+
+def _compress(response: Response) -> Response:
+    """
+    Brotli or gzip per Accept-Encoding for buffered text bodies above
+    COMPRESS_MIN_BYTES. Streamed responses (SSE, NDJSON exports) are left
+    alone so each event still reaches the client as soon as it's written.
+    """
+    if (
+        response.status_code < 200
+        or response.status_code in (204, 206, 304)
+        or response.is_streamed
+        or response.direct_passthrough
+        or "Content-Encoding" in response.headers
+        or response.mimetype not in COMPRESSIBLE_MIMETYPES
+    ):
+        return response
+    body = response.get_data()
+    if len(body) < COMPRESS_MIN_BYTES:
+        return response
+
+    response.vary.add("Accept-Encoding")
+    accepted = request.accept_encodings
+    if brotli is not None and accepted["br"]:
+        encoding, compressed = "br", brotli.compress(body, quality=4)
+    elif accepted["gzip"]:
+        encoding, compressed = "gzip", gzip.compress(body, compresslevel=COMPRESS_LEVEL, mtime=0)
+    else:
+        return response
+
+    response.set_data(compressed)
+    response.headers["Content-Encoding"] = encoding
+    # A strong validator names exact bytes; the encoded body is a different representation
+    etag, weak = response.get_etag()
+    if etag is not None and not weak:
+        response.set_etag(etag, weak=True)
+    return response
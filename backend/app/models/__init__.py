@@ -1,9 +1,10 @@
-from .personality import PersonalityMetrics, PersonalityResult
+from .personality import LibraryAggregates, PersonalityMetrics, PersonalityResult
 from .session import MatchSession
 from .track import Track, NUMERIC_FEATURES
 from .user import UserProfile
 
 __all__ = [
+    "LibraryAggregates",
     "MatchSession",
     "PersonalityMetrics",
     "PersonalityResult",
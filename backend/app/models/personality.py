@@ -1,8 +1,13 @@
 from __future__ import annotations
 
-from dataclasses import dataclass, asdict
+import hashlib
+import math
+from collections import Counter
+from dataclasses import dataclass, asdict, field
 from typing import Any, Mapping, List
 
+from .track import Track
+
 
 @dataclass(slots=True)
 class PersonalityMetrics:
@@ -24,6 +29,166 @@ class PersonalityMetrics:
         return cls(**payload)
 
 
+AGGREGATE_TOP_TRACKS = 24  # most popular library tracks kept with the aggregates
+REPRESENTATIVE_TRACKS = 6
+
+
+@dataclass(slots=True)
+class LibraryAggregates:
+    """
+    Running sums behind PersonalityMetrics, folded in one track at a time so
+    a library can be summarized without holding it in memory.
+
+    Persisted at ``users/{u}/analytics/library_aggregates`` and kept in step
+    with the library by ``add`` / ``remove``. ``top_tracks`` holds the
+    ``AGGREGATE_TOP_TRACKS`` most popular tracks as ``(popularity, track_id)``,
+    best first. ``top_cutoff`` bounds the popularity of every library track
+    left out of that list, so entries at or above it are the true top;
+    after top tracks are removed, later additions can land below it and
+    the exact prefix shrinks until a rebuild. ``track_id_hash`` XORs a 64-bit hash of every
+    track id, so it is independent of insertion order and survives rebuilds.
+    A ``stale`` doc is only a version marker, left by a library write that
+    could not update the sums; it is rebuilt on the next read.
+    """
+
+    track_count: int = 0
+    energy_sum: float = 0.0
+    energy_count: int = 0
+    valence_sum: float = 0.0
+    valence_count: int = 0
+    popularity_sum: float = 0.0
+    popularity_count: int = 0
+    genre_counts: Counter = field(default_factory=Counter)
+    top_tracks: list[tuple[float, str]] = field(default_factory=list)
+    track_id_hash: int = 0
+    top_cutoff: float = 0.0
+    version: int = 0
+    stale: bool = False
+
+    def add(self, track: Track) -> None:
+        self._fold(track, 1)
+        self.track_id_hash ^= _track_id_hash(track.track_id)
+        entry = (float(track.popularity_norm or 0.0), track.track_id)
+        if len(self.top_tracks) < AGGREGATE_TOP_TRACKS or entry[0] > self.top_tracks[-1][0]:
+            self.top_tracks.append(entry)
+            self.top_tracks.sort(key=lambda e: e[0], reverse=True)
+            for evicted, _ in self.top_tracks[AGGREGATE_TOP_TRACKS:]:
+                self.top_cutoff = max(self.top_cutoff, evicted)
+            del self.top_tracks[AGGREGATE_TOP_TRACKS:]
+        else:
+            self.top_cutoff = max(self.top_cutoff, entry[0])
+
+    def remove(self, track: Track) -> None:
+        self._fold(track, -1)
+        self.track_id_hash ^= _track_id_hash(track.track_id)
+        self.top_tracks = [e for e in self.top_tracks if e[1] != track.track_id]
+
+    def _fold(self, track: Track, sign: int) -> None:
+        self.track_count += sign
+        if track.energy is not None:
+            self.energy_sum += sign * float(track.energy)
+            self.energy_count += sign
+        if track.valence is not None:
+            self.valence_sum += sign * float(track.valence)
+            self.valence_count += sign
+        if track.popularity_norm is not None:
+            self.popularity_sum += sign * float(track.popularity_norm)
+            self.popularity_count += sign
+        genre = track.track_genre_group or track.track_genre
+        if genre:
+            self.genre_counts[genre] += sign
+            if self.genre_counts[genre] <= 0:
+                del self.genre_counts[genre]
+
+    @property
+    def exact_top_tracks(self) -> int:
+        """How many leading ``top_tracks`` are known to be the library's most popular."""
+        return sum(1 for popularity, _ in self.top_tracks if popularity >= self.top_cutoff)
+
+    @property
+    def needs_rebuild(self) -> bool:
+        """True for a stale marker, or when fewer top tracks are exact than a personality card shows."""
+        return self.stale or self.exact_top_tracks < min(self.track_count, REPRESENTATIVE_TRACKS)
+
+    def top_track_ids(self, limit: int = REPRESENTATIVE_TRACKS) -> list[str]:
+        return [track_id for _, track_id in self.top_tracks[:limit]]
+
+    @property
+    def fingerprint(self) -> str:
+        """Identifies the library's contents: same tracks, same fingerprint."""
+        return f"{self.track_count}:{self.track_id_hash:016x}"
+
+    def to_metrics(self) -> PersonalityMetrics:
+        def _avg(total: float, count: int, default: float = 0.5) -> float:
+            return total / count if count else default
+
+        counts = +self.genre_counts  # drop zero/negative counts
+        if counts:
+            total = sum(counts.values())
+            entropy = 0.0
+            for c in counts.values():
+                p = c / total
+                entropy -= p * math.log(p + 1e-12)
+            max_entropy = math.log(len(counts))
+            diversity = entropy / max_entropy if max_entropy > 0 else 0.0
+            top_genres = [g for g, _ in counts.most_common(3)]
+        else:
+            diversity = 0.0
+            top_genres = []
+
+        return PersonalityMetrics(
+            avg_energy=_avg(self.energy_sum, self.energy_count),
+            avg_valence=_avg(self.valence_sum, self.valence_count),
+            avg_popularity_norm=_avg(self.popularity_sum, self.popularity_count),
+            genre_diversity=diversity,
+            top_genres=top_genres,
+        )
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "track_count": self.track_count,
+            "energy_sum": self.energy_sum,
+            "energy_count": self.energy_count,
+            "valence_sum": self.valence_sum,
+            "valence_count": self.valence_count,
+            "popularity_sum": self.popularity_sum,
+            "popularity_count": self.popularity_count,
+            "genre_counts": dict(self.genre_counts),
+            "top_tracks": [{"track_id": tid, "popularity_norm": pop} for pop, tid in self.top_tracks],
+            "track_id_hash": f"{self.track_id_hash:016x}",  # hex: Firestore integers are signed 64-bit
+            "top_cutoff": self.top_cutoff,
+            "version": self.version,
+            "stale": self.stale,
+        }
+
+    @classmethod
+    def from_mapping(cls, data: Mapping[str, Any]) -> "LibraryAggregates":
+        return cls(
+            track_count=int(data.get("track_count") or 0),
+            energy_sum=float(data.get("energy_sum") or 0.0),
+            energy_count=int(data.get("energy_count") or 0),
+            valence_sum=float(data.get("valence_sum") or 0.0),
+            valence_count=int(data.get("valence_count") or 0),
+            popularity_sum=float(data.get("popularity_sum") or 0.0),
+            popularity_count=int(data.get("popularity_count") or 0),
+            genre_counts=Counter({k: int(v) for k, v in (data.get("genre_counts") or {}).items()}),
+            top_tracks=[
+                (float(e.get("popularity_norm") or 0.0), e["track_id"])
+                for e in data.get("top_tracks") or []
+                if e.get("track_id")
+            ],
+            track_id_hash=int(data.get("track_id_hash") or "0", 16),
+            # Docs written before the cutoff was tracked can't vouch for their list: rebuild once
+            top_cutoff=float(data.get("top_cutoff", 1.0)),
+            version=int(data.get("version") or 0),
+            stale=bool(data.get("stale")),
+        )
+
+
+def _track_id_hash(track_id: str) -> int:
+    return int.from_bytes(hashlib.blake2b(track_id.encode("utf-8"), digest_size=8).digest(), "big")
+
+
 @dataclass(slots=True)
 class PersonalityResult:
     username: str
@@ -3,7 +3,10 @@ from __future__ import annotations
 from dataclasses import dataclass, field, fields
 from typing import Any, Mapping
 
+from ..utils.serialization import compiled_to_dict
 
+
+@compiled_to_dict
 @dataclass(slots=True)
 class MatchSession:
     session_id: str
@@ -21,23 +24,13 @@ class MatchSession:
 
     # Refined phase
     refined_track_ids: list[str] = field(default_factory=list)
+    refinement_status: str | None = None  # None | "pending" | "ready" | "failed" (background refinement)
 
     # Index pointer
     current_index: int = 0
 
-    def to_dict(self) -> dict[str, Any]:
-        return {
-            "session_id": self.session_id,
-            "username": self.username,
-            "created_at": self.created_at,
-            "updated_at": self.updated_at,
-            "phase": self.phase,
-            "status": self.status,
-            "seed_track_ids": list(self.seed_track_ids),
-            "seed_swipes_completed": self.seed_swipes_completed,
-            "refined_track_ids": list(self.refined_track_ids),
-            "current_index": self.current_index,
-        }
+    # Bumped on every write; detects concurrent writers (see SessionCache)
+    version: int = 0
 
     @classmethod
     def from_mapping(cls, data: Mapping[str, Any]) -> "MatchSession":
@@ -1,8 +1,10 @@
 from __future__ import annotations
 
-from dataclasses import dataclass, field, asdict
+from dataclasses import dataclass, field
 from typing import Any, Mapping
 
+from ..utils.serialization import compiled_to_dict
+
 
 NUMERIC_FEATURES = [
     "danceability",
@@ -16,6 +18,7 @@ NUMERIC_FEATURES = [
 ]
 
 
+@compiled_to_dict
 @dataclass(slots=True)
 class Track:
     track_id: str
@@ -43,11 +46,6 @@ class Track:
     track_genre_group: str | None = None
     track_name_lowercase: str | None = None
 
-    def to_dict(self) -> dict[str, Any]:
-        payload = asdict(self)
-        payload["artists"] = list(self.artists)
-        return payload
-
     @classmethod
     def from_mapping(cls, track_id: str, data: Mapping[str, Any]) -> "Track":
         payload = dict(data)
@@ -1,9 +1,10 @@
 from __future__ import annotations
 
-from dataclasses import dataclass, field, asdict, fields
+from dataclasses import dataclass, field, fields
 from datetime import datetime
 from typing import Any, Mapping
 
+from ..utils.serialization import compiled_to_dict
 from .track import NUMERIC_FEATURES
 
 
@@ -11,6 +12,7 @@ def _default_feature_map() -> dict[str, float]:
     return {feature: 0.0 for feature in NUMERIC_FEATURES}
 
 
+@compiled_to_dict
 @dataclass(slots=True)
 class UserProfile:
     username: str
@@ -23,14 +25,6 @@ class UserProfile:
     feature_sums_liked: dict[str, float] = field(default_factory=_default_feature_map)
     feature_sums_disliked: dict[str, float] = field(default_factory=_default_feature_map)
 
-    def to_dict(self) -> dict[str, Any]:
-        payload = asdict(self)
-        payload["liked_genres"] = dict(self.liked_genres)
-        payload["disliked_genres"] = dict(self.disliked_genres)
-        payload["feature_sums_liked"] = dict(self.feature_sums_liked)
-        payload["feature_sums_disliked"] = dict(self.feature_sums_disliked)
-        return payload
-
     @classmethod
     def from_mapping(cls, username: str, data: Mapping[str, Any]) -> "UserProfile":
         payload = dict(data)
@@ -4,9 +4,20 @@ from datetime import datetime, timezone
 
 from flask import Blueprint, jsonify
 
+from app.services.catalog_service import get_catalog
+from app.services.llm_governor import llm_governor
+
 health_bp = Blueprint("health", __name__)
 
 
 @health_bp.get("/health")
 def health_check():
-    return jsonify({"status": "ok", "timestamp": datetime.now(timezone.utc).isoformat()})
+    catalog = get_catalog()
+    return jsonify(
+        {
+            "status": "ok",
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "catalogVersion": catalog.version if catalog is not None else None,
+            "llm": llm_governor.stats(),
+        }
+    )
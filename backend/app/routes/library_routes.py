@@ -1,30 +1,87 @@
 from __future__ import annotations
 
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, Response, jsonify, request
 
-from app.services.library_service import LibraryService
+from app.models import Track
+from app.services.library_service import MAX_LIBRARY_PAGE, LibraryService
+from app.utils.serialization import parse_fields
 
 library_bp = Blueprint("library", __name__, url_prefix="/api")
 
 @library_bp.get("/library")
 def get_library():
     """
-    GET /api/library?username=mo
+    GET /api/library?username=mo[&limit=50&after=<nextCursor>][&fields=track_id,track_name]
 
-    Returns the user's library as Track[].
+    Returns the user's library as Track[], newest first. With ``limit`` one
+    page is returned plus ``nextCursor`` (null on the last page). Responses
+    carry a weak ETag; send it back as If-None-Match to get 304 while the
+    library is unchanged. ``fields`` limits each track to those keys.
     """
     username = (request.args.get("username") or "").strip()
     if not username:
         return jsonify({"error": "username is required"}), 400
 
+    limit_raw = (request.args.get("limit") or "").strip()
+    try:
+        limit = int(limit_raw) if limit_raw else None
+    except ValueError:
+        return jsonify({"error": "limit must be an integer"}), 400
+    if limit is not None:
+        limit = max(1, min(limit, MAX_LIBRARY_PAGE))
+    after = (request.args.get("after") or "").strip() or None
+    try:
+        fields = parse_fields(request.args.get("fields"), Track.FIELD_NAMES)
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 400
+
     # keep consistent with /users/login behavior (lowercase)
     username_norm = username.lower()
 
     service = LibraryService()
-    tracks = service.get_library_tracks(username_norm)
+    etag = service.library_etag(username_norm)
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+        response.set_etag(etag, weak=True)
+        return response
+
+    if limit is None:
+        tracks, next_cursor = service.get_library_tracks(username_norm), None
+    else:
+        try:
+            tracks, next_cursor = service.get_library_page(username_norm, limit=limit, after=after)
+        except ValueError as exc:
+            return jsonify({"error": str(exc)}), 400
+
+    payload = {"username": username_norm, "tracks": [t.to_dict(fields) for t in tracks]}
+    if limit is not None:
+        payload["nextCursor"] = next_cursor
+    response = jsonify(payload)
+    response.set_etag(etag, weak=True)
+    return response, 200
+
+@library_bp.get("/library/stats")
+def get_library_stats():
+    """
+    GET /api/library/stats?username=mo
 
-    # Assuming Track has a .to_dict() method; if not, we can adapt later.
-    return jsonify({"username": username_norm, "tracks": [t.to_dict() for t in tracks]}), 200
+    Live library stats from the incrementally maintained aggregates doc.
+    """
+    username = (request.args.get("username") or "").strip()
+    if not username:
+        return jsonify({"error": "username is required"}), 400
+
+    username_norm = username.lower()
+    aggregates = LibraryService().get_library_aggregates(username_norm)
+    return jsonify(
+        {
+            "username": username_norm,
+            "trackCount": aggregates.track_count,
+            "genreCounts": dict(aggregates.genre_counts),
+            "metrics": aggregates.to_metrics().to_dict(),
+            "topTrackIds": aggregates.top_track_ids(),
+        }
+    ), 200
 
 @library_bp.post("/library/add")
 def add_to_library():
@@ -61,6 +118,48 @@ def add_to_library():
     ), 200
 
 
+@library_bp.post("/library/bulk")
+def bulk_update_library():
+    """
+    POST /api/library/bulk
+    { "username": "mo", "add": ["id1", ...], "remove": ["id2", ...], "source": "import" }
+
+    Adds and removes many tracks in one request and reports a status per id.
+    """
+    data = request.get_json(silent=True) or {}
+
+    username = (data.get("username") or "").strip()
+    add_ids = data.get("add") or []
+    remove_ids = data.get("remove") or []
+    source = (data.get("source") or "manual").strip() or "manual"
+
+    if not username:
+        return jsonify({"error": "username is required"}), 400
+    for name, ids in (("add", add_ids), ("remove", remove_ids)):
+        if not isinstance(ids, list) or not all(isinstance(tid, str) and tid.strip() for tid in ids):
+            return jsonify({"error": f"{name} must be a list of track ids"}), 400
+
+    username_norm = username.lower()
+    try:
+        results = LibraryService().bulk_update_library(
+            username=username_norm,
+            add_ids=[tid.strip() for tid in add_ids],
+            remove_ids=[tid.strip() for tid in remove_ids],
+            source=source,
+        )
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 400
+
+    return jsonify(
+        {
+            "username": username_norm,
+            "results": results,
+            "added": sum(r["status"] == "added" for r in results),
+            "removed": sum(r["status"] == "removed" for r in results),
+        }
+    ), 200
+
+
 @library_bp.delete("/library/<track_id>")
 def remove_from_library(track_id: str):
     """
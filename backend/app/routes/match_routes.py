@@ -3,7 +3,6 @@ from __future__ import annotations
 from flask import Blueprint, jsonify, request
 
 from app.services.session_service import SessionService
-from app.services.track_service import TrackService
 
 match_bp = Blueprint("match", __name__, url_prefix="/api/match")
 
@@ -66,7 +65,6 @@ def swipe():
         return jsonify({"error": "direction must be 'like' or 'dislike'"}), 400
 
     session_service = SessionService()
-    track_service = TrackService()
 
     # Load session
     try:
@@ -74,8 +72,8 @@ def swipe():
     except ValueError as exc:
         return jsonify({"error": str(exc)}), 404
 
-    # Load track
-    track = track_service.get_track(track_id)
+    # Load track (usually already resolved in the session's queue)
+    track = session_service.get_session_track(username, session_id, track_id)
     if not track:
         return jsonify({"error": "Track not found."}), 404
 
@@ -99,6 +97,7 @@ def swipe():
                 "status": getattr(updated_session, "status", "active"),
                 "currentIndex": updated_session.current_index,
                 "seedSwipesCompleted": getattr(updated_session, "seed_swipes_completed", 0),
+                "refinementStatus": updated_session.refinement_status,
             },
         }
     ), 200
@@ -1,7 +1,10 @@
 from __future__ import annotations
 
-from flask import Blueprint, jsonify, request
+import json
 
+from flask import Blueprint, Response, jsonify, request, stream_with_context
+
+from app.services.personality_jobs import PersonalityJobService
 from app.services.personality_service import PersonalityService
 
 personality_bp = Blueprint("personality", __name__, url_prefix="/api/personality")
@@ -9,17 +12,71 @@ personality_bp = Blueprint("personality", __name__, url_prefix="/api/personality
 
 @personality_bp.post("")
 def compute_personality():
+    """
+    POST /api/personality  {"username": "mo"}
+
+    200 with the personality when it is already known (unchanged library),
+    otherwise 202 with a job to poll at GET /api/personality/<jobId>.
+    """
     data = request.get_json(silent=True) or {}
     username = (data.get("username") or "").strip().lower()
 
     if not username:
         return jsonify({"error": "username is required"}), 400
 
-    service = PersonalityService()
     try:
-        result = service.compute_for_user(username)
+        result = PersonalityService().get_cached_result(username)
+        if result is not None:
+            return jsonify(result.to_dict()), 200
+        job = PersonalityJobService().submit(username)
+    except RuntimeError as exc:
+        return jsonify({"error": str(exc)}), 503, {"Retry-After": "5"}
     except Exception as exc:  # noqa: BLE001
         print("Error computing personality:", exc)
         return jsonify({"error": "Failed to compute personality"}), 500
 
-    return jsonify(result.to_dict()), 200
+    return jsonify(job.to_dict()), 202, {"Location": f"/api/personality/{job.job_id}"}
+
+
+@personality_bp.get("/stream")
+def stream_personality():
+    """
+    GET /api/personality/stream?username=mo  (text/event-stream)
+
+    Sends the rule-based personality as a ``fallback`` event right away,
+    then ``delta`` events with the LLM's text as it is generated, and a
+    final ``result`` event (``error`` first if the LLM fails).
+    """
+    username = (request.args.get("username") or "").strip().lower()
+    if not username:
+        return jsonify({"error": "username is required"}), 400
+
+    service = PersonalityService()
+
+    def events():
+        try:
+            for event, payload in service.stream_for_user(username):
+                yield f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+        except Exception as exc:  # noqa: BLE001
+            print("Error streaming personality:", exc)
+            yield f"event: error\ndata: {json.dumps({'error': 'Failed to compute personality'})}\n\n"
+
+    return Response(
+        stream_with_context(events()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@personality_bp.get("/<job_id>")
+def get_personality_job(job_id: str):
+    """
+    GET /api/personality/<jobId>
+
+    Job status (queued | running | done | failed); ``result`` holds the
+    personality once done.
+    """
+    job = PersonalityJobService().get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found."}), 404
+    return jsonify(job.to_dict()), 200
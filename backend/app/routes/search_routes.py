@@ -2,7 +2,9 @@ from __future__ import annotations
 
 from flask import Blueprint, jsonify, request
 
+from app.models import Track
 from app.services.search_service import SearchService
+from app.utils.serialization import parse_fields
 
 # This is what routes/__init__.py imports:
 # from .search_routes import search_bp
@@ -12,7 +14,7 @@ search_bp = Blueprint("search", __name__, url_prefix="/api/songs")
 @search_bp.get("/search")
 def search_songs():
     """
-    GET /api/songs/search?username=<username>&q=<query>&limit=<n>
+    GET /api/songs/search?username=<username>&q=<query>&limit=<n>[&fields=track_id,track_name,artists]
 
     Response:
     {
@@ -33,6 +35,10 @@ def search_songs():
 
     if not query:
         return jsonify({"error": "q (query) is required"}), 400
+    try:
+        fields = parse_fields(request.args.get("fields"), Track.FIELD_NAMES)
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 400
 
     service = SearchService()
     try:
@@ -50,6 +56,6 @@ def search_songs():
             "username": username,
             "query": query,
             "searchEventId": search_event_id,
-            "tracks": [t.to_dict() for t in tracks],
+            "tracks": [t.to_dict(fields) for t in tracks],
         }
     ), 200
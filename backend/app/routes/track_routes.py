@@ -2,11 +2,15 @@ from __future__ import annotations
 
 from flask import Blueprint, jsonify, request
 
+from app.models import Track
 from app.services.spotify_service import SpotifyService
 from app.services.track_service import TrackService
+from app.utils.serialization import parse_fields
 
 tracks_bp = Blueprint("tracks", __name__, url_prefix="/api/tracks")
 
+MAX_SIMILAR_TRACKS = 100
+
 
 @tracks_bp.get("/enriched")
 def get_enriched_track():
@@ -42,3 +46,48 @@ def get_enriched_track():
             "spotify": spotify_info,
         }
     ), 200
+
+
+@tracks_bp.get("/<track_id>/similar")
+def get_similar_tracks(track_id: str):
+    """
+    GET /api/tracks/<track_id>/similar?k=10&genre=pop&genre=rock[&fields=track_id,track_name]
+
+    Nearest tracks by audio features (optionally limited to the given
+    genres / genre groups; `genres=pop,rock` works too).
+
+    Returns:
+    {
+      "trackId": string,
+      "tracks": [ { ...Track, "similarity": number }, ... ]
+    }
+    """
+    k_raw = (request.args.get("k") or "").strip()
+    try:
+        k = int(k_raw) if k_raw else 10
+    except ValueError:
+        return jsonify({"error": "k must be an integer"}), 400
+    k = max(1, min(k, MAX_SIMILAR_TRACKS))
+
+    genres = [g.strip() for g in request.args.getlist("genre") if g.strip()]
+    genres += [g.strip() for g in (request.args.get("genres") or "").split(",") if g.strip()]
+    try:
+        fields = parse_fields(request.args.get("fields"), Track.FIELD_NAMES)
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 400
+
+    track_service = TrackService()
+    try:
+        results = track_service.get_similar_tracks(track_id, k=k, genres=genres or None)
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 404
+    except RuntimeError as exc:
+        return jsonify({"error": str(exc)}), 503
+
+    tracks = []
+    for track, similarity in results:
+        payload = track.to_dict(fields)
+        payload["similarity"] = similarity
+        tracks.append(payload)
+
+    return jsonify({"trackId": track_id, "tracks": tracks}), 200
@@ -1,7 +1,8 @@
 from __future__ import annotations
 
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, Response, current_app, jsonify, request, stream_with_context
 from app.firebase_client import get_firestore_client, server_timestamp
+from app.services.export_service import ExportService
 
 users_bp = Blueprint("users", __name__, url_prefix="/api/users")
 
@@ -50,3 +51,38 @@ def login():
             "created": created,
         }
     ), 200
+
+
+@users_bp.get("/<username>/export")
+def export_user(username: str):
+    """
+    GET /api/users/<username>/export  (application/x-ndjson)
+
+    Streams the user's profile, library, swipes and search events, one JSON
+    record per line, ending with a ``summary`` record (or an ``error`` one
+    if the export breaks off).
+    """
+    username_norm = username.strip().lower()
+    try:
+        records = ExportService().iter_user_export(username_norm)
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 404
+
+    def lines():
+        dumps = current_app.json.dumps
+        try:
+            for record in records:
+                yield dumps(record) + "\n"
+        except Exception as exc:  # noqa: BLE001
+            print(f"Error exporting {username_norm}:", exc)
+            yield dumps({"type": "error", "error": "Export failed"}) + "\n"
+
+    return Response(
+        stream_with_context(lines()),
+        mimetype="application/x-ndjson",
+        headers={
+            "Content-Disposition": f'attachment; filename="{username_norm}-export.ndjson"',
+            "Cache-Control": "no-store",
+            "X-Accel-Buffering": "no",
+        },
+    )
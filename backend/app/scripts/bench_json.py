@@ -0,0 +1,96 @@
+"""
+Microbenchmark: serialize a 1000-track library the way GET /api/library does.
+
+    python -m app.scripts.bench_json --tracks 1000 --repeat 50
+
+Compares the old path (``dataclasses.asdict`` + Flask's stdlib provider)
+with the generated ``Track.to_dict`` on the stdlib and orjson providers,
+and a sparse ``?fields=track_id,track_name,artists`` response. Prints the
+best per-response time and the body size for each.
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import timeit
+from dataclasses import asdict
+
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+from app.models import NUMERIC_FEATURES, Track
+from app.utils.json_provider import FastJSONProvider, orjson
+
+SPARSE_FIELDS = ("track_id", "track_name", "artists")
+
+
+def _synthetic_tracks(count: int, seed: int = 7) -> list[Track]:
+    rng = random.Random(seed)
+    genres = ["pop", "rock", "hip-hop", "k-pop", "jazz", "edm", "indie", "latin"]
+    tracks = []
+    for i in range(count):
+        genre = rng.choice(genres)
+        features = {name: round(rng.random(), 4) for name in NUMERIC_FEATURES}
+        tracks.append(
+            Track(
+                track_id=f"{i:022d}",
+                track_name=f"Track {i} – ünïcode",
+                artists=[f"Artist {rng.randrange(500)}" for _ in range(rng.randint(1, 3))],
+                album_name=f"Album {rng.randrange(2000)}",
+                popularity=rng.randrange(100),
+                popularity_norm=round(rng.random(), 4),
+                duration_ms=rng.randrange(90_000, 400_000),
+                explicit=rng.random() < 0.2,
+                key=rng.randrange(12),
+                loudness=round(-rng.random() * 20, 3),
+                mode=rng.randrange(2),
+                tempo=round(60 + rng.random() * 120, 3),
+                time_signature=4,
+                track_genre=genre,
+                track_genre_group=genre,
+                track_name_lowercase=f"track {i}",
+                **features,
+            )
+        )
+    return tracks
+
+
+def _legacy_to_dict(track: Track) -> dict:
+    payload = asdict(track)
+    payload["artists"] = list(track.artists)
+    return payload
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tracks", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    tracks = _synthetic_tracks(args.tracks)
+    stdlib_app, fast_app = Flask("bench_stdlib"), Flask("bench_fast")
+    stdlib_app.json = DefaultJSONProvider(stdlib_app)
+    fast_app.json = FastJSONProvider(fast_app)
+
+    cases = {
+        "asdict + stdlib json": (stdlib_app, lambda: [_legacy_to_dict(t) for t in tracks]),
+        "generated to_dict + stdlib json": (stdlib_app, lambda: [t.to_dict() for t in tracks]),
+        "generated to_dict + FastJSONProvider": (fast_app, lambda: [t.to_dict() for t in tracks]),
+        "sparse fields + FastJSONProvider": (fast_app, lambda: [t.to_dict(SPARSE_FIELDS) for t in tracks]),
+    }
+
+    print(f"{args.tracks} tracks, best of {args.repeat}; orjson {'available' if orjson else 'not installed'}")
+    baseline = None
+    for name, (app, build) in cases.items():
+
+        def respond(app=app, build=build):
+            return app.json.response({"username": "bench", "tracks": build()}).get_data()
+
+        size = len(respond())
+        best = min(timeit.repeat(respond, number=1, repeat=args.repeat))
+        baseline = baseline or best
+        print(f"  {name:<40} {best * 1000:8.2f} ms  {baseline / best:5.1f}x  {size / 1024:8.1f} KiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Build "users who liked X also liked Y" neighbours from every user's swipes.
+
+    python -m app.scripts.build_colike_graph catalog.npz --top 20 --min-count 2 --publish
+
+Streams the `swipes` collection group once, counts co-liked track pairs in
+bounded memory, thresholds them into a CSR matrix and stores each track's
+top co-liked neighbours in the catalog snapshot (`colike_indices`,
+`colike_scores`) for O(1) lookups at request time.
+"""
+from __future__ import annotations
+
+import argparse
+import time
+
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from app import create_app  # noqa: E402
+from app.services.catalog_service import (  # noqa: E402
+    COLIKE_GRAPH,
+    DEFAULT_MANIFEST_PATH,
+    CatalogSnapshot,
+    publish_catalog,
+)
+from app.services.user_service import UserService  # noqa: E402
+from app.utils.colike import CoLikeAccumulator, build_colike_graph  # noqa: E402
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("snapshot", help="catalog snapshot (.npz) written by publish_catalog --save")
+    parser.add_argument("--top", type=int, default=20, help="co-liked neighbours kept per track")
+    parser.add_argument("--min-count", type=int, default=2, help="minimum users liking a pair")
+    parser.add_argument("--page-size", type=int, default=5000)
+    parser.add_argument("--out", help="where to write the snapshot (default: overwrite input)")
+    parser.add_argument("--csr", help="also save the thresholded CSR matrix to this .npz path")
+    parser.add_argument("--publish", action="store_true", help="publish the result to shared memory")
+    parser.add_argument("--manifest", default=DEFAULT_MANIFEST_PATH)
+    args = parser.parse_args()
+
+    snapshot = CatalogSnapshot.load(args.snapshot)
+    accumulator = CoLikeAccumulator(len(snapshot))
+
+    started = time.perf_counter()
+    app = create_app()
+    with app.app_context():
+        # Count users read, not accumulator.users: that one stalls on users without likes
+        for seen, (username, swipes) in enumerate(UserService().iter_swipes_by_user(page_size=args.page_size), 1):
+            liked = {track_id for track_id, is_like in swipes if is_like}
+            accumulator.add_user(snapshot.rows_of(liked))
+            if seen % 10000 == 0:
+                print(f"…{seen} users processed")
+
+    indptr, indices, scores = accumulator.to_csr(min_count=args.min_count)
+    print(
+        f"Co-like matrix: {accumulator.users} users, {indices.shape[0] // 2} pairs "
+        f"(>= {args.min_count} users) in {time.perf_counter() - started:.1f}s"
+    )
+    if args.csr:
+        np.savez(args.csr, indptr=indptr, indices=indices, scores=scores)
+        print(f"CSR matrix written to {args.csr}")
+
+    graph_indices, graph_scores = build_colike_graph(indptr, indices, scores, top_m=args.top)
+    snapshot = snapshot.with_graph(COLIKE_GRAPH, graph_indices, graph_scores)
+    out_path = args.out or args.snapshot
+    snapshot.save(out_path)
+    print(f"Snapshot written to {out_path}")
+
+    if args.publish:
+        version = publish_catalog(snapshot, manifest_path=args.manifest)
+        print(f"Published catalog version {version} (manifest: {args.manifest})")
+
+
+if __name__ == "__main__":
+    main()
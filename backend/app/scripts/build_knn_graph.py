@@ -0,0 +1,53 @@
+"""
+Precompute every track's top-K audio-feature neighbours into a catalog snapshot.
+
+    python -m app.scripts.publish_catalog --save catalog.npz
+    python -m app.scripts.build_knn_graph catalog.npz -k 20 --publish
+
+The graph is stored as `knn_indices` (N, K) int32 and `knn_scores` (N, K)
+float16 next to the other catalog arrays, so "more like this" lookups and
+candidate expansion read K entries instead of searching.
+"""
+from __future__ import annotations
+
+import argparse
+import time
+
+from app.services.catalog_service import DEFAULT_MANIFEST_PATH, KNN_GRAPH, CatalogSnapshot, publish_catalog
+from app.utils.knn import KNN_ROW_BLOCK, build_knn_graph
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("snapshot", help="catalog snapshot (.npz) written by publish_catalog --save")
+    parser.add_argument("-k", type=int, default=20, help="neighbours per track")
+    parser.add_argument("--out", help="where to write the snapshot with the graph (default: overwrite input)")
+    parser.add_argument("--workers", type=int, default=None, help="process pool size (default: all cores)")
+    parser.add_argument("--row-block", type=int, default=KNN_ROW_BLOCK)
+    parser.add_argument("--publish", action="store_true", help="publish the result to shared memory")
+    parser.add_argument("--manifest", default=DEFAULT_MANIFEST_PATH)
+    args = parser.parse_args()
+
+    snapshot = CatalogSnapshot.load(args.snapshot)
+    print(f"Computing top-{args.k} neighbours for {len(snapshot)} tracks…")
+    started = time.perf_counter()
+    indices, scores = build_knn_graph(
+        snapshot.dequantized_features(),
+        k=args.k,
+        workers=args.workers,
+        row_block=args.row_block,
+    )
+    print(f"Graph built in {time.perf_counter() - started:.1f}s")
+
+    snapshot = snapshot.with_graph(KNN_GRAPH, indices, scores)
+    out_path = args.out or args.snapshot
+    snapshot.save(out_path)
+    print(f"Snapshot written to {out_path}")
+
+    if args.publish:
+        version = publish_catalog(snapshot, manifest_path=args.manifest)
+        print(f"Published catalog version {version} (manifest: {args.manifest})")
+
+
+if __name__ == "__main__":
+    main()
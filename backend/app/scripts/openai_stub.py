@@ -0,0 +1,117 @@
+"""
+Local stand-in for the OpenAI chat completions API, for exercising the
+personality endpoints without a key or network access.
+
+    python -m app.scripts.openai_stub --port 8089 --token-delay-ms 40
+    OPENAI_BASE_URL=http://127.0.0.1:8089/v1 OPENAI_API_KEY=stub flask --app run.py run
+
+Answers POST /v1/chat/completions with a canned personality JSON, either
+whole or (with "stream": true) as server-sent chunks in OpenAI's streaming
+format, a few characters per chunk, ending with `data: [DONE]`.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CANNED_PERSONALITY = {
+    "archetypeId": "neon_night_drifter",
+    "title": "Neon Night Drifter",
+    "shortDescription": "You treat every commute like the opening credits of your own movie.",
+    "longDescription": (
+        "You collect songs the way other people collect postcards — each one a place you went emotionally. "
+        "You say you'll \"just vibe\", then queue the same three bangers on repeat. "
+        "Big choruses for the good days, slow burners for the 2 AM overthinking. "
+        "Somehow it all sounds like you."
+    ),
+}
+
+
+def _chunks(text: str, size: int) -> list[str]:
+    return [text[i : i + size] for i in range(0, len(text), size)]
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    token_delay = 0.04
+    chunk_chars = 4
+
+    def do_POST(self) -> None:  # noqa: N802 - http.server API
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self.send_error(404)
+            return
+        length = int(self.headers.get("Content-Length") or 0)
+        request = json.loads(self.rfile.read(length) or b"{}")
+        content = json.dumps(CANNED_PERSONALITY, ensure_ascii=False)
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        model = request.get("model", "gpt-4o-mini")
+
+        if not request.get("stream"):
+            self._send_json(
+                {
+                    "id": completion_id,
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": model,
+                    "choices": [
+                        {"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}
+                    ],
+                }
+            )
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        deltas = [{"role": "assistant", "content": ""}] + [{"content": piece} for piece in _chunks(content, self.chunk_chars)]
+        for i, delta in enumerate(deltas):
+            finish = "stop" if i == len(deltas) - 1 else None
+            self._send_event(
+                {
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "created": int(time.time()),
+                    "model": model,
+                    "choices": [{"index": 0, "delta": delta, "finish_reason": finish}],
+                }
+            )
+            time.sleep(self.token_delay)
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+    def _send_json(self, payload: dict) -> None:
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_event(self, payload: dict) -> None:
+        self.wfile.write(f"data: {json.dumps(payload)}\n\n".encode("utf-8"))
+        self.wfile.flush()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--token-delay-ms", type=float, default=40.0, help="pause between streamed chunks")
+    parser.add_argument("--chunk-chars", type=int, default=4, help="characters per streamed chunk")
+    args = parser.parse_args()
+
+    StubHandler.token_delay = args.token_delay_ms / 1000.0
+    StubHandler.chunk_chars = max(1, args.chunk_chars)
+    server = ThreadingHTTPServer((args.host, args.port), StubHandler)
+    print(f"OpenAI stub listening on http://{args.host}:{args.port}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,30 @@
+"""
+Delete personality_jobs docs past their expire_at (a day after submission).
+
+    python -m app.scripts.prune_personality_jobs
+
+Not needed where a Firestore TTL policy on personality_jobs.expire_at is
+enabled; otherwise run it daily.
+"""
+from __future__ import annotations
+
+import argparse
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from app import create_app  # noqa: E402
+from app.services.personality_jobs import PersonalityJobService  # noqa: E402
+
+
+def main() -> None:
+    argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter).parse_args()
+    app = create_app()
+    with app.app_context():
+        deleted = PersonalityJobService().delete_expired()
+    print(f"Deleted {deleted} expired personality jobs")
+
+
+if __name__ == "__main__":
+    main()
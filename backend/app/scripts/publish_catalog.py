@@ -0,0 +1,81 @@
+"""
+Publish the track catalog into shared memory for the API workers.
+
+Run once before (or while) gunicorn is serving; re-run after importing new
+tracks and every worker picks up the new version within a few seconds:
+
+    python -m app.scripts.publish_catalog                      # from Firestore
+    python -m app.scripts.publish_catalog --jsonl tracks_prepared.jsonl
+    python -m app.scripts.publish_catalog --snapshot catalog.npz
+    python -m app.scripts.publish_catalog --save catalog.npz   # also keep a copy on disk
+    python -m app.scripts.publish_catalog --feature-dtype uint8  # 4x smaller feature matrix
+"""
+from __future__ import annotations
+
+import argparse
+import json
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from app import create_app  # noqa: E402
+from app.services.catalog_service import (  # noqa: E402
+    CATALOG_FEATURE_DTYPE,
+    DEFAULT_MANIFEST_PATH,
+    CatalogService,
+    CatalogSnapshot,
+    publish_catalog,
+)
+from app.utils.scoring import FEATURE_DTYPES  # noqa: E402
+
+
+def _read_jsonl(path: str):
+    with open(path, "r", encoding="utf-8") as fh:
+        for line in fh:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--jsonl", help="build from a prepare_tracks.py export instead of Firestore")
+    source.add_argument("--snapshot", help="republish a snapshot previously written with --save")
+    parser.add_argument("--save", help="write the snapshot to this .npz path as well")
+    parser.add_argument("--manifest", default=DEFAULT_MANIFEST_PATH)
+    parser.add_argument(
+        "--feature-dtype",
+        choices=FEATURE_DTYPES,
+        default=CATALOG_FEATURE_DTYPE,
+        help="storage type for the audio feature matrix",
+    )
+    args = parser.parse_args()
+
+    if args.snapshot:
+        snapshot = CatalogSnapshot.load(args.snapshot)
+        if snapshot.meta.get("feature_dtype") != args.feature_dtype:
+            snapshot = snapshot.with_feature_dtype(args.feature_dtype)
+    elif args.jsonl:
+        snapshot = CatalogSnapshot.from_tracks(_read_jsonl(args.jsonl), feature_dtype=args.feature_dtype)
+    else:
+        app = create_app()
+        with app.app_context():
+            snapshot = CatalogService().build_snapshot(feature_dtype=args.feature_dtype)
+
+    print(f"Catalog built: {len(snapshot)} tracks, {len(snapshot.genres)} genres")
+    print(
+        f"Features stored as {snapshot.features.dtype.name} "
+        f"({snapshot.features.nbytes} bytes, max dequantization error {snapshot.feature_error:.2e})"
+    )
+    if args.save:
+        snapshot.save(args.save)
+        print(f"Snapshot written to {args.save}")
+
+    version = publish_catalog(snapshot, manifest_path=args.manifest)
+    print(f"Published catalog version {version} (manifest: {args.manifest})")
+
+
+if __name__ == "__main__":
+    main()
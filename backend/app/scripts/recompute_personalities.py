@@ -0,0 +1,221 @@
+"""
+Recompute every user's personality (e.g. nightly), or only users active
+since a date.
+
+    python -m app.scripts.recompute_personalities --since 2025-01-01 --processes 4 \
+        --llm-concurrency 8 --tokens-per-minute 150000
+
+Library summaries are loaded and turned into LLM prompts across a process
+pool; users whose library fingerprint matches their saved personality are
+skipped (unless --force). LLM calls run on a capped thread pool behind a
+token-rate limiter, and results are written back in batched commits.
+"""
+from __future__ import annotations
+
+import argparse
+import multiprocessing
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from app import create_app  # noqa: E402
+from app.firebase_client import get_firestore_client  # noqa: E402
+from app.services.personality_service import (  # noqa: E402
+    PersonalityPlan,
+    PersonalityService,
+    personality_payload,
+)
+
+COMPLETION_TOKENS = 400  # budgeted per call on top of the prompt estimate
+CHARS_PER_TOKEN = 4
+MAX_BATCH_WRITES = 500  # Firestore limit per batched commit
+
+_worker_service: PersonalityService | None = None
+
+
+class TokenRateLimiter:
+    """Token bucket refilled continuously at ``tokens_per_minute``; ``acquire`` blocks until affordable."""
+
+    def __init__(self, tokens_per_minute: float) -> None:
+        self.rate = tokens_per_minute / 60.0
+        self.capacity = tokens_per_minute
+        self._tokens = tokens_per_minute
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: float) -> None:
+        tokens = min(tokens, self.capacity)
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait = (tokens - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+def _init_worker() -> None:
+    """Per-process setup: one app context and service for every chunk this process handles."""
+    global _worker_service
+    app = create_app()
+    app.app_context().push()
+    _worker_service = PersonalityService()
+
+
+def _plan_chunk(usernames: list[str], force: bool) -> list[tuple[str, PersonalityPlan | None, str | None]]:
+    """``(username, plan or None when skipped, error)`` for each user in the chunk."""
+    out: list[tuple[str, PersonalityPlan | None, str | None]] = []
+    for username in usernames:
+        try:
+            out.append((username, _worker_service.plan_for_user(username, force=force), None))
+        except Exception as exc:  # noqa: BLE001
+            out.append((username, None, str(exc)))
+    return out
+
+
+def _list_usernames(db, since: datetime | None) -> list[str]:
+    query = db.collection("users")
+    if since is not None:
+        query = query.where("last_active_at", ">=", since)
+    return [doc.id for doc in query.select([]).stream()]
+
+
+def _write_results(
+    db,
+    service: PersonalityService,
+    results: "queue.Queue",
+    batch_size: int,
+    stats: dict,
+    stats_lock: threading.Lock,
+) -> None:
+    """Drain ``results`` into batched commits until a None sentinel arrives."""
+    batch, pending = db.batch(), 0
+    while True:
+        item = results.get()
+        if item is not None:
+            plan, result, cacheable = item
+            payload = personality_payload(result, plan.fingerprint if cacheable else None)
+            batch.set(service.personality_ref(plan.username), payload, merge=True)
+            pending += 1
+        if pending and (item is None or pending >= batch_size):
+            try:
+                batch.commit()
+                outcome = "written"
+            except Exception as exc:  # noqa: BLE001
+                print(f"Batched write of {pending} personalities failed: {exc}")
+                outcome = "failed"
+            with stats_lock:
+                stats[outcome] += pending
+            batch, pending = db.batch(), 0
+        if item is None:
+            return
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--since", help="only users with last_active_at on/after this ISO date")
+    parser.add_argument("--users", help="comma-separated usernames instead of listing the users collection")
+    parser.add_argument("--force", action="store_true", help="recompute even when the library is unchanged")
+    parser.add_argument("--processes", type=int, default=max(1, (multiprocessing.cpu_count() or 2) - 1))
+    parser.add_argument("--chunk-size", type=int, default=50, help="users per process-pool task")
+    parser.add_argument("--llm-concurrency", type=int, default=8, help="max LLM calls in flight")
+    parser.add_argument("--tokens-per-minute", type=float, default=150_000, help="LLM token budget")
+    parser.add_argument("--batch-size", type=int, default=400, help="personalities per batched commit")
+    parser.add_argument("--dry-run", action="store_true", help="plan only; no LLM calls or writes")
+    args = parser.parse_args()
+
+    app = create_app()
+    started = time.perf_counter()
+    with app.app_context():
+        db = get_firestore_client()
+        service = PersonalityService()
+
+        if args.users:
+            usernames = [u.strip().lower() for u in args.users.split(",") if u.strip()]
+        else:
+            since = datetime.fromisoformat(args.since) if args.since else None
+            if since is not None and since.tzinfo is None:
+                since = since.replace(tzinfo=timezone.utc)
+            usernames = _list_usernames(db, since)
+        print(f"{len(usernames)} users to check")
+
+        stats = {"planned": 0, "skipped": 0, "failed": 0, "fallbacks": 0, "written": 0}
+        stats_lock = threading.Lock()
+        limiter = TokenRateLimiter(args.tokens_per_minute)
+        in_flight = threading.BoundedSemaphore(args.llm_concurrency * 4)  # bounds plans waiting on the LLM
+        results: "queue.Queue" = queue.Queue()
+        writer = threading.Thread(
+            target=_write_results,
+            args=(db, service, results, min(args.batch_size, MAX_BATCH_WRITES), stats, stats_lock),
+            name="personality-writer",
+        )
+        if not args.dry_run:
+            writer.start()
+
+        def generate(plan: PersonalityPlan) -> None:
+            try:
+                limiter.acquire(plan.prompt_chars / CHARS_PER_TOKEN + COMPLETION_TOKENS)
+                result, cacheable = service.generate(plan)
+                if not cacheable:
+                    with stats_lock:
+                        stats["fallbacks"] += 1
+                results.put((plan, result, cacheable))
+            finally:
+                in_flight.release()
+
+        chunks = [usernames[i : i + args.chunk_size] for i in range(0, len(usernames), args.chunk_size)]
+        with (
+            ProcessPoolExecutor(
+                max_workers=args.processes,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+            ) as processes,
+            ThreadPoolExecutor(max_workers=args.llm_concurrency, thread_name_prefix="llm") as llm_pool,
+        ):
+            futures = [processes.submit(_plan_chunk, chunk, args.force) for chunk in chunks]
+            llm_futures = []
+            for future in as_completed(futures):
+                for username, plan, error in future.result():
+                    with stats_lock:
+                        if error is not None:
+                            stats["failed"] += 1
+                        elif plan is None:
+                            stats["skipped"] += 1
+                        else:
+                            stats["planned"] += 1
+                    if error is not None:
+                        print(f"Skipping {username}: {error}")
+                    elif plan is not None and not args.dry_run:
+                        in_flight.acquire()
+                        llm_futures.append((username, llm_pool.submit(generate, plan)))
+
+            for username, future in llm_futures:
+                try:
+                    future.result()
+                except Exception as exc:  # noqa: BLE001
+                    print(f"Generating the personality for {username} failed: {exc}")
+                    with stats_lock:
+                        stats["failed"] += 1
+
+        if not args.dry_run:
+            results.put(None)
+            writer.join()
+
+    print(
+        f"Done in {time.perf_counter() - started:.1f}s: {stats['planned']} recomputed, "
+        f"{stats['skipped']} unchanged, {stats['fallbacks']} LLM fallbacks, "
+        f"{stats['written']} written, {stats['failed']} failed"
+    )
+
+
+if __name__ == "__main__":
+    main()
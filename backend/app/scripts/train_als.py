@@ -0,0 +1,86 @@
+"""
+Train implicit-feedback ALS embeddings from every user's like/dislike swipes.
+
+    python -m app.scripts.train_als --factors 32 --iterations 10
+
+Streams the `swipes` collection group once, factorizes the user x track
+matrix (likes as confident positives, dislikes as confident negatives) and
+writes float32 user/track tables as `.npy` files under EMBEDDINGS_PATH.
+Workers memory-map the new version on their next refresh; users' vectors are
+folded in from their latest swipes at serve time, so retraining can run
+nightly rather than per swipe.
+"""
+from __future__ import annotations
+
+import argparse
+import time
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from app import create_app  # noqa: E402
+from app.services.embedding_service import DEFAULT_EMBEDDINGS_PATH, save_embeddings  # noqa: E402
+from app.services.user_service import UserService  # noqa: E402
+from app.utils.als import build_interactions, train_implicit_als  # noqa: E402
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--out", default=DEFAULT_EMBEDDINGS_PATH, help="embeddings root directory")
+    parser.add_argument("--factors", type=int, default=32)
+    parser.add_argument("--iterations", type=int, default=10)
+    parser.add_argument("--reg", type=float, default=0.1, help="L2 regularization")
+    parser.add_argument("--alpha", type=float, default=20.0, help="confidence scale for a swipe")
+    parser.add_argument("--dislike-weight", type=float, default=0.5, help="dislike confidence relative to a like")
+    parser.add_argument("--page-size", type=int, default=5000)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    app = create_app()
+    with app.app_context():
+        swipes = UserService().iter_swipes_by_user(page_size=args.page_size)
+        usernames, track_ids, user_idx, item_idx, liked = build_interactions(swipes)
+    print(
+        f"Loaded {user_idx.shape[0]} interactions ({len(usernames)} users, {track_ids.shape[0]} tracks) "
+        f"in {time.perf_counter() - started:.1f}s"
+    )
+    if not usernames:
+        print("No swipes found; nothing to train.")
+        return
+
+    started = time.perf_counter()
+    user_factors, item_factors = train_implicit_als(
+        user_idx,
+        item_idx,
+        liked,
+        n_users=len(usernames),
+        n_items=track_ids.shape[0],
+        factors=args.factors,
+        iterations=args.iterations,
+        reg=args.reg,
+        alpha=args.alpha,
+        dislike_weight=args.dislike_weight,
+    )
+    print(f"Trained {args.factors} factors x {args.iterations} iterations in {time.perf_counter() - started:.1f}s")
+
+    version = save_embeddings(
+        usernames,
+        track_ids,
+        user_factors,
+        item_factors,
+        meta={
+            "factors": args.factors,
+            "iterations": args.iterations,
+            "reg": args.reg,
+            "alpha": args.alpha,
+            "dislike_weight": args.dislike_weight,
+            "trained_at": time.time(),
+        },
+        root=args.out,
+    )
+    print(f"Embeddings version {version} written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
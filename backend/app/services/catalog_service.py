@@ -0,0 +1,585 @@
+from __future__ import annotations
+
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+from multiprocessing import resource_tracker, shared_memory
+from typing import Any, Iterable, Mapping
+
+import numpy as np
+
+from app.firebase_client import get_firestore_client
+from app.models.track import NUMERIC_FEATURES
+from app.utils.kdtree import KDTree, build_kdtree
+from app.utils.scoring import quantize_features
+
+DEFAULT_MANIFEST_PATH = os.getenv("CATALOG_MANIFEST_PATH") or os.path.join(
+    tempfile.gettempdir(), "bytegoblins-catalog.json"
+)
+CATALOG_REFRESH_SECONDS = float(os.getenv("CATALOG_REFRESH_SECONDS", "2"))
+CATALOG_FEATURE_DTYPE = os.getenv("CATALOG_FEATURE_DTYPE", "float32")  # float32 | float16 | uint8
+SEGMENT_PREFIX = "bgcat"
+MISSING_CODE = -1  # genre code for tracks without a genre
+KNN_GRAPH = "knn"  # audio-feature neighbours (build_knn_graph)
+COLIKE_GRAPH = "colike"  # co-liked tracks from swipe history (build_colike_graph)
+BRUTE_FORCE_ROWS = 4096  # genre-constrained neighbour queries below this size skip the KD-tree
+_ALIGNMENT = 64  # keep every array cache-line aligned inside the segment
+
+
+class CatalogSnapshot:
+    """
+    Column-oriented, read-only view of the track catalog.
+
+    Rows are sorted by track id, so the ``track_ids`` column doubles as the
+    id index (binary search instead of a per-worker dict). Feature values
+    missing on a track are imputed with a neutral 0.5.
+
+    ``features`` may be stored quantized (see ``feature_dtype``); scoring
+    kernels in ``app.utils.scoring`` take ``feature_scale`` and work on the
+    stored representation directly.
+    """
+
+    def __init__(
+        self,
+        arrays: Mapping[str, np.ndarray],
+        meta: Mapping[str, Any],
+        version: int = 0,
+    ) -> None:
+        self.arrays = dict(arrays)
+        self.meta = dict(meta)
+        self.version = version
+        self.genres: list[str] = list(self.meta.get("genres") or [])
+        self.genre_groups: list[str] = list(self.meta.get("genre_groups") or [])
+        self._genre_lookup = {g: i for i, g in enumerate(self.genres)}
+        self._group_lookup = {g: i for i, g in enumerate(self.genre_groups)}
+        self._kdtree: KDTree | None = None
+
+    # ---------- columns ----------
+
+    @property
+    def track_ids(self) -> np.ndarray:
+        return self.arrays["track_ids"]
+
+    @property
+    def features(self) -> np.ndarray:
+        return self.arrays["features"]
+
+    @property
+    def popularity(self) -> np.ndarray:
+        return self.arrays["popularity"]
+
+    @property
+    def genre_codes(self) -> np.ndarray:
+        return self.arrays["genre_codes"]
+
+    @property
+    def genre_group_codes(self) -> np.ndarray:
+        return self.arrays["genre_group_codes"]
+
+    @property
+    def feature_scale(self) -> float:
+        return float(self.meta.get("feature_scale", 1.0))
+
+    @property
+    def feature_error(self) -> float:
+        """Measured max absolute dequantization error of ``features``."""
+        return float(self.meta.get("feature_error", 0.0))
+
+    def dequantized_features(self, rows: np.ndarray | None = None) -> np.ndarray:
+        features = self.features if rows is None else self.features[rows]
+        return features.astype(np.float32) * np.float32(self.feature_scale)
+
+    def __len__(self) -> int:
+        return int(self.track_ids.shape[0])
+
+    # ---------- lookups ----------
+
+    def row_of(self, track_id: str) -> int | None:
+        key = track_id.encode("utf-8")
+        ids = self.track_ids
+        row = int(np.searchsorted(ids, key))
+        if row < len(ids) and ids[row] == key:
+            return row
+        return None
+
+    def rows_of(self, track_ids: Iterable[str], drop_missing: bool = True) -> np.ndarray:
+        """
+        Rows for the given ids, in input order.
+
+        Unknown ids are dropped, or reported as -1 with ``drop_missing=False``.
+        """
+        keys = np.array([tid.encode("utf-8") for tid in track_ids], dtype=self.track_ids.dtype)
+        if keys.size == 0 or len(self) == 0:
+            return np.full(0 if drop_missing else keys.size, -1, dtype=np.int64)
+        rows = np.searchsorted(self.track_ids, keys)
+        rows = np.minimum(rows, len(self) - 1).astype(np.int64)
+        found = self.track_ids[rows] == keys
+        if drop_missing:
+            return rows[found]
+        rows[~found] = -1
+        return rows
+
+    def track_id_at(self, row: int) -> str:
+        return self.track_ids[row].decode("utf-8")
+
+    def track_ids_at(self, rows: Iterable[int]) -> list[str]:
+        ids = self.track_ids
+        return [ids[row].decode("utf-8") for row in rows]
+
+    def genre_code(self, genre: str) -> int | None:
+        return self._genre_lookup.get(genre)
+
+    def genre_group_code(self, group: str) -> int | None:
+        return self._group_lookup.get(group)
+
+    # ---------- popularity-sorted partitions ----------
+
+    def genre_slices(self, name: str) -> list[np.ndarray]:
+        """
+        Rows whose track_genre or track_genre_group equals ``name``, as
+        popularity-descending slices of the partition indexes (views, no copy).
+        """
+        slices: list[np.ndarray] = []
+        if (code := self.genre_code(name)) is not None:
+            offsets = self.arrays["genre_offsets"]
+            slices.append(self.arrays["genre_index"][offsets[code] : offsets[code + 1]])
+        if (code := self.genre_group_code(name)) is not None:
+            offsets = self.arrays["group_offsets"]
+            slices.append(self.arrays["group_index"][offsets[code] : offsets[code + 1]])
+        return slices
+
+    @property
+    def popularity_index(self) -> np.ndarray:
+        """All rows, most popular first."""
+        return self.arrays["popularity_index"]
+
+    # ---------- nearest neighbours ----------
+
+    @property
+    def kdtree(self) -> KDTree:
+        if self._kdtree is None:
+            self._kdtree = KDTree(self.arrays, self.features, scale=self.feature_scale)
+        return self._kdtree
+
+    def nearest_rows(
+        self,
+        row: int,
+        k: int,
+        genres: Iterable[str] | None = None,
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        The ``k`` rows closest to ``row`` in NUMERIC_FEATURES space, optionally
+        restricted to tracks whose genre or genre group is in ``genres``.
+
+        Returns ``(rows, similarity)`` with ``similarity = 1 / (1 + distance)``,
+        the same scale as ``compute_feature_similarity``.
+        """
+        target = self.dequantized_features(np.array([row]))[0]
+        genres = [g for g in (genres or []) if g]
+
+        if not genres:
+            rows, distances = self.kdtree.query(target, k, row_filter=lambda r: r != row)
+            return rows, 1.0 / (1.0 + distances)
+
+        slices = [rows for genre in genres for rows in self.genre_slices(genre)]
+        if sum(len(rows) for rows in slices) <= BRUTE_FORCE_ROWS:
+            candidates = np.unique(np.concatenate(slices)) if slices else np.empty(0, dtype=np.int64)
+            candidates = candidates[candidates != row]
+            diffs = self.dequantized_features(candidates) - target
+            distances = np.sqrt(np.einsum("ij,ij->i", diffs, diffs))
+            order = np.argsort(distances, kind="stable")[:k]
+            return candidates[order].astype(np.int64), 1.0 / (1.0 + distances[order])
+
+        genre_codes = np.array([c for g in genres if (c := self.genre_code(g)) is not None], dtype=np.int16)
+        group_codes = np.array([c for g in genres if (c := self.genre_group_code(g)) is not None], dtype=np.int16)
+
+        def keep(rows: np.ndarray) -> np.ndarray:
+            allowed = np.isin(self.genre_codes[rows], genre_codes) | np.isin(self.genre_group_codes[rows], group_codes)
+            return allowed & (rows != row)
+
+        rows, distances = self.kdtree.query(target, k, row_filter=keep)
+        return rows, 1.0 / (1.0 + distances)
+
+    # ---------- precomputed neighbour graphs ----------
+
+    def has_graph(self, graph: str = KNN_GRAPH) -> bool:
+        return f"{graph}_indices" in self.arrays
+
+    def graph_width(self, graph: str = KNN_GRAPH) -> int:
+        return int(self.arrays[f"{graph}_indices"].shape[1]) if self.has_graph(graph) else 0
+
+    def neighbours(self, row: int, graph: str = KNN_GRAPH) -> tuple[np.ndarray, np.ndarray]:
+        """Precomputed ``(rows, score)`` neighbours of ``row``, best first."""
+        rows = self.arrays[f"{graph}_indices"][row]
+        scores = self.arrays[f"{graph}_scores"][row]
+        valid = rows >= 0
+        return rows[valid].astype(np.int64), scores[valid].astype(np.float32)
+
+    def expand_rows(self, rows: np.ndarray, per_row: int, graph: str = KNN_GRAPH) -> np.ndarray:
+        """Unique graph neighbours of ``rows`` (up to ``per_row`` each), best first."""
+        if not self.has_graph(graph) or rows.size == 0:
+            return np.empty(0, dtype=np.int64)
+        block = self.arrays[f"{graph}_indices"][rows, :per_row]
+        flat = block.T.ravel()  # first neighbours of every anchor, then second, ...
+        flat = flat[flat >= 0]
+        _, first = np.unique(flat, return_index=True)
+        return flat[np.sort(first)].astype(np.int64)
+
+    def with_graph(self, graph: str, indices: np.ndarray, scores: np.ndarray) -> "CatalogSnapshot":
+        """Copy of this snapshot carrying an (N, K) neighbour graph (-1 pads short rows)."""
+        arrays = dict(self.arrays)
+        arrays[f"{graph}_indices"] = indices.astype(np.int32)
+        arrays[f"{graph}_scores"] = scores.astype(np.float16)
+        return CatalogSnapshot(arrays, self.meta, version=self.version)
+
+    # ---------- construction ----------
+
+    @classmethod
+    def from_tracks(
+        cls,
+        records: Iterable[Mapping[str, Any]],
+        version: int = 0,
+        feature_dtype: str | None = None,
+    ) -> "CatalogSnapshot":
+        """Build a snapshot from track payloads (each must carry ``track_id``)."""
+        rows = sorted(
+            (r for r in records if r.get("track_id")),
+            key=lambda r: str(r["track_id"]),
+        )
+        genres: dict[str, int] = {}
+        groups: dict[str, int] = {}
+
+        n = len(rows)
+        id_width = max((len(str(r["track_id"]).encode("utf-8")) for r in rows), default=1)
+        track_ids = np.empty(n, dtype=f"S{id_width}")
+        features = np.full((n, len(NUMERIC_FEATURES)), 0.5, dtype=np.float32)
+        popularity = np.zeros(n, dtype=np.float32)
+        genre_codes = np.full(n, MISSING_CODE, dtype=np.int16)
+        group_codes = np.full(n, MISSING_CODE, dtype=np.int16)
+
+        for i, record in enumerate(rows):
+            track_ids[i] = str(record["track_id"]).encode("utf-8")
+            for j, feature in enumerate(NUMERIC_FEATURES):
+                value = record.get(feature)
+                if value is not None:
+                    features[i, j] = float(value)
+            popularity[i] = float(record.get("popularity_norm") or 0.0)
+            if genre := record.get("track_genre"):
+                genre_codes[i] = genres.setdefault(genre, len(genres))
+            if group := record.get("track_genre_group"):
+                group_codes[i] = groups.setdefault(group, len(groups))
+
+        features, scale, error = quantize_features(features, feature_dtype or CATALOG_FEATURE_DTYPE)
+        arrays = {
+            "track_ids": track_ids,
+            "features": features,
+            "popularity": popularity,
+            "genre_codes": genre_codes,
+            "genre_group_codes": group_codes,
+        }
+        meta = {
+            "features": list(NUMERIC_FEATURES),
+            "feature_dtype": features.dtype.name,
+            "feature_scale": scale,
+            "feature_error": error,
+            "genres": list(genres),
+            "genre_groups": list(groups),
+            "created_at": time.time(),
+        }
+        return cls(_with_derived_arrays(arrays, meta), meta, version=version)
+
+    def with_feature_dtype(self, feature_dtype: str) -> "CatalogSnapshot":
+        """Copy of this snapshot with ``features`` re-stored as ``feature_dtype``."""
+        features, scale, error = quantize_features(self.dequantized_features(), feature_dtype)
+        arrays = {name: array for name, array in self.arrays.items() if not name.startswith("kd_")}
+        arrays["features"] = features
+        meta = dict(
+            self.meta,
+            feature_dtype=features.dtype.name,
+            feature_scale=scale,
+            feature_error=max(error, self.feature_error),
+        )
+        return CatalogSnapshot(_with_derived_arrays(arrays, meta), meta, version=self.version)
+
+    # ---------- on-disk snapshots ----------
+
+    def save(self, path: str) -> None:
+        """Write the snapshot as an uncompressed ``.npz`` so it can be republished."""
+        meta = dict(self.meta, version=self.version)
+        with open(path, "wb") as fh:
+            np.savez(fh, __meta__=np.array(json.dumps(meta)), **self.arrays)
+
+    @classmethod
+    def load(cls, path: str) -> "CatalogSnapshot":
+        with np.load(path, allow_pickle=False) as data:
+            meta = json.loads(str(data["__meta__"]))
+            arrays = {name: data[name] for name in data.files if name != "__meta__"}
+        return cls(_with_derived_arrays(arrays, meta), meta, version=int(meta.get("version", 0)))
+
+
+def _with_derived_arrays(arrays: dict[str, np.ndarray], meta: Mapping[str, Any]) -> dict[str, np.ndarray]:
+    """Add the indexes derived from the base columns (skipping any already present)."""
+    if "popularity_index" not in arrays:
+        arrays.update(
+            _partition_indexes(
+                arrays["popularity"],
+                arrays["genre_codes"],
+                len(meta.get("genres") or []),
+                arrays["genre_group_codes"],
+                len(meta.get("genre_groups") or []),
+            )
+        )
+    if "kd_perm" not in arrays:
+        scale = np.float32(meta.get("feature_scale", 1.0))
+        arrays.update(build_kdtree(arrays["features"].astype(np.float32) * scale))
+    return arrays
+
+
+def _partition_index(codes: np.ndarray, popularity: np.ndarray, n_codes: int) -> tuple[np.ndarray, np.ndarray]:
+    """
+    CSR-style partition of rows by code, each partition sorted by popularity
+    descending. Rows of code ``c`` are ``index[offsets[c]:offsets[c + 1]]``.
+    """
+    rows = np.flatnonzero(codes >= 0)
+    order = np.lexsort((-popularity[rows], codes[rows]))
+    index = rows[order].astype(np.int32)
+    offsets = np.searchsorted(codes[index], np.arange(n_codes + 1)).astype(np.int64)
+    return index, offsets
+
+
+def _partition_indexes(
+    popularity: np.ndarray,
+    genre_codes: np.ndarray,
+    n_genres: int,
+    group_codes: np.ndarray,
+    n_groups: int,
+) -> dict[str, np.ndarray]:
+    genre_index, genre_offsets = _partition_index(genre_codes, popularity, n_genres)
+    group_index, group_offsets = _partition_index(group_codes, popularity, n_groups)
+    return {
+        "genre_index": genre_index,
+        "genre_offsets": genre_offsets,
+        "group_index": group_index,
+        "group_offsets": group_offsets,
+        "popularity_index": np.argsort(-popularity, kind="stable").astype(np.int32),
+    }
+
+
+class CatalogService:
+    """Loads the `tracks` collection from Firestore into a CatalogSnapshot."""
+
+    FIELDS = ["popularity_norm", "track_genre", "track_genre_group", *NUMERIC_FEATURES]
+
+    def __init__(self) -> None:
+        self.db = get_firestore_client()
+
+    def build_snapshot(self, page_size: int = 5000, feature_dtype: str | None = None) -> CatalogSnapshot:
+        return CatalogSnapshot.from_tracks(
+            self.stream_track_records(page_size=page_size),
+            feature_dtype=feature_dtype,
+        )
+
+    def stream_track_records(self, page_size: int = 5000) -> Iterable[dict[str, Any]]:
+        """Page through `tracks` by document id, fetching only catalog fields."""
+        last_doc = None
+        while True:
+            query = self.db.collection("tracks").select(self.FIELDS).order_by("__name__").limit(page_size)
+            if last_doc is not None:
+                query = query.start_after(last_doc)
+            docs = list(query.stream())
+            for doc in docs:
+                payload = doc.to_dict() or {}
+                payload["track_id"] = doc.id
+                yield payload
+            if len(docs) < page_size:
+                return
+            last_doc = docs[-1]
+
+
+# ---------- shared memory publishing ----------
+
+
+class _AttachedSegment(shared_memory.SharedMemory):
+    """Read-side segment that tolerates collection while arrays still map it."""
+
+    def __del__(self) -> None:
+        try:
+            self.close()
+        except (BufferError, OSError):
+            pass
+
+
+def _untrack(segment: shared_memory.SharedMemory) -> None:
+    """
+    Detach a segment from this process's resource tracker.
+
+    Otherwise the tracker unlinks the segment when the process exits, which
+    would tear the catalog out from under every other worker.
+    """
+    try:
+        resource_tracker.unregister(f"/{segment.name}", "shared_memory")
+    except Exception:  # noqa: BLE001 - tracker bookkeeping is best effort
+        pass
+
+
+def _read_manifest(manifest_path: str) -> dict[str, Any] | None:
+    try:
+        with open(manifest_path, "r", encoding="utf-8") as fh:
+            return json.load(fh)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def publish_catalog(snapshot: CatalogSnapshot, manifest_path: str | None = None) -> int:
+    """
+    Copy the snapshot into a fresh shared-memory segment and swap it in.
+
+    The manifest is replaced atomically, so workers either see the previous
+    version or the new one. The previous segment is unlinked straight away;
+    workers that still map it keep a valid view until they re-attach.
+    Returns the published version.
+    """
+    manifest_path = manifest_path or DEFAULT_MANIFEST_PATH
+    previous = _read_manifest(manifest_path)
+    version = int(previous["version"]) + 1 if previous else 1
+
+    layout: dict[str, dict[str, Any]] = {}
+    offset = 0
+    for name, array in snapshot.arrays.items():
+        array = np.ascontiguousarray(array)
+        layout[name] = {"offset": offset, "dtype": array.dtype.str, "shape": list(array.shape)}
+        offset += -(-array.nbytes // _ALIGNMENT) * _ALIGNMENT
+
+    segment_name = f"{SEGMENT_PREFIX}_{version}_{uuid.uuid4().hex[:8]}"
+    segment = shared_memory.SharedMemory(name=segment_name, create=True, size=max(offset, 1))
+    _untrack(segment)
+    for name, array in snapshot.arrays.items():
+        spec = layout[name]
+        target = np.ndarray(spec["shape"], dtype=spec["dtype"], buffer=segment.buf, offset=spec["offset"])
+        target[...] = array
+        del target
+    segment.close()
+
+    manifest = {
+        "version": version,
+        "segment": segment_name,
+        "size": max(offset, 1),
+        "arrays": layout,
+        "meta": snapshot.meta,
+    }
+    tmp_path = f"{manifest_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as fh:
+        json.dump(manifest, fh)
+    os.replace(tmp_path, manifest_path)
+
+    if previous and previous.get("segment"):
+        unlink_segment(previous["segment"])
+    return version
+
+
+def unlink_segment(name: str) -> None:
+    try:
+        segment = shared_memory.SharedMemory(name=name)
+    except FileNotFoundError:
+        return
+    segment.close()
+    segment.unlink()  # also drops the tracker registration made on attach
+
+
+def attach_catalog(manifest_path: str | None = None) -> tuple[CatalogSnapshot, shared_memory.SharedMemory] | None:
+    """Map the published catalog read-only. Returns None if nothing is published."""
+    manifest = _read_manifest(manifest_path or DEFAULT_MANIFEST_PATH)
+    if not manifest:
+        return None
+    return _attach_manifest(manifest)
+
+
+def _attach_manifest(manifest: Mapping[str, Any]) -> tuple[CatalogSnapshot, shared_memory.SharedMemory] | None:
+    try:
+        segment = _AttachedSegment(name=manifest["segment"])
+    except FileNotFoundError:
+        # Swapped between reading the manifest and attaching; retry next check.
+        return None
+    _untrack(segment)
+
+    arrays: dict[str, np.ndarray] = {}
+    for name, spec in manifest["arrays"].items():
+        # frombuffer holds a buffer export, so the segment cannot be closed
+        # (and unmapped) while any array backed by it is still alive.
+        dtype = np.dtype(spec["dtype"])
+        count = int(np.prod(spec["shape"], dtype=np.int64))
+        array = np.frombuffer(segment.buf, dtype=dtype, count=count, offset=spec["offset"])
+        array = array.reshape(spec["shape"])
+        array.flags.writeable = False
+        arrays[name] = array
+    snapshot = CatalogSnapshot(arrays, manifest.get("meta") or {}, version=int(manifest["version"]))
+    return snapshot, segment
+
+
+# ---------- per-worker access ----------
+
+_lock = threading.Lock()
+_current: CatalogSnapshot | None = None
+_current_segment: shared_memory.SharedMemory | None = None
+_retired_segments: list[shared_memory.SharedMemory] = []
+_manifest_mtime: int | None = None
+_checked_at = 0.0
+
+
+def get_catalog(manifest_path: str | None = None) -> CatalogSnapshot | None:
+    """
+    Return this worker's view of the shared catalog, or None if unpublished.
+
+    The manifest is re-checked at most every CATALOG_REFRESH_SECONDS, so a
+    newly published version is picked up without restarting workers.
+    """
+    global _current, _current_segment, _manifest_mtime, _checked_at
+
+    now = time.monotonic()
+    if now - _checked_at < CATALOG_REFRESH_SECONDS:
+        return _current
+
+    with _lock:
+        if now - _checked_at < CATALOG_REFRESH_SECONDS:
+            return _current
+        _checked_at = now
+
+        path = manifest_path or DEFAULT_MANIFEST_PATH
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            return _current
+        if mtime == _manifest_mtime:
+            return _current
+
+        manifest = _read_manifest(path)
+        if not manifest:
+            return _current
+        if _current is not None and int(manifest["version"]) == _current.version:
+            _manifest_mtime = mtime
+            return _current
+
+        attached = _attach_manifest(manifest)
+        if attached is None:
+            return _current
+
+        if _current_segment is not None:
+            _retired_segments.append(_current_segment)
+        _current, _current_segment = attached
+        _manifest_mtime = mtime
+        _release_retired_segments()
+        return _current
+
+
+def _release_retired_segments() -> None:
+    """Close old mappings once no request still holds arrays backed by them."""
+    still_in_use: list[shared_memory.SharedMemory] = []
+    for segment in _retired_segments:
+        try:
+            segment.close()
+        except BufferError:
+            still_in_use.append(segment)
+    _retired_segments[:] = still_in_use
@@ -0,0 +1,254 @@
+from __future__ import annotations
+
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from typing import Any, Iterable, Mapping
+
+import numpy as np
+
+from app.utils.als import fold_in_user
+
+DEFAULT_EMBEDDINGS_PATH = os.getenv("EMBEDDINGS_PATH") or os.path.join(
+    tempfile.gettempdir(), "bytegoblins-embeddings"
+)
+EMBEDDINGS_REFRESH_SECONDS = float(os.getenv("EMBEDDINGS_REFRESH_SECONDS", "30"))
+EMBEDDING_BLEND = float(os.getenv("EMBEDDING_BLEND", "0.5"))  # weight of the ALS score when re-ranking
+_POINTER = "current.json"
+
+
+class EmbeddingStore:
+    """
+    ALS user and track embeddings memory-mapped from ``.npy`` files.
+
+    ``track_ids`` is sorted (bytes) and aligned with ``item_factors`` rows;
+    workers share the pages through the OS page cache instead of each
+    holding a copy.
+    """
+
+    def __init__(
+        self,
+        usernames: list[str],
+        track_ids: np.ndarray,
+        user_factors: np.ndarray,
+        item_factors: np.ndarray,
+        meta: Mapping[str, Any],
+        version: int = 0,
+    ) -> None:
+        self.usernames = usernames
+        self.track_ids = track_ids
+        self.user_factors = user_factors
+        self.item_factors = item_factors
+        self.meta = dict(meta)
+        self.version = version
+        self._user_lookup = {u: i for i, u in enumerate(usernames)}
+        self._gram: np.ndarray | None = None
+
+    @property
+    def factors(self) -> int:
+        return int(self.item_factors.shape[1])
+
+    @property
+    def gram(self) -> np.ndarray:
+        """``YtY`` over all track factors, shared by every fold-in."""
+        if self._gram is None:
+            items = np.asarray(self.item_factors, dtype=np.float32)
+            self._gram = items.T @ items
+        return self._gram
+
+    def rows_of(self, track_ids: Iterable[str]) -> np.ndarray:
+        """Embedding row per track id, -1 for tracks the model has not seen."""
+        keys = np.array([tid.encode("utf-8") for tid in track_ids], dtype=bytes)
+        if keys.size == 0 or self.track_ids.size == 0:
+            return np.full(keys.size, -1, dtype=np.int64)
+        pos = np.searchsorted(self.track_ids, keys)
+        pos = np.minimum(pos, self.track_ids.size - 1)
+        return np.where(self.track_ids[pos] == keys, pos, -1)
+
+    def user_vector(
+        self,
+        username: str,
+        swipes: Iterable[tuple[str, bool]] | None = None,
+    ) -> np.ndarray | None:
+        """
+        The user's embedding. With ``swipes`` it is folded in fresh against
+        the fixed track factors, so swipes made since training count without
+        retraining; otherwise the trained row is returned (None if unknown).
+        """
+        if swipes is not None:
+            pairs = list(swipes)
+            rows = self.rows_of(tid for tid, _ in pairs)
+            known = rows >= 0
+            if known.any():
+                liked = np.fromiter((is_like for _, is_like in pairs), dtype=bool, count=len(pairs))
+                return fold_in_user(
+                    self.item_factors,
+                    self.gram,
+                    rows[known],
+                    liked[known],
+                    reg=float(self.meta.get("reg", 0.1)),
+                    alpha=float(self.meta.get("alpha", 20.0)),
+                    dislike_weight=float(self.meta.get("dislike_weight", 0.5)),
+                )
+
+        row = self._user_lookup.get(username)
+        if row is None:
+            return None
+        return np.asarray(self.user_factors[row], dtype=np.float32)
+
+    def score(self, track_ids: Iterable[str], vector: np.ndarray) -> np.ndarray:
+        """Predicted preference per track (one mat-vec), NaN for unseen tracks."""
+        rows = self.rows_of(track_ids)
+        scores = np.full(rows.size, np.nan, dtype=np.float32)
+        known = rows >= 0
+        if known.any():
+            scores[known] = np.asarray(self.item_factors[rows[known]], dtype=np.float32) @ vector
+        return scores
+
+
+class EmbeddingService:
+    def rerank(
+        self,
+        username: str,
+        track_ids: list[str],
+        swipes: Iterable[tuple[str, bool]] | None = None,
+        blend: float = EMBEDDING_BLEND,
+    ) -> list[str]:
+        """
+        Re-order an already ranked list by blending its positional score with
+        the user's ALS score. Returns the list unchanged when no embeddings
+        are published or the user has no usable vector.
+        """
+        store = get_embeddings()
+        if store is None or not track_ids:
+            return track_ids
+        vector = store.user_vector(username, swipes)
+        if vector is None or not np.any(vector):
+            return track_ids
+
+        n = len(track_ids)
+        positional = 1.0 - np.arange(n, dtype=np.float32) / n
+        collab = store.score(track_ids, vector)
+        known = ~np.isnan(collab)
+        if not known.any():
+            return track_ids
+
+        lo, hi = collab[known].min(), collab[known].max()
+        normalized = np.zeros(n, dtype=np.float32)
+        if hi > lo:
+            normalized[known] = (collab[known] - lo) / (hi - lo)
+        combined = (1.0 - blend) * positional + blend * normalized
+        order = np.argsort(-combined, kind="stable")
+        return [track_ids[i] for i in order]
+
+
+def save_embeddings(
+    usernames: list[str],
+    track_ids: np.ndarray,
+    user_factors: np.ndarray,
+    item_factors: np.ndarray,
+    meta: Mapping[str, Any],
+    root: str | None = None,
+) -> int:
+    """
+    Write a new embeddings version under ``root`` and point ``current.json``
+    at it (atomic ``os.replace``). Versions older than the previous one are
+    removed; workers still mapping them keep their pages until they reload.
+    """
+    root = root or DEFAULT_EMBEDDINGS_PATH
+    os.makedirs(root, exist_ok=True)
+    previous = _read_pointer(root)
+    version = (int(previous["version"]) + 1) if previous else 1
+    directory = os.path.join(root, f"v{version}")
+    os.makedirs(directory, exist_ok=True)
+
+    np.save(os.path.join(directory, "user_factors.npy"), np.ascontiguousarray(user_factors, dtype=np.float32))
+    np.save(os.path.join(directory, "item_factors.npy"), np.ascontiguousarray(item_factors, dtype=np.float32))
+    np.save(os.path.join(directory, "track_ids.npy"), track_ids)
+    with open(os.path.join(directory, "meta.json"), "w", encoding="utf-8") as fh:
+        json.dump({**meta, "usernames": usernames}, fh)
+
+    tmp_path = os.path.join(root, f".{_POINTER}.{os.getpid()}")
+    with open(tmp_path, "w", encoding="utf-8") as fh:
+        json.dump({"version": version, "path": directory}, fh)
+    os.replace(tmp_path, os.path.join(root, _POINTER))
+
+    keep = {directory, previous.get("path") if previous else None}
+    for name in os.listdir(root):
+        path = os.path.join(root, name)
+        if name.startswith("v") and os.path.isdir(path) and path not in keep:
+            shutil.rmtree(path, ignore_errors=True)
+    return version
+
+
+def load_embeddings(root: str | None = None) -> EmbeddingStore | None:
+    pointer = _read_pointer(root or DEFAULT_EMBEDDINGS_PATH)
+    if not pointer:
+        return None
+    directory = pointer["path"]
+    try:
+        with open(os.path.join(directory, "meta.json"), encoding="utf-8") as fh:
+            meta = json.load(fh)
+        return EmbeddingStore(
+            usernames=list(meta.pop("usernames", [])),
+            track_ids=np.load(os.path.join(directory, "track_ids.npy")),
+            user_factors=np.load(os.path.join(directory, "user_factors.npy"), mmap_mode="r"),
+            item_factors=np.load(os.path.join(directory, "item_factors.npy"), mmap_mode="r"),
+            meta=meta,
+            version=int(pointer["version"]),
+        )
+    except (OSError, ValueError) as exc:
+        print(f"Failed to load embeddings version {pointer.get('version')}: {exc}")
+        return None
+
+
+def _read_pointer(root: str) -> dict[str, Any] | None:
+    try:
+        with open(os.path.join(root, _POINTER), encoding="utf-8") as fh:
+            return json.load(fh)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+# ---------- per-worker embeddings ----------
+
+_lock = threading.Lock()
+_current: EmbeddingStore | None = None
+_pointer_mtime: int | None = None
+_checked_at = 0.0
+
+
+def get_embeddings(root: str | None = None) -> EmbeddingStore | None:
+    """
+    Return this worker's embeddings, or None if none were trained.
+
+    The pointer file is re-checked at most every EMBEDDINGS_REFRESH_SECONDS,
+    so a retrain is picked up without restarting workers.
+    """
+    global _current, _pointer_mtime, _checked_at
+
+    now = time.monotonic()
+    if now - _checked_at < EMBEDDINGS_REFRESH_SECONDS:
+        return _current
+
+    with _lock:
+        if now - _checked_at < EMBEDDINGS_REFRESH_SECONDS:
+            return _current
+        _checked_at = now
+
+        root = root or DEFAULT_EMBEDDINGS_PATH
+        try:
+            mtime = os.stat(os.path.join(root, _POINTER)).st_mtime_ns
+        except FileNotFoundError:
+            return _current
+        if mtime == _pointer_mtime:
+            return _current
+
+        store = load_embeddings(root)
+        if store is not None:
+            _current = store
+            _pointer_mtime = mtime
+        return _current
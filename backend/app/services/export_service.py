@@ -0,0 +1,83 @@
+from __future__ import annotations
+
+import os
+from datetime import datetime
+from typing import Any, Iterator
+
+from app.firebase_client import get_firestore_client
+from app.services.track_service import TrackService
+from app.utils.serialization import to_iso
+
+EXPORT_PAGE_SIZE = int(os.getenv("EXPORT_PAGE_SIZE", "300"))  # docs per cursor page (and per track get_all)
+
+# (record type, subcollection, field holding the track id or None)
+EXPORT_SECTIONS = (
+    ("library", "library", "track_id"),
+    ("swipe", "swipes", "track_id"),
+    ("search_event", "search_events", None),
+)
+
+
+class ExportService:
+    """
+    Streams everything stored for a user as flat records, one Firestore page
+    at a time, so an export of any size holds at most one page of documents
+    (and their tracks) in memory.
+    """
+
+    def __init__(self) -> None:
+        self.db = get_firestore_client()
+        self.track_service = TrackService()
+
+    def iter_user_export(self, username: str, page_size: int = EXPORT_PAGE_SIZE) -> Iterator[dict[str, Any]]:
+        """
+        Yield a ``user`` record, then ``library`` / ``swipe`` /
+        ``search_event`` records (library and swipe records carry the
+        resolved ``track``), and a closing ``summary`` with per-type counts.
+
+        Raises:
+            ValueError if the user does not exist (before anything is yielded).
+        """
+        user_ref = self.db.collection("users").document(username)
+        user_snap = user_ref.get()
+        if not user_snap.exists:
+            raise ValueError("User not found.")
+        return self._records(user_ref, user_snap, page_size)
+
+    def _records(self, user_ref, user_snap, page_size: int) -> Iterator[dict[str, Any]]:
+        yield {**_plain(user_snap.to_dict() or {}), "type": "user", "username": user_snap.id}
+        counts: dict[str, int] = {}
+        for record_type, collection, track_field in EXPORT_SECTIONS:
+            counts[record_type] = 0
+            for page in self._pages(user_ref.collection(collection), page_size):
+                tracks = {}
+                if track_field is not None:
+                    track_ids = dict.fromkeys((doc.to_dict() or {}).get(track_field) or doc.id for doc in page)
+                    tracks = {t.track_id: t for t in self.track_service.get_tracks_by_ids(track_ids)}
+                for doc in page:
+                    data = _plain(doc.to_dict() or {})
+                    record = {**data, "type": record_type, "id": doc.id}
+                    if track_field is not None:
+                        track = tracks.get(data.get(track_field) or doc.id)
+                        record["track"] = track.to_dict() if track else None
+                    counts[record_type] += 1
+                    yield record
+        yield {"type": "summary", "counts": counts}
+
+    @staticmethod
+    def _pages(collection_ref, page_size: int) -> Iterator[list]:
+        """Cursor-paged documents in id order (covers docs lacking a timestamp field)."""
+        query = collection_ref.order_by("__name__").limit(page_size)
+        last_doc = None
+        while True:
+            page = list((query.start_after(last_doc) if last_doc is not None else query).stream())
+            if page:
+                yield page
+            if len(page) < page_size:
+                return
+            last_doc = page[-1]
+
+
+def _plain(data: dict[str, Any]) -> dict[str, Any]:
+    """Firestore doc data with timestamps as ISO strings."""
+    return {key: to_iso(value) if isinstance(value, datetime) else value for key, value in data.items()}
@@ -1,11 +1,18 @@
 from __future__ import annotations
 
+from typing import Iterator
+
 from firebase_admin import firestore
 
 from app.firebase_client import get_firestore_client, server_timestamp
-from app.models import Track
+from app.models import LibraryAggregates, Track
 from app.services.track_service import TrackService
 
+LIBRARY_PAGE_SIZE = 500  # library entries (and track docs) fetched per page when streaming
+MAX_LIBRARY_PAGE = 200  # largest page GET /api/library serves
+MAX_BULK_IDS = 450  # adds + removes per bulk request; one transaction allows 500 writes
+REBUILD_ATTEMPTS = 3  # aggregate rebuilds retried when a library write lands mid-rebuild
+
 
 class LibraryService:
     def __init__(self) -> None:
@@ -13,19 +20,89 @@ class LibraryService:
         self.track_service = TrackService()
 
     def get_library_tracks(self, username: str) -> list[Track]:
+        return list(self.iter_library_tracks(username))
+
+    def iter_library_tracks(self, username: str, page_size: int = LIBRARY_PAGE_SIZE) -> Iterator[Track]:
+        """
+        Yield the user's library tracks, newest first, one page at a time.
+
+        Each page costs one library query and one batched track read, so
+        only ``page_size`` entries are held in memory at once.
+        """
+        library_ref = self.db.collection("users").document(username).collection("library")
+        query = library_ref.order_by("added_at", direction=firestore.Query.DESCENDING).limit(page_size)
+        last_doc = None
+        while True:
+            page = query.start_after(last_doc) if last_doc is not None else query
+            entries = list(page.stream())
+            if not entries:
+                return
+            track_map = {t.track_id: t for t in self.track_service.get_tracks_by_ids(doc.id for doc in entries)}
+            for doc in entries:
+                track = track_map.get(doc.id)
+                if track:
+                    yield track
+            if len(entries) < page_size:
+                return
+            last_doc = entries[-1]
+
+    def get_library_page(
+        self,
+        username: str,
+        limit: int,
+        after: str | None = None,
+    ) -> tuple[list[Track], str | None]:
+        """
+        One page of the library, newest first, and the cursor for the next
+        page (None on the last one). ``after`` is the track id that ended the
+        previous page; only this page's tracks are read.
+
+        Raises:
+            ValueError if ``after`` is no longer in the library.
+        """
+        library_ref = self.db.collection("users").document(username).collection("library")
+        query = library_ref.order_by("added_at", direction=firestore.Query.DESCENDING).limit(limit + 1)
+        if after:
+            cursor = library_ref.document(after).get()
+            if not cursor.exists:
+                raise ValueError("Invalid cursor.")
+            query = query.start_after(cursor)
+
+        entries = list(query.stream())
+        has_more = len(entries) > limit
+        entries = entries[:limit]
+        track_map = {t.track_id: t for t in self.track_service.get_tracks_by_ids(doc.id for doc in entries)}
+        tracks = [track_map[doc.id] for doc in entries if doc.id in track_map]
+        return tracks, (entries[-1].id if has_more and entries else None)
+
+    def library_etag(self, username: str) -> str:
+        """
+        Validator for the library's current contents and order: the
+        aggregates fingerprint (count + id hash) plus the newest ``added_at``,
+        which also moves when a track is re-added. Two small reads.
+        """
+        aggregates = self.get_library_aggregates(username)
+        newest = list(
+            self.db.collection("users")
+            .document(username)
+            .collection("library")
+            .order_by("added_at", direction=firestore.Query.DESCENDING)
+            .select(["added_at"])
+            .limit(1)
+            .stream()
+        )
+        added_at = (newest[0].to_dict() or {}).get("added_at") if newest else None
+        stamp = int(added_at.timestamp() * 1_000_000) if hasattr(added_at, "timestamp") else 0
+        return f"{aggregates.fingerprint}-{stamp}"
+
+    def get_recent_library_track_ids(self, username: str, limit: int = 20) -> list[str]:
         user_ref = self.db.collection("users").document(username)
-        library_ref = user_ref.collection("library").order_by("added_at", direction=firestore.Query.DESCENDING)
-        entries = list(library_ref.stream())
-        track_ids = [doc.id for doc in entries]
-        tracks = self.track_service.get_tracks_by_ids(track_ids)
-        track_map = {track.track_id: track for track in tracks}
-        ordered_tracks: list[Track] = []
-        for doc in entries:
-            track_id = doc.id
-            track = track_map.get(track_id)
-            if track:
-                ordered_tracks.append(track)
-        return ordered_tracks
+        query = (
+            user_ref.collection("library")
+            .order_by("added_at", direction=firestore.Query.DESCENDING)
+            .limit(limit)
+        )
+        return [doc.id for doc in query.stream()]
 
     def add_to_library(
         self,
@@ -40,8 +117,24 @@ class LibraryService:
 
         user_ref = self.db.collection("users").document(username)
         library_ref = user_ref.collection("library").document(track_id)
+        aggregates_ref = self._aggregates_ref(username)
         now = server_timestamp()
-        library_ref.set({"track_id": track_id, "added_at": now, "source": source}, merge=True)
+
+        @firestore.transactional
+        def _add(transaction) -> None:
+            existing = library_ref.get(transaction=transaction)
+            aggregates = _read_aggregates(aggregates_ref, transaction)
+            transaction.set(library_ref, {"track_id": track_id, "added_at": now, "source": source}, merge=True)
+            # Re-adding only bumps added_at
+            if existing.exists:
+                return
+            if aggregates is None or aggregates.stale:
+                _mark_aggregates_stale(transaction, aggregates_ref, aggregates)
+                return
+            aggregates.add(track)
+            _write_aggregates(transaction, aggregates_ref, aggregates)
+
+        _add(self.db.transaction())
 
         if search_event_id:
             user_ref.collection("search_events").document(search_event_id).set(
@@ -59,9 +152,180 @@ class LibraryService:
         username_norm = username.lower()
         user_ref = self.db.collection("users").document(username_norm)
         doc_ref = user_ref.collection("library").document(track_id)
+        aggregates_ref = self._aggregates_ref(username_norm)
+        track = self.track_service.get_track(track_id)
+
+        @firestore.transactional
+        def _remove(transaction) -> None:
+            snap = doc_ref.get(transaction=transaction)
+            if not snap.exists:
+                raise ValueError("Track not found in library.")
+            aggregates = _read_aggregates(aggregates_ref, transaction)
+            transaction.delete(doc_ref)
+            # Can't subtract a track we can't read; rebuild on next read instead
+            if aggregates is None or aggregates.stale or track is None:
+                _mark_aggregates_stale(transaction, aggregates_ref, aggregates)
+                return
+            aggregates.remove(track)
+            _write_aggregates(transaction, aggregates_ref, aggregates)
+
+        _remove(self.db.transaction())
+
+    def bulk_update_library(
+        self,
+        username: str,
+        add_ids: list[str],
+        remove_ids: list[str],
+        source: str = "manual",
+    ) -> list[dict[str, str]]:
+        """
+        Add and remove many tracks at once: one batched track read, one
+        batched library read and a single commit that also updates the
+        aggregates. Returns ``{"trackId", "op", "status"}`` per id, in
+        request order. Statuses: ``added`` / ``already_in_library`` /
+        ``not_found`` for adds, ``removed`` / ``not_in_library`` for removes,
+        and ``conflict`` for an id listed under both.
+
+        Raises:
+            ValueError if more than MAX_BULK_IDS ids are given.
+        """
+        add_ids = list(dict.fromkeys(add_ids))
+        remove_ids = list(dict.fromkeys(remove_ids))
+        if len(add_ids) + len(remove_ids) > MAX_BULK_IDS:
+            raise ValueError(f"At most {MAX_BULK_IDS} track ids per request.")
+        conflicts = set(add_ids) & set(remove_ids)
+        ops = [(tid, "add") for tid in add_ids] + [(tid, "remove") for tid in remove_ids]
+        if not ops:
+            return []
+
+        track_map = {t.track_id: t for t in self.track_service.get_tracks_by_ids(dict.fromkeys(tid for tid, _ in ops))}
+        library_ref = self.db.collection("users").document(username).collection("library")
+        aggregates_ref = self._aggregates_ref(username)
+        live_ops = [(tid, op) for tid, op in ops if tid not in conflicts]
+        now = server_timestamp()
+        statuses: dict[tuple[str, str], str] = {}
+
+        @firestore.transactional
+        def _apply(transaction) -> None:
+            statuses.clear()
+            refs = [library_ref.document(tid) for tid, _ in live_ops]
+            present = {snap.id for snap in self.db.get_all(refs, transaction=transaction) if snap.exists} if refs else set()
+            aggregates = _read_aggregates(aggregates_ref, transaction)
+            stale_aggregates = False
+            for tid, op in live_ops:
+                track = track_map.get(tid)
+                if op == "add":
+                    if track is None:
+                        statuses[(tid, op)] = "not_found"
+                        continue
+                    transaction.set(library_ref.document(tid), {"track_id": tid, "added_at": now, "source": source}, merge=True)
+                    if tid in present:
+                        statuses[(tid, op)] = "already_in_library"
+                        continue
+                    statuses[(tid, op)] = "added"
+                    if aggregates is not None:
+                        aggregates.add(track)
+                else:
+                    if tid not in present:
+                        statuses[(tid, op)] = "not_in_library"
+                        continue
+                    transaction.delete(library_ref.document(tid))
+                    statuses[(tid, op)] = "removed"
+                    if track is None:
+                        stale_aggregates = True
+                    elif aggregates is not None:
+                        aggregates.remove(track)
+            if not any(s in ("added", "removed") for s in statuses.values()):
+                return
+            if aggregates is None or aggregates.stale or stale_aggregates:
+                # Can't subtract a track we can't read; rebuild on next read instead
+                _mark_aggregates_stale(transaction, aggregates_ref, aggregates)
+            else:
+                _write_aggregates(transaction, aggregates_ref, aggregates)
+
+        if live_ops:
+            _apply(self.db.transaction())
+        return [
+            {"trackId": tid, "op": op, "status": "conflict" if tid in conflicts else statuses[(tid, op)]}
+            for tid, op in ops
+        ]
+
+    # ---------- aggregates ----------
+
+    def get_library_aggregates(self, username: str) -> LibraryAggregates:
+        """
+        The user's library aggregates: one document read, with a full rebuild
+        when the doc is missing (libraries from before it existed), is a
+        stale marker, or too many top tracks were removed.
+        """
+        aggregates = _read_aggregates(self._aggregates_ref(username))
+        if aggregates is not None and not aggregates.needs_rebuild:
+            return aggregates
+        return self.rebuild_library_aggregates(username, expected_version=aggregates.version if aggregates else 0)
+
+    def rebuild_library_aggregates(self, username: str, expected_version: int | None = None) -> LibraryAggregates:
+        """
+        Recompute the aggregates by streaming the library and store them,
+        unless a library write bumped the doc's version in the meantime. In
+        that case the rebuild starts over, up to ``REBUILD_ATTEMPTS`` times;
+        the last rebuilt values are returned to the caller either way.
+        """
+        aggregates_ref = self._aggregates_ref(username)
+        aggregates = LibraryAggregates()
+
+        @firestore.transactional
+        def _store(transaction, expected: int) -> bool:
+            current = _read_aggregates(aggregates_ref, transaction)
+            if (current.version if current else 0) != expected:
+                return False
+            aggregates.version = expected
+            _write_aggregates(transaction, aggregates_ref, aggregates)
+            return True
+
+        for attempt in range(REBUILD_ATTEMPTS):
+            if expected_version is None:
+                current = _read_aggregates(aggregates_ref)
+                if attempt and current is not None and not current.needs_rebuild:
+                    return current  # another rebuild stored newer sums first
+                expected_version = current.version if current else 0
+
+            aggregates = LibraryAggregates()
+            for track in self.iter_library_tracks(username):
+                aggregates.add(track)
+            if _store(self.db.transaction(), expected_version):
+                return aggregates
+            expected_version = None
+
+        print(f"Library aggregates for {username} kept changing during rebuild; not stored")
+        return aggregates
+
+    def _aggregates_ref(self, username: str):
+        return (
+            self.db.collection("users")
+            .document(username)
+            .collection("analytics")
+            .document("library_aggregates")
+        )
+
+
+def _read_aggregates(ref, transaction=None) -> LibraryAggregates | None:
+    snap = ref.get(transaction=transaction)
+    if not snap.exists:
+        return None
+    return LibraryAggregates.from_mapping(snap.to_dict() or {})
+
+
+def _mark_aggregates_stale(transaction, ref, aggregates: LibraryAggregates | None) -> None:
+    """
+    Replace the doc with a version-bumped stale marker. A rebuild that read
+    the library before this write then fails its version check and retries,
+    instead of storing sums that miss this change.
+    """
+    marker = LibraryAggregates(version=aggregates.version if aggregates else 0, stale=True)
+    _write_aggregates(transaction, ref, marker)
 
-        snap = doc_ref.get()
-        if not snap.exists:
-            raise ValueError("Track not found in library.")
 
-        doc_ref.delete()
+def _write_aggregates(transaction, ref, aggregates: LibraryAggregates) -> None:
+    """Write the whole doc (no merge, so emptied genre buckets disappear) with a version bump."""
+    aggregates.version += 1
+    transaction.set(ref, {**aggregates.to_dict(), "updated_at": server_timestamp()})
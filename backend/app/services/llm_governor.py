@@ -0,0 +1,249 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import Counter, OrderedDict, deque
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FutureTimeout
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator
+
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "20"))  # queueing + call, per request
+LLM_MAX_IN_FLIGHT = int(os.getenv("LLM_MAX_IN_FLIGHT", "8"))  # concurrent LLM calls per worker process
+LLM_CACHE_SIZE = int(os.getenv("LLM_CACHE_SIZE", "1024"))
+LLM_CACHE_TTL_SECONDS = float(os.getenv("LLM_CACHE_TTL_SECONDS", str(24 * 3600)))
+_TIMING_WINDOW = 512  # recent samples kept for the latency percentiles
+
+
+class LLMTimeout(TimeoutError):
+    """The request's deadline passed while waiting for a slot or for the model."""
+
+
+class LLMGovernor:
+    """
+    Guards every chat completion a worker makes.
+
+    - Deadline: queueing plus the call must finish within the request's
+      timeout (LLM_TIMEOUT_SECONDS); otherwise LLMTimeout is raised and the
+      caller falls back to rule-based text.
+    - Concurrency: at most LLM_MAX_IN_FLIGHT calls run at once; time spent
+      waiting for a slot is recorded.
+    - Cache: responses are stored under a hash of the exact request (model,
+      temperature, messages), so identical prompts are paid for once, and
+      concurrent identical prompts share one call.
+    """
+
+    def __init__(
+        self,
+        max_in_flight: int = LLM_MAX_IN_FLIGHT,
+        timeout: float = LLM_TIMEOUT_SECONDS,
+        cache_size: int = LLM_CACHE_SIZE,
+        cache_ttl: float = LLM_CACHE_TTL_SECONDS,
+    ) -> None:
+        self.max_in_flight = max_in_flight
+        self.timeout = timeout
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+        self._slots = threading.BoundedSemaphore(max_in_flight)
+        self._lock = threading.Lock()
+        self._cache: "OrderedDict[str, tuple[float, str]]" = OrderedDict()
+        self._pending: dict[str, Future] = {}
+        self._in_flight = 0
+        self._counters: Counter = Counter()
+        self._queue_waits: deque[float] = deque(maxlen=_TIMING_WINDOW)
+        self._call_times: deque[float] = deque(maxlen=_TIMING_WINDOW)
+
+    # ---------- calls ----------
+
+    def complete(
+        self,
+        client: Any,
+        messages: list[dict[str, str]],
+        model: str = "gpt-4o-mini",
+        temperature: float = 0.8,
+        timeout: float | None = None,
+        validate: Callable[[str], bool] | None = None,
+    ) -> str:
+        """
+        Message content of one chat completion, from the cache when possible.
+        Only responses passing ``validate`` are cached.
+        """
+        deadline = time.monotonic() + (timeout or self.timeout)
+        key = prompt_key(model, temperature, messages)
+        cached = self._cached(key)
+        if cached is not None:
+            return cached
+
+        with self._lock:
+            pending = self._pending.get(key)
+            leader = pending is None
+            if leader:
+                pending = self._pending[key] = Future()
+        if not leader:
+            self._count("shared")
+            try:
+                return pending.result(timeout=max(0.0, deadline - time.monotonic()))
+            except FutureTimeout:
+                self._count("timeouts")
+                raise LLMTimeout("Timed out waiting for an identical LLM request.") from None
+
+        try:
+            with self._slot(deadline):
+                started = time.monotonic()
+                try:
+                    resp = client.with_options(max_retries=0).chat.completions.create(
+                        model=model,
+                        messages=messages,
+                        temperature=temperature,
+                        timeout=max(0.1, deadline - started),
+                    )
+                except Exception as exc:
+                    self._count_failure(exc)
+                    raise
+                self._record_call(started)
+            content = resp.choices[0].message.content or ""
+            if validate is None or validate(content):
+                self._store(key, content)
+            pending.set_result(content)
+            return content
+        except BaseException as exc:
+            pending.set_exception(exc)
+            raise
+        finally:
+            with self._lock:
+                self._pending.pop(key, None)
+
+    def stream(
+        self,
+        client: Any,
+        messages: list[dict[str, str]],
+        model: str = "gpt-4o-mini",
+        temperature: float = 0.8,
+        timeout: float | None = None,
+        validate: Callable[[str], bool] | None = None,
+    ) -> Iterator[str]:
+        """
+        Text pieces of a streamed chat completion. A cached response is
+        yielded in one piece; a fresh one holds a slot until the stream ends
+        and raises LLMTimeout if the deadline passes mid-stream.
+        """
+        deadline = time.monotonic() + (timeout or self.timeout)
+        key = prompt_key(model, temperature, messages)
+        cached = self._cached(key)
+        if cached is not None:
+            yield cached
+            return
+
+        parts: list[str] = []
+        with self._slot(deadline):
+            started = time.monotonic()
+            try:
+                chunks = client.with_options(max_retries=0).chat.completions.create(
+                    model=model,
+                    messages=messages,
+                    temperature=temperature,
+                    stream=True,
+                    timeout=max(0.1, deadline - started),
+                )
+                for chunk in chunks:
+                    if time.monotonic() > deadline:
+                        raise LLMTimeout("LLM stream passed its deadline.")
+                    text = chunk.choices[0].delta.content if chunk.choices else None
+                    if text:
+                        parts.append(text)
+                        yield text
+            except Exception as exc:
+                self._count_failure(exc)
+                raise
+            self._record_call(started)
+
+        content = "".join(parts)
+        if validate is None or validate(content):
+            self._store(key, content)
+
+    # ---------- metrics ----------
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "inFlight": self._in_flight,
+                "maxInFlight": self.max_in_flight,
+                "cached": len(self._cache),
+                **dict(self._counters),
+                "queueWaitMs": _percentiles(self._queue_waits),
+                "callMs": _percentiles(self._call_times),
+            }
+
+    # ---------- internals ----------
+
+    @contextmanager
+    def _slot(self, deadline: float) -> Iterator[None]:
+        queued_at = time.monotonic()
+        if not self._slots.acquire(timeout=max(0.0, deadline - queued_at)):
+            self._count("timeouts")
+            raise LLMTimeout("Timed out waiting for an LLM slot.")
+        with self._lock:
+            self._queue_waits.append(time.monotonic() - queued_at)
+            self._in_flight += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+            self._slots.release()
+
+    def _cached(self, key: str) -> str | None:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is not None and now - entry[0] <= self.cache_ttl:
+                self._cache.move_to_end(key)
+                self._counters["cacheHits"] += 1
+                return entry[1]
+            if entry is not None:
+                del self._cache[key]
+            self._counters["cacheMisses"] += 1
+            return None
+
+    def _store(self, key: str, content: str) -> None:
+        with self._lock:
+            self._cache[key] = (time.monotonic(), content)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def _record_call(self, started: float) -> None:
+        with self._lock:
+            self._call_times.append(time.monotonic() - started)
+            self._counters["calls"] += 1
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._counters[name] += 1
+
+    def _count_failure(self, exc: Exception) -> None:
+        # openai.APITimeoutError and httpx timeouts both carry "Timeout" in the type name
+        self._count("timeouts" if isinstance(exc, TimeoutError) or "Timeout" in type(exc).__name__ else "errors")
+
+
+def prompt_key(model: str, temperature: float, messages: list[dict[str, str]]) -> str:
+    """Content address of a chat request."""
+    payload = json.dumps({"model": model, "temperature": temperature, "messages": messages}, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _percentiles(samples: deque[float]) -> dict[str, float | None]:
+    if not samples:
+        return {"p50": None, "p95": None}
+    ordered = sorted(samples)
+
+    def pick(q: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 1)
+
+    return {"p50": pick(0.5), "p95": pick(0.95)}
+
+
+llm_governor = LLMGovernor()
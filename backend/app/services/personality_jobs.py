@@ -0,0 +1,212 @@
+from __future__ import annotations
+
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Any
+
+from flask import current_app
+
+from app.firebase_client import get_firestore_client, server_timestamp
+from app.services.personality_service import PersonalityService
+
+PERSONALITY_WORKERS = int(os.getenv("PERSONALITY_WORKERS", "4"))
+PERSONALITY_QUEUE_LIMIT = int(os.getenv("PERSONALITY_QUEUE_LIMIT", "64"))  # queued + running jobs per worker process
+PERSONALITY_JOB_TTL_SECONDS = 10 * 60  # finished jobs stay pollable from worker memory this long
+# A queued/running job older than this is treated as failed (its worker died or hung) and can be resubmitted
+PERSONALITY_JOB_STALE_SECONDS = int(os.getenv("PERSONALITY_JOB_STALE_SECONDS", str(5 * 60)))
+PERSONALITY_JOB_RETENTION_SECONDS = 24 * 60 * 60  # personality_jobs docs get expire_at this far past submission
+STALE_JOB_ERROR = "Job did not finish in time; submit it again."
+
+_executor = ThreadPoolExecutor(max_workers=PERSONALITY_WORKERS, thread_name_prefix="personality")
+_slots = threading.BoundedSemaphore(PERSONALITY_QUEUE_LIMIT)
+_lock = threading.Lock()
+_jobs: dict[str, "PersonalityJob"] = {}
+_active_by_user: dict[str, str] = {}  # username -> job id of its queued/running job
+
+
+@dataclass(slots=True)
+class PersonalityJob:
+    job_id: str
+    username: str
+    status: str = "queued"  # queued | running | done | failed
+    result: dict[str, Any] | None = None
+    error: str | None = None
+    started_at: float = field(default_factory=time.time)  # epoch seconds at submission
+    finished_at: float | None = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("done", "failed")
+
+    @property
+    def stale(self) -> bool:
+        return not self.finished and time.time() - self.started_at > PERSONALITY_JOB_STALE_SECONDS
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "jobId": self.job_id,
+            "username": self.username,
+            "status": self.status,
+            "result": self.result,
+            "error": self.error,
+        }
+
+    @classmethod
+    def from_mapping(cls, job_id: str, data: dict[str, Any]) -> "PersonalityJob":
+        return cls(
+            job_id=job_id,
+            username=data.get("username", ""),
+            status=data.get("status", "queued"),
+            result=data.get("result"),
+            error=data.get("error"),
+            started_at=float(data.get("started_at") or 0.0),
+        )
+
+
+class PersonalityJobService:
+    """
+    Runs ``PersonalityService.compute_for_user`` on a bounded per-worker
+    thread pool so the LLM round trip doesn't hold a request worker.
+
+    A user has at most one queued/running job per worker: repeated submits
+    return it, unless it is older than ``PERSONALITY_JOB_STALE_SECONDS``, in
+    which case it is failed and replaced. Job state is mirrored to
+    ``personality_jobs/{job_id}`` so a poll that lands on another worker
+    still finds it; a mirrored job that stopped updating reads as failed.
+    Docs carry ``expire_at`` for a Firestore TTL policy, and
+    ``delete_expired`` removes them where no policy is set up.
+    """
+
+    def __init__(self) -> None:
+        self.db = get_firestore_client()
+
+    def submit(self, username: str) -> PersonalityJob:
+        """
+        Enqueue (or join) the user's personality job.
+
+        Raises:
+            RuntimeError if the pool is saturated.
+        """
+        username = username.lower()
+        with _lock:
+            _prune_finished()
+            active = _active_by_user.get(username)
+            if active is not None:
+                if not _jobs[active].stale:
+                    return _jobs[active]
+                # Hung job: its thread still holds a slot until it returns
+                _finish_locked(_jobs[active], "failed", error=STALE_JOB_ERROR)
+            if not _slots.acquire(blocking=False):
+                raise RuntimeError("Personality workers are busy.")
+            job = PersonalityJob(job_id=uuid.uuid4().hex, username=username)
+            _jobs[job.job_id] = job
+            _active_by_user[username] = job.job_id
+
+        app = current_app._get_current_object()
+        try:
+            self._mirror(job)
+            _executor.submit(self._run, app, job)
+        except Exception:
+            _finish(job, "failed", error="Could not start the job.")
+            _slots.release()
+            raise
+        return job
+
+    def get(self, job_id: str) -> PersonalityJob | None:
+        with _lock:
+            job = _jobs.get(job_id)
+            if job is not None:
+                if job.stale:
+                    _finish_locked(job, "failed", error=STALE_JOB_ERROR)
+                return job
+        snap = self.db.collection("personality_jobs").document(job_id).get()
+        if not snap.exists:
+            return None
+        job = PersonalityJob.from_mapping(job_id, snap.to_dict() or {})
+        if job.stale:
+            # The worker running it died before mirroring the outcome
+            job.status, job.error = "failed", STALE_JOB_ERROR
+        return job
+
+    def delete_expired(self, batch_size: int = 400) -> int:
+        """Delete ``personality_jobs`` docs past their ``expire_at``; returns how many."""
+        query = (
+            self.db.collection("personality_jobs")
+            .where("expire_at", "<", datetime.now(timezone.utc))
+            .limit(batch_size)
+        )
+        deleted = 0
+        while True:
+            docs = list(query.select([]).stream())
+            if not docs:
+                return deleted
+            batch = self.db.batch()
+            for doc in docs:
+                batch.delete(doc.reference)
+            batch.commit()
+            deleted += len(docs)
+
+    def _run(self, app, job: PersonalityJob) -> None:
+        try:
+            with app.app_context():
+                with _lock:
+                    if job.finished:  # failed as stale while it sat in the queue
+                        return
+                    job.status = "running"
+                self._mirror(job)
+                try:
+                    result = PersonalityService().compute_for_user(job.username)
+                except Exception as exc:  # noqa: BLE001
+                    print(f"Personality job {job.job_id} for {job.username} failed: {exc}")
+                    _finish(job, "failed", error="Failed to compute personality")
+                else:
+                    _finish(job, "done", result=result.to_dict())
+                self._mirror(job)
+        except Exception as exc:  # noqa: BLE001 - mirroring is best effort
+            print(f"Failed to record personality job {job.job_id}: {exc}")
+        finally:
+            if not job.finished:
+                _finish(job, "failed", error="Failed to compute personality")
+            _slots.release()
+
+    def _mirror(self, job: PersonalityJob) -> None:
+        expire_at = datetime.fromtimestamp(job.started_at, timezone.utc) + timedelta(
+            seconds=PERSONALITY_JOB_RETENTION_SECONDS
+        )
+        payload = {
+            **job.to_dict(),
+            "started_at": job.started_at,
+            "expire_at": expire_at,
+            "updated_at": server_timestamp(),
+        }
+        payload.pop("jobId")
+        self.db.collection("personality_jobs").document(job.job_id).set(payload)
+
+
+def _finish(job: PersonalityJob, status: str, result: dict[str, Any] | None = None, error: str | None = None) -> None:
+    with _lock:
+        _finish_locked(job, status, result, error)
+
+
+def _finish_locked(
+    job: PersonalityJob, status: str, result: dict[str, Any] | None = None, error: str | None = None
+) -> None:
+    """``_finish`` for callers already holding ``_lock``."""
+    job.status = status
+    job.result = result
+    job.error = error
+    job.finished_at = time.monotonic()
+    if _active_by_user.get(job.username) == job.job_id:
+        del _active_by_user[job.username]
+
+
+def _prune_finished() -> None:
+    """Drop finished jobs older than the TTL; caller holds ``_lock``."""
+    cutoff = time.monotonic() - PERSONALITY_JOB_TTL_SECONDS
+    for job_id in [j for j, job in _jobs.items() if job.finished_at is not None and job.finished_at < cutoff]:
+        del _jobs[job_id]
@@ -1,17 +1,34 @@
 from __future__ import annotations
 
-from collections import Counter
-from typing import Any, Iterable
-import math
+from dataclasses import dataclass
+from typing import Any, Iterator
 import os
 import json
 
 from openai import OpenAI
 
 from app.firebase_client import get_firestore_client, server_timestamp
-from app.models.personality import PersonalityMetrics, PersonalityResult
+from app.models.personality import REPRESENTATIVE_TRACKS, LibraryAggregates, PersonalityMetrics, PersonalityResult
 from app.models.track import Track
 from app.services.library_service import LibraryService
+from app.services.llm_governor import llm_governor
+from app.utils.json_stream import JsonFieldStreamer
+
+STREAMED_FIELDS = ("shortDescription", "longDescription")
+
+
+@dataclass(slots=True)
+class PersonalityPlan:
+    """Everything needed to produce a user's personality except the LLM call (picklable)."""
+
+    username: str
+    fingerprint: str
+    context: dict[str, Any]  # keyword arguments shared by the prompt, fallback and result builders
+    messages: list[dict[str, str]]
+
+    @property
+    def prompt_chars(self) -> int:
+        return sum(len(m["content"]) for m in self.messages)
 
 
 class PersonalityService:
@@ -23,97 +40,171 @@ class PersonalityService:
         self.MUSIC_PERSONA_TITLE = "Your Music Persona"
 
         api_key = os.getenv("OPENAI_API_KEY")
+        # OPENAI_BASE_URL points the client at another OpenAI-compatible server
+        # (e.g. app/scripts/openai_stub.py for local testing)
+        base_url = os.getenv("OPENAI_BASE_URL") or None
         # if no key, client will raise on use; we guard before calling
-        self._openai_client = OpenAI(api_key=api_key) if api_key else None
+        self._openai_client = OpenAI(api_key=api_key, base_url=base_url) if api_key else None
+        self._llm_failed = False  # set when the last LLM call fell back to rule-based text
 
     # ---------- public API ----------
 
     def compute_for_user(self, username: str) -> PersonalityResult:
         username = username.lower()
 
-        tracks = self.library_service.get_library_tracks(username)
-        if not tracks:
-            metrics = PersonalityMetrics(
-                avg_energy=0.5,
-                avg_valence=0.5,
-                avg_popularity_norm=0.5,
-                genre_diversity=0.0,
-                top_genres=[],
-            )
-            result = self._build_archetype(username, metrics, [], use_llm=False)
-            return result
+        aggregates = self.library_service.get_library_aggregates(username)
+        cached = self._cached_result(username, aggregates)
+        if cached is not None:
+            return cached
 
-        metrics = self._compute_metrics(tracks)
-        representative_tracks = self._pick_representative_tracks(tracks)
+        metrics = self._compute_metrics(aggregates)
+        representative_tracks = self._pick_representative_tracks(aggregates)
 
+        self._llm_failed = False
         result = self._build_archetype(
             username=username,
             metrics=metrics,
             representative_tracks=representative_tracks,
             use_llm=True,
         )
-        self._save_personality(username, result)
+        # A fallback written because the LLM errored is not worth keeping as a cache hit
+        self._save_personality(username, result, None if self._llm_failed else aggregates.fingerprint)
         return result
 
-    # ---------- core logic ----------
+    def stream_for_user(self, username: str) -> Iterator[tuple[str, dict[str, Any]]]:
+        """
+        Personality as a sequence of ``(event, payload)`` pairs for SSE:
 
-    def _compute_metrics(self, tracks: Iterable[Track]) -> PersonalityMetrics:
-        energies: list[float] = []
-        valences: list[float] = []
-        pops: list[float] = []
-        genres: list[str] = []
-
-        for t in tracks:
-            if t.energy is not None:
-                energies.append(float(t.energy))
-            if t.valence is not None:
-                valences.append(float(t.valence))
-            if t.popularity_norm is not None:
-                pops.append(float(t.popularity_norm))
-            g = t.track_genre_group or t.track_genre
-            if g:
-                genres.append(g)
-
-        def _avg(xs: list[float], default: float = 0.5) -> float:
-            return sum(xs) / len(xs) if xs else default
-
-        avg_energy = _avg(energies)
-        avg_valence = _avg(valences)
-        avg_pop_norm = _avg(pops)
-
-        if genres:
-            counts = Counter(genres)
-            total = sum(counts.values())
-            entropy = 0.0
-            for c in counts.values():
-                p = c / total
-                entropy -= p * math.log(p + 1e-12)
-            max_entropy = math.log(len(counts))
-            diversity = entropy / max_entropy if max_entropy > 0 else 0.0
-            top_genres = [g for g, _ in counts.most_common(3)]
-        else:
-            diversity = 0.0
-            top_genres = []
-
-        return PersonalityMetrics(
-            avg_energy=avg_energy,
-            avg_valence=avg_valence,
-            avg_popularity_norm=avg_pop_norm,
-            genre_diversity=diversity,
-            top_genres=top_genres,
+        - ``fallback``: the rule-based result, sent before any LLM work;
+        - ``delta``: ``{"field", "text"}`` pieces of the LLM's
+          shortDescription / longDescription as tokens arrive;
+        - ``error``: the LLM failed (the fallback stands);
+        - ``result``: the final result, saved like ``compute_for_user``.
+
+        A still-valid saved result is sent as ``result`` straight away.
+        """
+        username = username.lower()
+        aggregates = self.library_service.get_library_aggregates(username)
+        cached = self._cached_result(username, aggregates)
+        if cached is not None:
+            yield "result", cached.to_dict()
+            return
+
+        context = self._llm_context(username, aggregates)
+        fallback = self._fallback_for(context)
+        yield "fallback", fallback.to_dict()
+
+        result, fingerprint = fallback, aggregates.fingerprint
+        if self._openai_client is not None:
+            extractor = JsonFieldStreamer(STREAMED_FIELDS)
+            content: list[str] = []
+            try:
+                pieces = llm_governor.stream(
+                    self._openai_client,
+                    self._llm_messages(**context),
+                    model="gpt-4o-mini",
+                    temperature=0.8,
+                    validate=_is_json_object,
+                )
+                for text in pieces:
+                    content.append(text)
+                    for field, piece in extractor.feed(text):
+                        yield "delta", {"field": field, "text": piece}
+                result = self._result_from_llm(json.loads("".join(content)), **context)
+            except Exception as exc:  # noqa: BLE001
+                print("LLM personality streaming failed:", exc)
+                fingerprint = None
+                yield "error", {"error": "LLM personality generation failed"}
+
+        self._save_personality(username, result, fingerprint)
+        yield "result", result.to_dict()
+
+    def plan_for_user(self, username: str, force: bool = False) -> PersonalityPlan | None:
+        """
+        Load a user's library summary and build the LLM request for it.
+        Returns None when there is nothing to recompute: an empty library,
+        or (unless ``force``) a saved result for the same library.
+        """
+        username = username.lower()
+        aggregates = self.library_service.get_library_aggregates(username)
+        if not aggregates.track_count:
+            return None
+        if not force and self._load_personality(username, aggregates.fingerprint) is not None:
+            return None
+        context = self._llm_context(username, aggregates)
+        return PersonalityPlan(
+            username=username,
+            fingerprint=aggregates.fingerprint,
+            context=context,
+            messages=self._llm_messages(**context),
         )
 
-    def _pick_representative_tracks(self, tracks: Iterable[Track]) -> list[Track]:
+    def generate(self, plan: PersonalityPlan) -> tuple[PersonalityResult, bool]:
+        """
+        Run the LLM for a plan. Returns ``(result, cacheable)``; on failure
+        the result is the rule-based fallback and ``cacheable`` is False.
+        """
+        if self._openai_client is None:
+            return self._fallback_for(plan.context), True
+        try:
+            content = self._complete(plan.messages)
+            return self._result_from_llm(json.loads(content), **plan.context), True
+        except Exception as exc:  # noqa: BLE001
+            print(f"LLM personality generation failed for {plan.username}:", exc)
+            return self._fallback_for(plan.context), False
+
+    def get_cached_result(self, username: str) -> PersonalityResult | None:
+        """
+        The result ``compute_for_user`` would return without calling the
+        LLM: the default card for an empty library, or the saved result
+        while the library is unchanged. None when a full compute is needed.
+        """
+        username = username.lower()
+        return self._cached_result(username, self.library_service.get_library_aggregates(username))
+
+    def _cached_result(self, username: str, aggregates: LibraryAggregates) -> PersonalityResult | None:
+        if not aggregates.track_count:
+            metrics = PersonalityMetrics(
+                avg_energy=0.5,
+                avg_valence=0.5,
+                avg_popularity_norm=0.5,
+                genre_diversity=0.0,
+                top_genres=[],
+            )
+            return self._build_archetype(username, metrics, [], use_llm=False)
+        return self._load_personality(username, aggregates.fingerprint)
+
+    # ---------- core logic ----------
+
+    def _llm_context(self, username: str, aggregates: LibraryAggregates) -> dict[str, Any]:
+        metrics = self._compute_metrics(aggregates)
+        archetype_id, title, base_short = self._select_archetype(metrics)
+        return {
+            "username": username,
+            "metrics": metrics,
+            "archetype_id": archetype_id,
+            "title": title,
+            "base_short": base_short,
+            "base_long": self._build_base_long_description(title, base_short, metrics),
+            "representative_tracks": self._pick_representative_tracks(aggregates),
+        }
+
+    def _fallback_for(self, context: dict[str, Any]) -> PersonalityResult:
+        result = self._fallback_personality(**context)
+        result.title = self.MUSIC_PERSONA_TITLE
+        return result
+
+    def _compute_metrics(self, aggregates: LibraryAggregates) -> PersonalityMetrics:
+        return aggregates.to_metrics()
+
+    def _pick_representative_tracks(self, aggregates: LibraryAggregates) -> list[Track]:
         """
         Pick a small set of representative tracks (as full Track objects),
         biased towards higher popularity so they're recognizable.
         """
-        sorted_tracks = sorted(
-            tracks,
-            key=lambda t: (t.popularity_norm or 0.0),
-            reverse=True,
-        )
-        return list(sorted_tracks[:6])
+        track_ids = aggregates.top_track_ids(REPRESENTATIVE_TRACKS)
+        track_map = {t.track_id: t for t in self.library_service.track_service.get_tracks_by_ids(track_ids)}
+        return [track_map[tid] for tid in track_ids if tid in track_map]
 
     def _build_archetype(
         self,
@@ -122,6 +213,38 @@ class PersonalityService:
         representative_tracks: list[Track],
         use_llm: bool = True,
     ) -> PersonalityResult:
+        archetype_id, title, base_short = self._select_archetype(metrics)
+        base_long = self._build_base_long_description(title, base_short, metrics)
+
+        if use_llm:
+            llm_result = self._maybe_call_llm(
+                username=username,
+                metrics=metrics,
+                archetype_id=archetype_id,
+                title=title,
+                base_short=base_short,
+                base_long=base_long,
+                representative_tracks=representative_tracks,
+            )
+            if llm_result is not None:
+                # Ensure the returned LLM result uses the unified display title
+                llm_result.title = self.MUSIC_PERSONA_TITLE
+                return llm_result
+
+        representative_track_ids = [t.track_id for t in representative_tracks]
+
+        return PersonalityResult(
+            username=username,
+            archetype_id=archetype_id,
+            title=self.MUSIC_PERSONA_TITLE,
+            short_description=base_short,
+            long_description=base_long,
+            metrics=metrics,
+            representative_track_ids=representative_track_ids,
+        )
+
+    def _select_archetype(self, metrics: PersonalityMetrics) -> tuple[str, str, str]:
+        """Rule-based ``(archetype_id, title, base_short)`` for the metrics."""
         energy = metrics.avg_energy
         valence = metrics.avg_valence
         mainstream = metrics.avg_popularity_norm
@@ -152,34 +275,7 @@ class PersonalityService:
                 "You live in the in-between: not fully mainstream, not fully obscure — just tastefully off-center."
             )
 
-        base_long = self._build_base_long_description(title, base_short, metrics)
-
-        if use_llm:
-            llm_result = self._maybe_call_llm(
-                username=username,
-                metrics=metrics,
-                archetype_id=archetype_id,
-                title=title,
-                base_short=base_short,
-                base_long=base_long,
-                representative_tracks=representative_tracks,
-            )
-            if llm_result is not None:
-                # Ensure the returned LLM result uses the unified display title
-                llm_result.title = self.MUSIC_PERSONA_TITLE
-                return llm_result
-
-        representative_track_ids = [t.track_id for t in representative_tracks]
-
-        return PersonalityResult(
-            username=username,
-            archetype_id=archetype_id,
-            title=self.MUSIC_PERSONA_TITLE,
-            short_description=base_short,
-            long_description=base_long,
-            metrics=metrics,
-            representative_track_ids=representative_track_ids,
-        )
+        return archetype_id, title, base_short
 
     def _build_base_long_description(
         self,
@@ -211,22 +307,36 @@ class PersonalityService:
 
     # ---------- persistence ----------
 
-    def _save_personality(self, username: str, result: PersonalityResult) -> None:
-        doc_ref = (
+    def personality_ref(self, username: str):
+        return (
             self.db.collection("users")
             .document(username)
             .collection("analytics")
             .document("personality")
         )
-        payload = result.to_dict()
-        payload["computed_at"] = server_timestamp()
-        doc_ref.set(payload, merge=True)
+
+    def _load_personality(self, username: str, fingerprint: str) -> PersonalityResult | None:
+        """The saved result, if it was computed from a library with this fingerprint."""
+        snap = self.personality_ref(username).get()
+        if not snap.exists:
+            return None
+        data = snap.to_dict() or {}
+        if data.get("library_fingerprint") != fingerprint:
+            return None
+        return PersonalityResult.from_mapping(data)
+
+    def _save_personality(
+        self,
+        username: str,
+        result: PersonalityResult,
+        fingerprint: str | None = None,
+    ) -> None:
+        self.personality_ref(username).set(personality_payload(result, fingerprint), merge=True)
 
     # ---------- LLM integration ----------
 
     def _build_personality_prompt(
         self,
-        username: str,
         metrics: dict[str, Any],
         top_tracks: list[dict[str, Any]],
         archetype_id: str,
@@ -238,6 +348,8 @@ class PersonalityService:
 
         The prompt instructs the model to return only the required JSON and to
         avoid mentioning numbers, algorithms, or how the inference was done.
+        It deliberately leaves out the username, so users with the same
+        library summary share one LLM cache entry.
         """
         # Build track lines
         track_lines: list[str] = []
@@ -283,8 +395,6 @@ Think: “you definitely have a soft spot for songs that feel like X,” “you
 Avoid long paragraphs; keep it tight and high-quality.
 
 -----------------------------------------------------
-USER: {username}
-
 TRACKS THEY LOVE:
 {tracks_block}
 
@@ -307,7 +417,6 @@ RETURN ONLY THIS JSON:
   "longDescription": "3–6 sentences describing their personality and emotional aesthetic based purely on the feel of their songs and genres. No stats. Funny, familiar, specific, but concise."
 }}
     """.format(
-            username=username,
             tracks_block="\n".join(track_lines),
             top_genres=top_genres_str,
             avg_energy=metrics.get("avg_energy", 0.5),
@@ -348,6 +457,61 @@ RETURN ONLY THIS JSON:
                 metrics=metrics,
             )
 
+        messages = self._llm_messages(
+            username=username,
+            metrics=metrics,
+            archetype_id=archetype_id,
+            title=title,
+            base_short=base_short,
+            base_long=base_long,
+            representative_tracks=representative_tracks,
+        )
+
+        try:
+            content = self._complete(messages)
+            return self._result_from_llm(
+                json.loads(content),
+                username=username,
+                metrics=metrics,
+                archetype_id=archetype_id,
+                title=title,
+                base_short=base_short,
+                base_long=base_long,
+                representative_tracks=representative_tracks,
+            )
+        except Exception as exc:  # noqa: BLE001
+            print("LLM personality generation failed:", exc)
+            self._llm_failed = True
+            return self._fallback_personality(
+                username=username,
+                archetype_id=archetype_id,
+                title=title,
+                base_short=base_short,
+                base_long=base_long,
+                representative_tracks=representative_tracks,
+                metrics=metrics,
+            )
+
+    def _complete(self, messages: list[dict[str, str]]) -> str:
+        """One governed completion: deadline, shared concurrency cap and prompt-hash cache."""
+        return llm_governor.complete(
+            self._openai_client,
+            messages,
+            model="gpt-4o-mini",
+            temperature=0.8,
+            validate=_is_json_object,
+        )
+
+    def _llm_messages(
+        self,
+        username: str,
+        metrics: PersonalityMetrics,
+        archetype_id: str,
+        title: str,
+        base_short: str,
+        base_long: str,
+        representative_tracks: list[Track],
+    ) -> list[dict[str, str]]:
         metrics_dict = metrics.to_dict()
 
         # Build lightweight track payloads for the prompt
@@ -362,7 +526,6 @@ RETURN ONLY THIS JSON:
             )
 
         prompt = self._build_personality_prompt(
-            username=username,
             metrics=metrics_dict,
             top_tracks=top_tracks_payload,
             archetype_id=archetype_id,
@@ -385,46 +548,38 @@ RETURN ONLY THIS JSON:
                 "content": prompt,
             },
         ]
+        return messages
 
-        try:
-            resp = self._openai_client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=messages,
-                temperature=0.8,
-            )
-            content = resp.choices[0].message.content or ""
-            data = json.loads(content)
-
-            final_archetype_id = data.get("archetypeId", archetype_id)
-            final_short = data.get("shortDescription", base_short)
-            final_long = data.get("longDescription", base_long)
-            # Derive a concise title that matches the short description so the
-            # displayed title feels aligned with the paragraph.
-            candidate_title = data.get("title")
-            final_title = self._derive_title_from_text(final_short, candidate_title or title)
+    def _result_from_llm(
+        self,
+        data: dict[str, Any],
+        username: str,
+        metrics: PersonalityMetrics,
+        archetype_id: str,
+        title: str,
+        base_short: str,
+        base_long: str,
+        representative_tracks: list[Track],
+    ) -> PersonalityResult:
+        final_archetype_id = data.get("archetypeId", archetype_id)
+        final_short = data.get("shortDescription", base_short)
+        final_long = data.get("longDescription", base_long)
+        # Derive a concise title that matches the short description so the
+        # displayed title feels aligned with the paragraph.
+        candidate_title = data.get("title")
+        final_title = self._derive_title_from_text(final_short, candidate_title or title)
 
-            representative_track_ids = [t.track_id for t in representative_tracks]
+        representative_track_ids = [t.track_id for t in representative_tracks]
 
-            return PersonalityResult(
-                username=username,
-                archetype_id=final_archetype_id,
-                title=self.MUSIC_PERSONA_TITLE,
-                short_description=final_short,
-                long_description=final_long,
-                metrics=metrics,
-                representative_track_ids=representative_track_ids,
-            )
-        except Exception as exc:  # noqa: BLE001
-            print("LLM personality generation failed:", exc)
-            return self._fallback_personality(
-                username=username,
-                archetype_id=archetype_id,
-                title=title,
-                base_short=base_short,
-                base_long=base_long,
-                representative_tracks=representative_tracks,
-                metrics=metrics,
-            )
+        return PersonalityResult(
+            username=username,
+            archetype_id=final_archetype_id,
+            title=self.MUSIC_PERSONA_TITLE,
+            short_description=final_short,
+            long_description=final_long,
+            metrics=metrics,
+            representative_track_ids=representative_track_ids,
+        )
 
     def _derive_title_from_text(self, short_description: str, fallback: str) -> str:
         """Derive a short (2-4 word) title from the short_description.
@@ -547,3 +702,19 @@ RETURN ONLY THIS JSON:
             metrics=metrics,
             representative_track_ids=representative_track_ids,
         )
+
+
+def personality_payload(result: PersonalityResult, fingerprint: str | None) -> dict[str, Any]:
+    """The document stored at ``users/{u}/analytics/personality``."""
+    payload = result.to_dict()
+    payload["computed_at"] = server_timestamp()
+    payload["library_fingerprint"] = fingerprint
+    return payload
+
+
+def _is_json_object(content: str) -> bool:
+    """Only well-formed answers are worth caching."""
+    try:
+        return isinstance(json.loads(content), dict)
+    except ValueError:
+        return False
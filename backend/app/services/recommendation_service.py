@@ -1,12 +1,16 @@
 # app/services/recommendation_service.py
 from __future__ import annotations
 
-from typing import Any, Dict, Iterable, List, Set
+from typing import Dict, Iterable, List, Set
 
 from app.models.user import UserProfile
 from app.models.track import Track, NUMERIC_FEATURES
+from app.services.catalog_service import COLIKE_GRAPH, KNN_GRAPH, get_catalog
+from app.services.scoring_service import ScoringService
 from app.services.track_service import TrackService
 
+EXPANSION_PER_ANCHOR = 5  # graph neighbours taken around each liked track
+
 
 class RecommendationService:
     """
@@ -18,6 +22,7 @@ class RecommendationService:
 
     def __init__(self) -> None:
         self.track_service = TrackService()
+        self.scoring_service = ScoringService()
 
     # ---------- Genre preference helpers ----------
 
@@ -123,43 +128,103 @@ class RecommendationService:
         candidate_limit: int = 300,
         final_limit: int = 200,
         limit: int | None = None, 
+        anchor_track_ids: Iterable[str] | None = None,
     ) -> List[str]:
         """
         Pick refined candidate tracks and score them, returning a sorted list of track_ids.
 
-        - Fetch candidates via TrackService.get_candidate_tracks
+        - Candidates are the catalog tracks with popularity_norm >= 0.6, plus
+          precomputed graph neighbours of anchor (recently liked) tracks
         - Score each track using genre + feature similarity + popularity bonus
+          through the micro-batched ScoringService (no Firestore reads)
         - Sort descending and return top N ids
+
+        Without a published catalog, a Firestore candidate sample is scored
+        instead (_rank_without_catalog).
         """
         
         # Accept legacy `limit` kwarg used elsewhere (maps to candidate_limit)
         if limit is not None:
             candidate_limit = limit
-            
-        # Fetch candidate tracks from Firestore
-        candidates = self.track_service.get_candidate_tracks(
-            top_genres=top_genres,
-            exclude_track_ids=exclude_track_ids,
-            limit=candidate_limit,
-        )
 
         genre_weights = self._build_genre_weight_map(top_genres)
 
-        scored: List[tuple[float, Track]] = []
+        ranked = self.scoring_service.top_tracks(
+            genre_weights=genre_weights,
+            feature_preferences=feature_preferences,
+            exclude_track_ids=exclude_track_ids,
+            k=final_limit,
+            extra_track_ids=self._expansion_track_ids(
+                anchor_track_ids=anchor_track_ids or [],
+                exclude_track_ids=exclude_track_ids,
+                limit=max(1, candidate_limit // 2),
+            ),
+        )
+        if ranked is not None:
+            return [track_id for track_id, _ in ranked[:final_limit]]
 
-        for track in candidates:
-            score = self._score_track(
-                track=track,
-                feature_preferences=feature_preferences,
-                genre_weights=genre_weights,
-            )
-            scored.append((score, track))
+        return self._rank_without_catalog(
+            top_genres=top_genres,
+            feature_preferences=feature_preferences,
+            genre_weights=genre_weights,
+            exclude_track_ids=exclude_track_ids,
+            candidate_limit=candidate_limit,
+            final_limit=final_limit,
+        )
 
-        # Sort by score descending
+    def _rank_without_catalog(
+        self,
+        top_genres: List[str],
+        feature_preferences: Dict[str, float],
+        genre_weights: Dict[str, float],
+        exclude_track_ids: Set[str],
+        candidate_limit: int,
+        final_limit: int,
+    ) -> List[str]:
+        """
+        Fallback while no catalog is published: score a Firestore candidate
+        sample one track at a time. (Graph expansion needs the catalog.)
+        """
+        candidates = self.track_service.get_candidate_tracks(
+            top_genres=top_genres,
+            exclude_track_ids=exclude_track_ids,
+            limit=candidate_limit,
+        )
+        scored = [
+            (self._score_track(track=t, feature_preferences=feature_preferences, genre_weights=genre_weights), t)
+            for t in candidates
+        ]
         scored.sort(key=lambda pair: pair[0], reverse=True)
+        return [t.track_id for _, t in scored[:final_limit]]
+
+    def _expansion_track_ids(
+        self,
+        anchor_track_ids: Iterable[str],
+        exclude_track_ids: Set[str],
+        limit: int,
+    ) -> List[str]:
+        """
+        Neighbours of the anchors from the catalog's precomputed graphs, O(K)
+        per anchor: "users who liked X also liked Y" first, then audio-feature
+        neighbours.
+        """
+        catalog = get_catalog()
+        if catalog is None:
+            return []
 
-        # Return only the track_ids, limited to final_limit
-        return [t.track_id for score, t in scored[:final_limit]]
+        anchor_rows = catalog.rows_of(anchor_track_ids)
+        track_ids: List[str] = []
+        seen = set(exclude_track_ids)
+        for graph in (COLIKE_GRAPH, KNN_GRAPH):
+            rows = catalog.expand_rows(anchor_rows, per_row=EXPANSION_PER_ANCHOR, graph=graph)
+            for tid in catalog.track_ids_at(rows):
+                if len(track_ids) >= limit:
+                    break
+                if tid not in seen:
+                    seen.add(tid)
+                    track_ids.append(tid)
+
+        return track_ids
 
     def _score_track(
         self,
@@ -0,0 +1,198 @@
+from __future__ import annotations
+
+import copy
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Iterable
+
+import numpy as np
+
+from app.models import NUMERIC_FEATURES, MatchSession, Track
+from app.models.user import UserProfile
+from app.services.recommendation_service import RecommendationService
+from app.services.user_service import UserService
+from app.utils.scoring import feature_similarity_rows
+
+SESSION_POOL_TTL_SECONDS = 30 * 60
+MAX_SESSION_POOLS = 2048  # per worker; least recently swiped pools are dropped first
+
+
+@dataclass(slots=True)
+class SessionPool:
+    """
+    A refined session's candidate pool, kept in worker memory so each swipe
+    can re-score it without touching Firestore.
+
+    ``profile`` is a private copy of the user's aggregates at refinement
+    time, advanced swipe by swipe. ``ranked`` is the latest best-first
+    order of the unswiped candidates (empty until the first swipe).
+    """
+
+    track_ids: list[str]
+    features: np.ndarray  # (n, len(NUMERIC_FEATURES)) float32, missing values imputed as 0.5
+    popularity: np.ndarray  # (n,) float32
+    genre_codes: np.ndarray  # (n,) int32 into genre_keys
+    genre_keys: list[str]
+    remaining: np.ndarray  # (n,) bool, False once a track is swiped
+    profile: UserProfile
+    fallback_genres: list[str]
+    touched_at: float
+    ranked: list[str] = field(default_factory=list)
+
+
+class RerankService:
+    """
+    Incremental in-session re-ranking of ``refined_track_ids``.
+
+    After every swipe the pool's preference vector is updated in O(features)
+    and only the still-unserved candidates are re-scored, in one vectorized
+    pass, with the same blend and similarity kernel (feature_similarity_rows)
+    that ScoringService built the queue with. The order lives in the pool
+    and is applied when the queue is read, so the stored
+    ``refined_track_ids`` (and the session write) stay unchanged.
+    """
+
+    def __init__(self) -> None:
+        self.recommendation_service = RecommendationService()
+        self.user_service = UserService()
+
+    def start_pool(
+        self,
+        username: str,
+        session_id: str,
+        tracks: Iterable[Track],
+        profile: UserProfile,
+        fallback_genres: list[str],
+    ) -> None:
+        tracks = list(tracks)
+        features = np.full((len(tracks), len(NUMERIC_FEATURES)), 0.5, dtype=np.float32)
+        popularity = np.zeros(len(tracks), dtype=np.float32)
+        genre_lookup: dict[str, int] = {}
+        genre_codes = np.zeros(len(tracks), dtype=np.int32)
+
+        for i, track in enumerate(tracks):
+            for j, feature in enumerate(NUMERIC_FEATURES):
+                value = getattr(track, feature, None)
+                if value is not None:
+                    features[i, j] = float(value)
+            popularity[i] = track.popularity_norm or 0.0
+            key = track.track_genre_group or track.track_genre or "misc"
+            genre_codes[i] = genre_lookup.setdefault(key, len(genre_lookup))
+
+        pool = SessionPool(
+            track_ids=[t.track_id for t in tracks],
+            features=features,
+            popularity=popularity,
+            genre_codes=genre_codes,
+            genre_keys=list(genre_lookup),
+            remaining=np.ones(len(tracks), dtype=bool),
+            profile=copy.deepcopy(profile),
+            fallback_genres=list(fallback_genres),
+            touched_at=time.monotonic(),
+        )
+        _put_pool(username.lower(), session_id, pool)
+
+    def observe_swipe(
+        self,
+        username: str,
+        session: MatchSession,
+        track: Track,
+        liked: bool,
+    ) -> bool:
+        """
+        Fold a swipe into the session's pool and re-rank its unswiped
+        candidates. Returns False when this worker holds no pool for the
+        session.
+        """
+        pool = _get_pool(username.lower(), session.session_id)
+        if pool is None:
+            return False
+
+        self.user_service.apply_swipe_to_profile(pool.profile, track, liked)
+        try:
+            pool.remaining[pool.track_ids.index(track.track_id)] = False
+        except ValueError:
+            pass
+
+        pool.ranked = self._rank_remaining(pool)
+        return True
+
+    def refined_queue(self, username: str, session: MatchSession) -> list[str]:
+        """
+        ``session.refined_track_ids`` in serving order: its unserved part
+        reordered best-first when this worker holds the session's pool, as
+        stored otherwise.
+        """
+        queue = session.refined_track_ids or []
+        pool = _get_pool(username.lower(), session.session_id)
+        if pool is None:
+            return queue
+        return _reorder_unserved(queue, pool.ranked, start=session.current_index)
+
+    def _rank_remaining(self, pool: SessionPool) -> list[str]:
+        rows = np.flatnonzero(pool.remaining)
+        if rows.size == 0:
+            return []
+
+        top_genres = self.user_service.get_top_genres(pool.profile) or pool.fallback_genres
+        genre_weights = self.recommendation_service._build_genre_weight_map(top_genres)
+        preferences = self.recommendation_service.build_feature_preferences(pool.profile)
+
+        weight_lookup = np.array([genre_weights.get(k, 0.0) for k in pool.genre_keys], dtype=np.float32)
+        genre_score = weight_lookup[pool.genre_codes[rows]]
+        feat_score = feature_similarity_rows(pool.features[rows], preferences)
+        scores = 0.45 * genre_score + 0.45 * feat_score + 0.10 * pool.popularity[rows]
+
+        order = rows[np.argsort(-scores, kind="stable")]
+        return [pool.track_ids[i] for i in order]
+
+
+def _reorder_unserved(queue: list[str], ranked: list[str], start: int) -> list[str]:
+    """
+    Write ``ranked`` into the slots of ``queue`` from the session's shared
+    pointer ``start`` (taken modulo the list length, as when serving) to the
+    end that hold ranked ids. Earlier slots keep their tracks, and ranked
+    ids outside the tail are ignored, so an unchanged ranking leaves the
+    best-first queue as it is.
+    """
+    if not queue or not ranked:
+        return queue
+    start %= len(queue)
+    candidates = set(ranked)
+    slots = [i for i in range(start, len(queue)) if queue[i] in candidates]
+    tail = {queue[i] for i in slots}
+
+    reordered = list(queue)
+    for slot, track_id in zip(slots, (tid for tid in ranked if tid in tail)):
+        reordered[slot] = track_id
+    return reordered
+
+
+# ---------- per-worker pool cache ----------
+
+_lock = threading.Lock()
+_pools: "OrderedDict[tuple[str, str], SessionPool]" = OrderedDict()
+
+
+def _get_pool(username: str, session_id: str) -> SessionPool | None:
+    now = time.monotonic()
+    with _lock:
+        pool = _pools.get((username, session_id))
+        if pool is None:
+            return None
+        if now - pool.touched_at > SESSION_POOL_TTL_SECONDS:
+            del _pools[(username, session_id)]
+            return None
+        pool.touched_at = now
+        _pools.move_to_end((username, session_id))
+        return pool
+
+
+def _put_pool(username: str, session_id: str, pool: SessionPool) -> None:
+    with _lock:
+        _pools[(username, session_id)] = pool
+        _pools.move_to_end((username, session_id))
+        while len(_pools) > MAX_SESSION_POOLS:
+            _pools.popitem(last=False)
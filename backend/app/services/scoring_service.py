@@ -0,0 +1,225 @@
+from __future__ import annotations
+
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Set
+
+import numpy as np
+
+from app.services.catalog_service import CatalogSnapshot, get_catalog
+from app.services.track_service import CANDIDATE_MIN_POPULARITY
+from app.utils.scoring import SCORING_BLOCK_ROWS, masked_feature_similarity, preference_vector
+
+SCORING_BATCH_WINDOW_MS = float(os.getenv("SCORING_BATCH_WINDOW_MS", "5"))
+SCORING_MAX_BATCH = int(os.getenv("SCORING_MAX_BATCH", "64"))
+SCORING_TIMEOUT_SECONDS = 10.0
+
+
+@dataclass(slots=True)
+class ScoringRequest:
+    genre_weights: Dict[str, float]
+    feature_preferences: Dict[str, float]
+    exclude_track_ids: Set[str]
+    k: int
+    extra_track_ids: List[str] = field(default_factory=list)
+    future: Future = field(default_factory=Future)
+
+
+class ScoringService:
+    """
+    Catalog-wide top-k recommendation scoring, micro-batched across requests.
+
+    Concurrent callers are collected for up to SCORING_BATCH_WINDOW_MS and
+    scored together: each block of candidate rows is read once and scored
+    for every request in the batch, so a burst of refinements costs one
+    pass over the candidates instead of one per user.
+    """
+
+    def top_tracks(
+        self,
+        genre_weights: Dict[str, float],
+        feature_preferences: Dict[str, float],
+        exclude_track_ids: Set[str],
+        k: int,
+        extra_track_ids: Iterable[str] = (),
+    ) -> List[tuple[str, float]] | None:
+        """
+        Best ``k`` candidate tracks for one user as ``(track_id, score)``,
+        merged with the scored ``extra_track_ids``. Returns None when no
+        catalog is published (callers fall back to per-track scoring).
+        """
+        if get_catalog() is None:
+            return None
+        if k <= 0:
+            return []
+        request = ScoringRequest(
+            genre_weights=dict(genre_weights),
+            feature_preferences=dict(feature_preferences),
+            exclude_track_ids=set(exclude_track_ids),
+            k=k,
+            extra_track_ids=list(extra_track_ids),
+        )
+        _batcher.submit(request)
+        return request.future.result(timeout=SCORING_TIMEOUT_SECONDS)
+
+
+def score_batch(catalog: CatalogSnapshot, requests: List[ScoringRequest]) -> List[List[tuple[str, float]]]:
+    """
+    Score every request against the catalog's candidate rows at once.
+
+    Candidates are the rows with ``popularity_norm >= CANDIDATE_MIN_POPULARITY``
+    (the same floor as the Firestore candidate query), taken as a prefix of
+    the catalog's popularity index. Each score is the blend of
+    RecommendationService._score_track: 0.45 genre + 0.45 feature + 0.10
+    popularity, with the same mean ``1 - |track - pref|`` feature similarity
+    (``masked_feature_similarity``, also used by the in-session re-rank).
+
+    Features are read block by block from the shared (possibly quantized)
+    matrix and compared in its own units, so workers keep no dequantized
+    copy of the catalog.
+    """
+    preferences = [preference_vector(r.feature_preferences) for r in requests]
+    genre_table = 0.45 * _genre_table(catalog, requests)  # (B, n_keys)
+    excluded = [catalog.rows_of(r.exclude_track_ids) for r in requests]
+
+    def block_scores(rows: np.ndarray, only: slice = slice(None)) -> np.ndarray:
+        block = catalog.features[rows]  # one gathered block, still quantized
+        scores = np.stack(
+            [
+                masked_feature_similarity(block, target, mask, catalog.feature_scale)
+                for target, mask in preferences[only]
+            ]
+        )
+        scores *= 0.45
+        scores += 0.10 * catalog.popularity[rows]
+        scores += genre_table[only][:, _genre_keys(catalog, rows)]
+        return scores
+
+    # Running top-k per request over catalog rows. Only rows beating a
+    # request's current k-th score are looked at (and checked against the
+    # exclusions), so after the first block very few survive.
+    candidates = _candidate_rows(catalog)
+    best_rows = [np.empty(0, dtype=np.int64) for _ in requests]
+    best_scores = [np.empty(0, dtype=np.float32) for _ in requests]
+    threshold = np.full(len(requests), -np.inf, dtype=np.float32)
+    for start in range(0, candidates.size, SCORING_BLOCK_ROWS):
+        rows = candidates[start : start + SCORING_BLOCK_ROWS]
+        scores = block_scores(rows)
+
+        owner, local = np.nonzero(scores > threshold[:, None])
+        bounds = np.searchsorted(owner, np.arange(len(requests) + 1))
+        for j, request in enumerate(requests):
+            hits = local[bounds[j] : bounds[j + 1]]
+            if excluded[j].size and hits.size:
+                # Checked on survivors only; they are few after the first block
+                hits = hits[~np.isin(rows[hits], excluded[j])]
+            if hits.size == 0:
+                continue
+            top_rows = np.concatenate([best_rows[j], rows[hits]])
+            vals = np.concatenate([best_scores[j], scores[j, hits]])
+            if vals.size > request.k:
+                top = np.argpartition(-vals, request.k - 1)[: request.k]
+                top_rows, vals = top_rows[top], vals[top]
+                threshold[j] = vals.min()
+            best_rows[j], best_scores[j] = top_rows, vals
+
+    results: List[List[tuple[str, float]]] = []
+    for j, request in enumerate(requests):
+        rows, vals = best_rows[j], best_scores[j]
+        # Graph neighbours are scored even below the popularity floor
+        extra = np.unique(catalog.rows_of(request.extra_track_ids))
+        extra = extra[~np.isin(extra, rows) & ~np.isin(extra, excluded[j])]
+        if extra.size:
+            rows = np.concatenate([rows, extra])
+            vals = np.concatenate([vals, block_scores(extra, slice(j, j + 1))[0]])
+        finite = np.isfinite(vals)
+        rows, vals = rows[finite], vals[finite]
+        order = np.argsort(-vals, kind="stable")
+        results.append([(tid, float(score)) for tid, score in zip(catalog.track_ids_at(rows[order]), vals[order])])
+    return results
+
+
+def _candidate_rows(catalog: CatalogSnapshot) -> np.ndarray:
+    """Rows at or above the candidate popularity floor (a view of the popularity index)."""
+    index = catalog.popularity_index
+    count = int(np.count_nonzero(catalog.popularity >= CANDIDATE_MIN_POPULARITY))
+    return index[:count]
+
+
+def _genre_keys(catalog: CatalogSnapshot, rows: np.ndarray) -> np.ndarray:
+    """Genre key per row: group code, else ``n_groups + genre code``, else the trailing "misc" key."""
+    n_groups, n_genres = len(catalog.genre_groups), len(catalog.genres)
+    group_codes = catalog.genre_group_codes[rows].astype(np.int64)
+    genre_codes = catalog.genre_codes[rows].astype(np.int64)
+    return np.where(
+        group_codes >= 0,
+        group_codes,
+        np.where(genre_codes >= 0, n_groups + genre_codes, n_groups + n_genres),
+    )
+
+
+def _genre_table(catalog: CatalogSnapshot, requests: List[ScoringRequest]) -> np.ndarray:
+    """
+    (B, n_keys) genre weight per genre key (see _genre_keys), matching
+    RecommendationService._score_track: group weight when the track has a
+    group, else genre weight, else the "misc" weight.
+    """
+    names = list(catalog.genre_groups) + list(catalog.genres)
+    table = np.zeros((len(requests), len(names) + 1), dtype=np.float32)
+    for j, request in enumerate(requests):
+        weights = request.genre_weights
+        table[j, :-1] = [weights.get(name, 0.0) for name in names]
+        table[j, -1] = weights.get("misc", 0.0)
+    return table
+
+
+class _MicroBatcher:
+    """Collects ScoringRequests for a short window and scores them together on one thread."""
+
+    def __init__(self) -> None:
+        self._queue: "queue.Queue[ScoringRequest]" = queue.Queue()
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+
+    def submit(self, request: ScoringRequest) -> None:
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="scoring-batcher", daemon=True)
+                    self._thread.start()
+        self._queue.put(request)
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + SCORING_BATCH_WINDOW_MS / 1000.0
+            while len(batch) < SCORING_MAX_BATCH:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._score(batch)
+
+    def _score(self, batch: List[ScoringRequest]) -> None:
+        try:
+            catalog = get_catalog()
+            if catalog is None:
+                raise RuntimeError("Track catalog is not published.")
+            results = score_batch(catalog, batch)
+        except Exception as exc:
+            print(f"Batched scoring failed for {len(batch)} requests: {exc}")
+            for request in batch:
+                request.future.set_exception(exc)
+            return
+        for request, result in zip(batch, results):
+            request.future.set_result(result)
+
+
+_batcher = _MicroBatcher()
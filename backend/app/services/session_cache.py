@@ -0,0 +1,331 @@
+from __future__ import annotations
+
+import atexit
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Mapping
+
+from firebase_admin import firestore
+from flask import Flask
+
+from app.firebase_client import get_firestore_client, server_timestamp
+from app.models import MatchSession, Track
+
+SESSION_CACHE_TTL_SECONDS = float(os.getenv("SESSION_CACHE_TTL_SECONDS", "900"))
+# The flusher re-checks ``version`` of clean, recently used entries this often (off the request path)
+SESSION_REVALIDATE_SECONDS = float(os.getenv("SESSION_REVALIDATE_SECONDS", "30"))
+SESSION_FLUSH_SECONDS = float(os.getenv("SESSION_FLUSH_SECONDS", "2"))
+MAX_CACHED_SESSIONS = int(os.getenv("MAX_CACHED_SESSIONS", "4096"))
+
+
+@dataclass(slots=True)
+class CachedSession:
+    """
+    One match session held in worker memory.
+
+    ``baseline`` and ``session.version`` describe the state last read from
+    or written to Firestore; the difference between ``baseline`` and
+    ``session`` is what the next flush writes.
+    """
+
+    session: MatchSession
+    baseline: dict[str, Any]
+    skip_ids: set[str] | None = None  # library + swiped track ids, loaded on first /next
+    tracks: dict[str, Track | None] = field(default_factory=dict)  # resolved queue tracks (None = missing doc)
+    dirty_since: float | None = None
+    touched_at: float = 0.0
+    validated_at: float = 0.0  # last time ``session.version`` was known to match Firestore
+
+
+class SessionCache:
+    """
+    Per-worker write-behind cache of match sessions keyed by
+    ``(username, session_id)``.
+
+    Reads are served from memory once a session is loaded, without a
+    Firestore round trip. Changes are flushed by a background thread after
+    SESSION_FLUSH_SECONDS, on eviction and at exit. Every flush runs in a
+    transaction that compares ``version`` with the one this worker last saw
+    and bumps it; on a mismatch only fields the other writer left untouched
+    are written and the entry is dropped. The same thread re-checks the
+    ``version`` of clean entries used since their last check, every
+    SESSION_REVALIDATE_SECONDS, in one batched read, and drops those another
+    worker wrote. Works best behind a load balancer that routes a session to
+    the same worker (e.g. hashing on ``sessionId``).
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()  # guards the entry table; never held across Firestore calls
+        self._flush_lock = threading.Lock()  # serializes flushes
+        self._entries: "OrderedDict[tuple[str, str], CachedSession]" = OrderedDict()
+        self._app: Flask | None = None
+        self._flusher: threading.Thread | None = None
+
+    # ---------- lookups ----------
+
+    def get(self, username: str, session_id: str) -> CachedSession | None:
+        key = (username.lower(), session_id)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if now - entry.touched_at <= SESSION_CACHE_TTL_SECONDS:
+                entry.touched_at = now
+                self._entries.move_to_end(key)
+                return entry
+            del self._entries[key]
+        # Expired: push pending changes through the merging flush and let the caller reload
+        self._flush(key, entry)
+        return None
+
+    def load(self, app: Flask, username: str, session_id: str, snapshot: Any) -> CachedSession:
+        """Cache a session read from Firestore and return its entry."""
+        data = snapshot.to_dict() or {}
+        data["session_id"] = session_id
+        data["username"] = username
+        session = MatchSession.from_mapping(data)
+        now = time.monotonic()
+        entry = CachedSession(session=session, baseline=persisted_fields(session), touched_at=now, validated_at=now)
+        key = (username.lower(), session_id)
+        evicted: list[tuple[tuple[str, str], CachedSession]] = []
+        with self._lock:
+            self._ensure_flusher(app)
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                evicted.append((key, previous))
+            self._entries[key] = entry
+            while len(self._entries) > MAX_CACHED_SESSIONS:
+                evicted.append(self._entries.popitem(last=False))
+        for evicted_key, evicted_entry in evicted:
+            self._flush(evicted_key, evicted_entry)
+        return entry
+
+    # ---------- writes ----------
+
+    def commit(self, username: str, session: MatchSession, immediate: bool = False) -> bool:
+        """
+        Mark a cached session as changed; it is written on the next flush
+        (right away with ``immediate``). Returns False when ``session`` is not
+        the cached instance, so the caller has to write it itself.
+        """
+        key = (username.lower(), session.session_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.session is not session:
+                return False
+            if entry.dirty_since is None:
+                entry.dirty_since = time.monotonic()
+        if immediate:
+            self._flush(key, entry)
+        return True
+
+    def apply(
+        self,
+        username: str,
+        session_id: str,
+        changes: Mapping[str, Any],
+        only_if: Mapping[str, Any] | None = None,
+    ) -> bool:
+        """
+        Set fields on a session from outside a request (e.g. the background
+        refinement job): on the cached instance when there is one, otherwise
+        straight to Firestore.
+
+        With ``only_if``, the change is applied only while the session still
+        has those field values, checked atomically with the write (under the
+        cache lock, or in a transaction). Returns whether it was applied.
+        """
+        key = (username.lower(), session_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if only_if and any(getattr(entry.session, k) != v for k, v in only_if.items()):
+                    return False
+                for name, value in changes.items():
+                    setattr(entry.session, name, value)
+                if entry.dirty_since is None:
+                    entry.dirty_since = time.monotonic()
+                return True
+        db = self._db()
+        ref = _session_ref(db, *key)
+        if only_if:
+            return _apply_if(db.transaction(), ref, dict(changes), only_if)
+        ref.update({**changes, "version": firestore.Increment(1), "updated_at": server_timestamp()})
+        return True
+
+    def flush_due(self) -> None:
+        """
+        Write sessions dirty for SESSION_FLUSH_SECONDS, drop (after flushing)
+        expired ones, and revalidate clean ones that are due.
+        """
+        now = time.monotonic()
+        due: list[tuple[tuple[str, str], CachedSession]] = []
+        unchecked: list[tuple[tuple[str, str], CachedSession]] = []
+        with self._lock:
+            for key, entry in list(self._entries.items()):
+                if now - entry.touched_at > SESSION_CACHE_TTL_SECONDS:
+                    del self._entries[key]
+                    due.append((key, entry))
+                elif entry.dirty_since is not None:
+                    if now - entry.dirty_since >= SESSION_FLUSH_SECONDS:
+                        due.append((key, entry))
+                elif entry.touched_at > entry.validated_at and now - entry.validated_at >= SESSION_REVALIDATE_SECONDS:
+                    unchecked.append((key, entry))
+        for key, entry in due:
+            self._flush(key, entry)
+        if unchecked:
+            self._revalidate(unchecked)
+
+    def flush_all(self) -> None:
+        with self._lock:
+            entries = list(self._entries.items())
+        for key, entry in entries:
+            self._flush(key, entry)
+
+    # ---------- internals ----------
+
+    def _db(self):
+        return get_firestore_client(self._app)
+
+    def _revalidate(self, entries: list[tuple[tuple[str, str], CachedSession]]) -> None:
+        """Drop clean entries whose stored ``version`` moved on (one batched read of that field)."""
+        db = self._db()
+        checked_at = time.monotonic()
+        try:
+            snaps = db.get_all([_session_ref(db, *key) for key, _ in entries], field_paths=["version"])
+            versions = {
+                snap.reference.path: int((snap.to_dict() or {}).get("version") or 0) if snap.exists else None
+                for snap in snaps
+            }
+        except Exception as exc:
+            print(f"Failed to revalidate {len(entries)} cached sessions: {exc}")
+            return
+        with self._lock:
+            for key, entry in entries:
+                if versions.get(_session_ref(db, *key).path) == entry.session.version:
+                    entry.validated_at = checked_at
+                elif entry.dirty_since is None and self._entries.get(key) is entry:
+                    # Written by another worker; the next read reloads it. A
+                    # change made meanwhile stays cached for the merging flush.
+                    del self._entries[key]
+
+    def _flush(self, key: tuple[str, str], entry: CachedSession) -> None:
+        if entry.dirty_since is None:
+            return
+        with self._flush_lock:
+            self._write(key, entry)
+
+    def _write(self, key: tuple[str, str], entry: CachedSession) -> None:
+        # Snapshot and clear under the lock commit()/apply() take, so a change
+        # marked after the snapshot keeps the entry dirty for the next flush.
+        with self._lock:
+            current = persisted_fields(entry.session)
+            baseline = entry.baseline
+            expected_version = entry.session.version
+            entry.dirty_since = None
+        changes = {k: v for k, v in current.items() if baseline.get(k) != v}
+        if not changes:
+            return
+
+        db = self._db()
+        try:
+            written, conflicted = _store_changes(
+                db.transaction(), _session_ref(db, *key), changes, baseline, expected_version
+            )
+        except Exception as exc:
+            print(f"Failed to flush session {key[0]}/{key[1]}: {exc}")
+            with self._lock:
+                if entry.dirty_since is None:
+                    entry.dirty_since = time.monotonic()
+            return
+
+        if conflicted:
+            print(
+                f"Session {key[0]}/{key[1]} changed elsewhere; wrote {sorted(written)}, "
+                f"kept the other writer's {sorted(set(changes) - set(written))}, dropped the cached copy"
+            )
+            with self._lock:
+                if self._entries.get(key) is entry:
+                    del self._entries[key]
+            return
+
+        with self._lock:
+            entry.session.version = expected_version + 1
+            entry.baseline = current
+            entry.validated_at = time.monotonic()
+
+    def _ensure_flusher(self, app: Flask) -> None:
+        if self._flusher is not None:
+            return
+        self._app = app
+        self._flusher = threading.Thread(target=self._run_flusher, name="session-flush", daemon=True)
+        self._flusher.start()
+        atexit.register(self.flush_all)
+
+    def _run_flusher(self) -> None:
+        while True:
+            time.sleep(SESSION_FLUSH_SECONDS / 2)
+            try:
+                self.flush_due()
+            except Exception as exc:  # pragma: no cover - keep the flusher alive
+                print(f"Session flush loop error: {exc}")
+
+
+@firestore.transactional
+def _store_changes(
+    transaction,
+    ref,
+    changes: dict[str, Any],
+    baseline: Mapping[str, Any],
+    expected_version: int,
+) -> tuple[dict[str, Any], bool]:
+    """
+    Write ``changes`` with a version bump. If the stored version is not
+    ``expected_version`` another worker wrote in between: a field it also
+    changed (its value no longer equals our ``baseline``) keeps its value.
+    Returns ``(fields written, conflicted)``.
+    """
+    snap = ref.get(transaction=transaction)
+    if not snap.exists:
+        return {}, True
+    remote = snap.to_dict() or {}
+    version = int(remote.get("version") or 0)
+    conflicted = version != expected_version
+    if conflicted:
+        changes = {k: v for k, v in changes.items() if remote.get(k) == baseline.get(k)}
+    if changes:
+        transaction.update(ref, {**changes, "version": version + 1, "updated_at": server_timestamp()})
+    return changes, conflicted
+
+
+@firestore.transactional
+def _apply_if(transaction, ref, changes: dict[str, Any], only_if: Mapping[str, Any]) -> bool:
+    """Write ``changes`` with a version bump if the stored session matches ``only_if``."""
+    snap = ref.get(transaction=transaction)
+    if not snap.exists:
+        return False
+    stored = snap.to_dict() or {}
+    if any(stored.get(k) != v for k, v in only_if.items()):
+        return False
+    version = int(stored.get("version") or 0)
+    transaction.update(ref, {**changes, "version": version + 1, "updated_at": server_timestamp()})
+    return True
+
+
+def persisted_fields(session: MatchSession) -> dict[str, Any]:
+    """Session fields a request may change (identity, timestamps and version excluded)."""
+    payload = session.to_dict()
+    for key in ("session_id", "username", "created_at", "updated_at", "version"):
+        payload.pop(key, None)
+    return payload
+
+
+def _session_ref(db, username: str, session_id: str):
+    return db.collection("users").document(username).collection("sessions").document(session_id)
+
+
+session_cache = SessionCache()
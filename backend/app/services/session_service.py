@@ -2,16 +2,33 @@ from __future__ import annotations
 
 import uuid
 import math
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from typing import Any
 
+from firebase_admin import firestore
+from flask import current_app
+
 from app.firebase_client import get_firestore_client, server_timestamp
 from app.models import MatchSession, Track
+from app.services.embedding_service import EmbeddingService
 from app.services.library_service import LibraryService
 from app.services.recommendation_service import RecommendationService
+from app.services.rerank_service import RerankService
+from app.services.session_cache import session_cache
 from app.services.track_service import TrackService
 from app.services.user_service import UserService
 
 MIN_SEED_SWIPES = 3  # trigger refinement after this many seed swipes (or all seeds if fewer)
+REFINEMENT_WORKERS = int(os.getenv("REFINEMENT_WORKERS", "4"))
+REFINEMENT_QUEUE_LIMIT = int(os.getenv("REFINEMENT_QUEUE_LIMIT", "32"))  # queued + running jobs per worker process
+UPCOMING_TRACKS_BATCH = 20  # queue tracks resolved per batched read
+
+_refinement_executor = ThreadPoolExecutor(max_workers=REFINEMENT_WORKERS, thread_name_prefix="refine")
+_refinement_slots = threading.BoundedSemaphore(REFINEMENT_QUEUE_LIMIT)
+_refinements_in_flight: set[tuple[str, str]] = set()
+_refinements_lock = threading.Lock()
 
 
 class SessionService:
@@ -21,6 +38,8 @@ class SessionService:
         self.track_service = TrackService()
         self.library_service = LibraryService()
         self.recommendation_service = RecommendationService()
+        self.embedding_service = EmbeddingService()
+        self.rerank_service = RerankService()
 
     def create_session(self, username: str, seed_limit: int = 5) -> dict[str, Any]:
         """
@@ -80,13 +99,22 @@ class SessionService:
         }
 
     def get_session(self, username: str, session_id: str) -> MatchSession:
+        """The session from this worker's cache, read from Firestore on a miss."""
+        cached = session_cache.get(username, session_id)
+        if cached is not None:
+            return cached.session
         snapshot = self._session_ref(username, session_id).get()
         if not snapshot.exists:
             raise ValueError("Session not found.")
-        data = snapshot.to_dict() or {}
-        data["session_id"] = session_id
-        data["username"] = username
-        return MatchSession.from_mapping(data)
+        app = current_app._get_current_object()
+        return session_cache.load(app, username, session_id, snapshot).session
+
+    def get_session_track(self, username: str, session_id: str, track_id: str) -> Track | None:
+        """A track from the session's resolved queue, falling back to a Firestore read."""
+        cached = session_cache.get(username, session_id)
+        if cached is not None and cached.tracks.get(track_id) is not None:
+            return cached.tracks[track_id]
+        return self.track_service.get_track(track_id)
 
     def register_swipe(
         self,
@@ -112,17 +140,33 @@ class SessionService:
                 source="swipe",
             )
 
+        cached = session_cache.get(username, session.session_id)
+        if cached is not None and cached.skip_ids is not None:
+            cached.skip_ids.add(track.track_id)
+
         # Update session fields
         if session.phase == "seed":
             session.seed_swipes_completed += 1
-
-        session.updated_at = server_timestamp()
-        self._save_session(username, session)
-
-        # Transition to refined if needed
-        if self._should_transition_to_refined(session):
+        else:
+            # Re-rank this worker's view of the refined queue around this swipe
+            self.rerank_service.observe_swipe(username, session, track, liked)
+
+        # Start building the refined queue in the background once the threshold is hit;
+        # /next keeps serving seeds until it is ready.
+        refine_in_background = False
+        if self._should_transition_to_refined(session) and session.refinement_status is None:
+            if self._reserve_refinement(username, session.session_id):
+                session.refinement_status = "pending"
+                refine_in_background = True
+
+        # No background slot available: refine inline as before
+        if self._should_transition_to_refined(session) and session.refinement_status is None:
             session = self._transition_to_refined(username, session)
 
+        self._flush_session(username, session)
+        # Started only after "pending" is persisted, so the job's "ready" cannot be overwritten
+        if refine_in_background:
+            self._start_refinement(username, session.session_id)
         return session
 
     def get_next_track(self, username: str, session: MatchSession) -> tuple[Track | None, MatchSession]:
@@ -135,21 +179,29 @@ class SessionService:
         - Once refined is available (after threshold or seeds exhausted):
             - Blend sources: ~2/3 of the time pick from seeds, ~1/3 from refined.
             - Still skip anything in library or already swiped.
+
+        All session changes made while picking the track are written in a
+        single update at the end.
         """
         username = username.lower()
+        track, session = self._next_track(username, session)
+        self._flush_session(username, session)
+        return track, session
 
-        library_ids = set(self.user_service.get_library_track_ids(username))
-        swiped_ids = self.user_service.get_swiped_track_ids(username)
-        skip_ids = library_ids | swiped_ids
+    def _next_track(self, username: str, session: MatchSession) -> tuple[Track | None, MatchSession]:
+        skip_ids = self._skip_ids(username, session)
 
         # --- Pure seed phase: before we generate refined recs ---
         if session.phase == "seed":
-            # If not enough swipes yet, just use seed-only behavior with current_index
-            if not self._should_transition_to_refined(session):
+            if session.refinement_status == "ready":
+                # Background refinement finished: switch to blended mode
+                self._activate_refined(username, session)
+            elif not self._should_transition_to_refined(session) or session.refinement_status == "pending":
+                # Not enough swipes yet, or the refined queue is still being built
                 return self._next_from_seed_only(username, session, skip_ids)
-
-            # Otherwise, generate refined_track_ids and switch to blended mode
-            session = self._transition_to_refined(username, session)
+            else:
+                # Otherwise, generate refined_track_ids and switch to blended mode
+                session = self._transition_to_refined(username, session)
 
         # --- Blended mode: seeds + refined (phase "refined") ---
         track = self._next_mixed_track(username, session, skip_ids)
@@ -157,8 +209,6 @@ class SessionService:
         if track is None:
             # No tracks left from either source
             session.status = "completed"
-            session.updated_at = server_timestamp()
-            self._save_session(username, session)
             return None, session
 
         return track, session
@@ -190,18 +240,22 @@ class SessionService:
             if track_id in skip_ids:
                 continue
 
-            track = self.track_service.get_track(track_id)
+            track = self._resolve_track(username, session, track_id, upcoming=universe[index:])
             if not track:
                 continue
 
             session.current_index = index
-            session.updated_at = server_timestamp()
-            self._save_session(username, session)
             return track, session
 
-        # Ran out of seed tracks: force refinement and then blend
-        session = self._transition_to_refined(username, session)
-        return self.get_next_track(username, session)
+        # Ran out of seed tracks: use the background result if it landed meanwhile,
+        # otherwise force refinement synchronously, then blend
+        latest = self.get_session(username, session.session_id)
+        if latest.refinement_status == "ready" and latest.phase == "seed":
+            session.refined_track_ids = latest.refined_track_ids
+            self._activate_refined(username, session)
+        else:
+            session = self._transition_to_refined(username, session)
+        return self._next_track(username, session)
     
     def _next_mixed_track(
     self,
@@ -220,7 +274,7 @@ class SessionService:
 
         # --- Sources ---
         seed_ids = session.seed_track_ids or []
-        refined_ids = session.refined_track_ids or []
+        refined_ids = self.rerank_service.refined_queue(username, session)
 
         # Randomly choose which bucket to attempt first
         prefer_seed = random.random() < 0.66
@@ -238,14 +292,13 @@ class SessionService:
                 if tid in skip_ids:
                     continue
 
-                t = self.track_service.get_track(tid)
+                upcoming = [track_ids[(idx + 1 + k) % n] for k in range(min(n - 1, UPCOMING_TRACKS_BATCH))]
+                t = self._resolve_track(username, session, tid, upcoming=upcoming)
                 if not t:
                     continue
 
                 # Update index only after confirming the track is valid
                 session.current_index = idx + 1
-                session.updated_at = server_timestamp()
-                self._save_session(username, session)
                 return t
 
             return None
@@ -265,6 +318,65 @@ class SessionService:
 
 
     def _transition_to_refined(self, username: str, session: MatchSession) -> MatchSession:
+        session.refined_track_ids = self._build_refined_queue(username, session)
+        self._activate_refined(username, session)
+        return session
+
+    def _activate_refined(self, username: str, session: MatchSession) -> None:
+        session.phase = "refined"
+        session.refinement_status = "ready"
+        session.current_index = 0
+
+    def _reserve_refinement(self, username: str, session_id: str) -> bool:
+        """
+        Claim a slot on the bounded refinement pool for this session. Returns
+        False when the pool is saturated or the session is already being
+        refined, so the caller can fall back to refining inline.
+        """
+        key = (username.lower(), session_id)
+        with _refinements_lock:
+            if key in _refinements_in_flight:
+                return False
+            if not _refinement_slots.acquire(blocking=False):
+                return False
+            _refinements_in_flight.add(key)
+        return True
+
+    def _start_refinement(self, username: str, session_id: str) -> None:
+        """Run _refine_in_background for a session reserved by _reserve_refinement."""
+        key = (username.lower(), session_id)
+        app = current_app._get_current_object()
+
+        def run() -> None:
+            try:
+                with app.app_context():
+                    SessionService()._refine_in_background(*key)
+            finally:
+                with _refinements_lock:
+                    _refinements_in_flight.discard(key)
+                _refinement_slots.release()
+
+        _refinement_executor.submit(run)
+
+    def _refine_in_background(self, username: str, session_id: str) -> None:
+        """Build the refined queue and store it on the session without touching the seed pointer."""
+        try:
+            session = self.get_session(username, session_id)
+            if session.phase != "seed":
+                return
+            refined_ids = self._build_refined_queue(username, session)
+            # Skipped when /next refined synchronously while we were working
+            session_cache.apply(
+                username,
+                session_id,
+                {"refined_track_ids": refined_ids, "refinement_status": "ready"},
+                only_if={"phase": "seed"},
+            )
+        except Exception as exc:
+            print(f"Background refinement failed for {username}/{session_id}: {exc}")
+            session_cache.apply(username, session_id, {"refinement_status": "failed"}, only_if={"phase": "seed"})
+
+    def _build_refined_queue(self, username: str, session: MatchSession) -> list[str]:
         # Get user profile; ensure it exists
         profile = self.user_service.get_user(username) or self.user_service.ensure_user(username)
 
@@ -284,7 +396,8 @@ class SessionService:
         preferences = self.recommendation_service.build_feature_preferences(profile)
 
         library_ids = set(self.user_service.get_library_track_ids(username))
-        swiped_ids = self.user_service.get_swiped_track_ids(username)
+        swipes = self.user_service.get_swipes(username)
+        swiped_ids = {tid for tid, _ in swipes}
         exclude_ids = library_ids | swiped_ids
 
         # Build two buckets and enforce ~1/3 recommendations and ~2/3 seed-based candidates
@@ -298,7 +411,10 @@ class SessionService:
             feature_preferences=preferences,
             exclude_track_ids=exclude_ids,
             limit=rec_quota * 3,
+            anchor_track_ids=self.library_service.get_recent_library_track_ids(username),
         )
+        # Collaborative signal: ALS embeddings with this user's swipes folded in
+        rec_candidates = self.embedding_service.rerank(username, rec_candidates, swipes=swipes)
 
         seed_tracks = self.track_service.get_candidate_tracks(
             top_genres=top_genres,
@@ -348,12 +464,21 @@ class SessionService:
         if len(final_ids) < TOTAL_LIMIT:
             take_from(seed_candidates, TOTAL_LIMIT - len(final_ids))
 
-        session.refined_track_ids = final_ids
-        session.phase = "refined"
-        session.current_index = 0
-        session.updated_at = server_timestamp()
-        self._save_session(username, session)
-        return session
+        # Keep the pool in this worker so later swipes can re-rank it in place
+        pool_tracks = {t.track_id: t for t in seed_tracks if t.track_id in seen}
+        pool_tracks.update(
+            (t.track_id, t)
+            for t in self.track_service.get_tracks_by_ids(tid for tid in final_ids if tid not in pool_tracks)
+        )
+        self.rerank_service.start_pool(
+            username,
+            session.session_id,
+            tracks=[pool_tracks[tid] for tid in final_ids if tid in pool_tracks],
+            profile=profile,
+            fallback_genres=top_genres,
+        )
+
+        return final_ids
 
     def _session_ref(self, username: str, session_id: str):
         return (
@@ -363,12 +488,59 @@ class SessionService:
             .document(session_id)
         )
 
-    def _save_session(self, username: str, session: MatchSession) -> None:
+    def _flush_session(self, username: str, session: MatchSession) -> None:
+        """
+        End of a request's unit of work: hand the session to the write-behind
+        cache, which writes only the changed fields (right away once the
+        session completes). Sessions not held by the cache are written in full.
+        """
+        if session_cache.commit(username, session, immediate=session.status == "completed"):
+            return
         payload = session.to_dict()
-        # Always update updated_at on save
+        # Always update updated_at on save; bump version so cached copies elsewhere revalidate
         payload["updated_at"] = server_timestamp()
+        payload["version"] = firestore.Increment(1)
         self._session_ref(username, session.session_id).set(payload, merge=True)
 
+    def _skip_ids(self, username: str, session: MatchSession) -> set[str]:
+        """Library + swiped track ids, loaded once per cached session and kept up to date by register_swipe."""
+        cached = session_cache.get(username, session.session_id)
+        if cached is not None and cached.skip_ids is not None:
+            return cached.skip_ids
+
+        library_ids = set(self.user_service.get_library_track_ids(username))
+        swiped_ids = self.user_service.get_swiped_track_ids(username)
+        skip_ids = library_ids | swiped_ids
+        if cached is not None:
+            cached.skip_ids = skip_ids
+        return skip_ids
+
+    def _resolve_track(
+        self,
+        username: str,
+        session: MatchSession,
+        track_id: str,
+        upcoming: list[str],
+    ) -> Track | None:
+        """
+        Resolve a queue track through the session cache. On a miss, the track
+        and the next few ``upcoming`` ids are fetched in one batched read so
+        the following /next calls are served from memory.
+        """
+        cached = session_cache.get(username, session.session_id)
+        if cached is None:
+            return self.track_service.get_track(track_id)
+        if track_id in cached.tracks:
+            return cached.tracks[track_id]
+
+        batch = [track_id] + [
+            tid for tid in upcoming[:UPCOMING_TRACKS_BATCH] if tid not in cached.tracks and tid != track_id
+        ]
+        found = {t.track_id: t for t in self.track_service.get_tracks_by_ids(batch)}
+        for tid in batch:
+            cached.tracks[tid] = found.get(tid)
+        return cached.tracks[track_id]
+
     def like_track_without_session(
     self,
     username: str,
@@ -412,4 +584,3 @@ class SessionService:
         )
 
         return track
-
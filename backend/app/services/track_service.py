@@ -1,12 +1,21 @@
 from __future__ import annotations
 
+import heapq
 import random
+import threading
 from typing import Iterable
 
+import numpy as np
 from firebase_admin import firestore
 
 from app.firebase_client import get_firestore_client
 from app.models import Track
+from app.services.catalog_service import CatalogSnapshot, get_catalog
+from app.utils.alias import GroupedAliasSampler
+
+EXPLORATION_POOL = 800  # most popular tracks considered for exploration picks
+SEED_MIN_POPULARITY = 0.75  # seed tracks come from the popular head of the catalog
+CANDIDATE_MIN_POPULARITY = 0.6  # floor for refined-queue candidates (Firestore query and catalog scoring)
 
 
 class TrackService:
@@ -35,10 +44,14 @@ class TrackService:
         return results
 
     def get_seed_tracks(self, exclude_track_ids: set[str], limit: int = 12) -> list[Track]:
+        catalog = get_catalog()
+        if catalog is not None:
+            return self._seed_tracks_from_catalog(catalog, exclude_track_ids, limit)
+
         # Pull a bigger pool of popular tracks
         query = (
             self.db.collection("tracks")
-            .where("popularity_norm", ">=", 0.75)
+            .where("popularity_norm", ">=", SEED_MIN_POPULARITY)
             .order_by("popularity_norm", direction=firestore.Query.DESCENDING)
             .limit(1000)  # was 400
         )
@@ -72,15 +85,41 @@ class TrackService:
 
         return selected
 
+    def _seed_tracks_from_catalog(
+        self,
+        catalog: CatalogSnapshot,
+        exclude_track_ids: set[str],
+        limit: int,
+    ) -> list[Track]:
+        """
+        Seeds drawn from the catalog's per-genre alias tables: genres are
+        visited round-robin in random order and each visit picks a track with
+        probability proportional to ``popularity_norm``. Excluded tracks are
+        rejected and redrawn, so the cost depends on ``limit`` rather than on
+        the size of the popular pool.
+        """
+        sampler = _seed_sampler_for(catalog)
+        rows = sampler.sample(
+            limit,
+            accept=lambda row: catalog.track_id_at(row) not in exclude_track_ids,
+        )
+        track_ids = catalog.track_ids_at(rows)
+        track_map = {t.track_id: t for t in self.get_tracks_by_ids(track_ids)}
+        return [track_map[tid] for tid in track_ids if tid in track_map]
+
     def get_candidate_tracks(
         self,
         top_genres: list[str],
         exclude_track_ids: set[str],
         limit: int = 300,
     ) -> list[Track]:
+        catalog = get_catalog()
+        if catalog is not None:
+            return self._candidate_tracks_from_catalog(catalog, top_genres, exclude_track_ids, limit)
+
         query = (
             self.db.collection("tracks")
-            .where("popularity_norm", ">=", 0.6)
+            .where("popularity_norm", ">=", CANDIDATE_MIN_POPULARITY)
             .order_by("popularity_norm", direction=firestore.Query.DESCENDING)
             .limit(800)
         )
@@ -109,6 +148,99 @@ class TrackService:
             candidates.extend(exploration[: limit - len(candidates)])
         return candidates
 
+    def _candidate_tracks_from_catalog(
+        self,
+        catalog: CatalogSnapshot,
+        top_genres: list[str],
+        exclude_track_ids: set[str],
+        limit: int,
+    ) -> list[Track]:
+        """
+        Genre candidates from the catalog's per-genre popularity partitions.
+
+        The popularity-sorted slice of every requested genre (and genre group)
+        is merged with a k-way heap, stopping once ``limit`` rows are taken, so
+        niche genres are reached without scanning the global head. Any
+        shortfall is topped up with shuffled picks from the most popular
+        tracks, as before. Like the Firestore query, only tracks with
+        ``popularity_norm >= CANDIDATE_MIN_POPULARITY`` are considered.
+        """
+        popularity = catalog.popularity
+        # Slices are sorted by popularity, so the floor cuts each one to a prefix
+        slices = [
+            rows[: int(np.count_nonzero(popularity[rows] >= CANDIDATE_MIN_POPULARITY))]
+            for genre in top_genres
+            if genre
+            for rows in catalog.genre_slices(genre)
+        ]
+        excluded_rows = set(catalog.rows_of(exclude_track_ids).tolist()) if exclude_track_ids else set()
+
+        # (-popularity, slice number, position within slice)
+        heap = [(-float(popularity[rows[0]]), i, 0) for i, rows in enumerate(slices) if len(rows)]
+        heapq.heapify(heap)
+
+        selected: list[int] = []
+        seen: set[int] = set()
+        while heap and len(selected) < limit:
+            _, i, pos = heapq.heappop(heap)
+            rows = slices[i]
+            row = int(rows[pos])
+            if pos + 1 < len(rows):
+                heapq.heappush(heap, (-float(popularity[rows[pos + 1]]), i, pos + 1))
+            if row in excluded_rows or row in seen:
+                continue
+            seen.add(row)
+            selected.append(row)
+
+        if len(selected) < limit:
+            above_floor = int(np.count_nonzero(popularity >= CANDIDATE_MIN_POPULARITY))
+            exploration = [
+                int(row)
+                for row in catalog.popularity_index[: min(EXPLORATION_POOL, above_floor)]
+                if int(row) not in seen and int(row) not in excluded_rows
+            ]
+            random.shuffle(exploration)
+            selected.extend(exploration[: limit - len(selected)])
+
+        track_ids = catalog.track_ids_at(selected)
+        track_map = {t.track_id: t for t in self.get_tracks_by_ids(track_ids)}
+        return [track_map[tid] for tid in track_ids if tid in track_map]
+
+    def get_similar_tracks(
+        self,
+        track_id: str,
+        k: int = 10,
+        genres: list[str] | None = None,
+    ) -> list[tuple[Track, float]]:
+        """
+        Nearest tracks to ``track_id`` in audio-feature space, with their
+        similarity (``1 / (1 + distance)``), closest first. Read straight from
+        the precomputed neighbour graph when it covers the request.
+
+        Raises:
+            RuntimeError if the shared catalog is not published.
+            ValueError if the track is not in the catalog.
+        """
+        catalog = get_catalog()
+        if catalog is None:
+            raise RuntimeError("Track catalog is not loaded.")
+        row = catalog.row_of(track_id)
+        if row is None:
+            raise ValueError("Track not found.")
+
+        if not genres and k <= catalog.graph_width():
+            rows, similarities = catalog.neighbours(row)
+            rows, similarities = rows[:k], similarities[:k]
+        else:
+            rows, similarities = catalog.nearest_rows(row, k, genres=genres)
+        track_ids = catalog.track_ids_at(rows)
+        track_map = {t.track_id: t for t in self.get_tracks_by_ids(track_ids)}
+        return [
+            (track_map[tid], float(similarity))
+            for tid, similarity in zip(track_ids, similarities)
+            if tid in track_map
+        ]
+
     def search_tracks(self, query_norm: str, limit: int = 20) -> list[Track]:
         upper_bound = f"{query_norm}\uf8ff"
         docs = (
@@ -124,3 +256,32 @@ class TrackService:
             data = doc.to_dict() or {}
             tracks.append(Track.from_mapping(doc.id, data))
         return tracks
+
+
+_seed_lock = threading.Lock()
+_seed_sampler: tuple[int, GroupedAliasSampler] | None = None
+
+
+def _seed_sampler_for(catalog: CatalogSnapshot) -> GroupedAliasSampler:
+    """Build (once per catalog version) the seed sampler over the popular head."""
+    global _seed_sampler
+    with _seed_lock:
+        if _seed_sampler is not None and _seed_sampler[0] == catalog.version:
+            return _seed_sampler[1]
+
+        by_popularity = catalog.popularity_index
+        popularity = catalog.popularity[by_popularity]
+        rows = by_popularity[: int(np.count_nonzero(popularity >= SEED_MIN_POPULARITY))]
+
+        # Same genre key as the Firestore path: group, else genre, else "misc"
+        n_groups = len(catalog.genre_groups)
+        group_codes = catalog.genre_group_codes[rows].astype(np.int32)
+        genre_codes = catalog.genre_codes[rows].astype(np.int32)
+        keys = np.where(
+            group_codes >= 0,
+            group_codes,
+            np.where(genre_codes >= 0, n_groups + genre_codes, n_groups + len(catalog.genres)),
+        )
+        sampler = GroupedAliasSampler(rows, catalog.popularity[rows], keys)
+        _seed_sampler = (catalog.version, sampler)
+        return sampler
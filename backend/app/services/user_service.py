@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from typing import Any, Iterable
+from typing import Any, Iterable, Iterator
 
 from firebase_admin import firestore
 
@@ -73,16 +73,59 @@ class UserService:
         return [d.id for d in docs]
 
     def get_swiped_track_ids(self, username: str) -> set[str]:
+        return {tid for tid, _ in self.get_swipes(username)}
+
+    def get_swipes(self, username: str) -> list[tuple[str, bool]]:
+        """The user's swipes as ``(track_id, liked)`` pairs, oldest document id first."""
         username = username.lower()
         user_ref = self.db.collection("users").document(username)
-        docs = user_ref.collection("swipes").stream()
-        ids: set[str] = set()
+        docs = user_ref.collection("swipes").select(["track_id", "direction"]).stream()
+        swipes: list[tuple[str, bool]] = []
         for d in docs:
             data = d.to_dict() or {}
             tid = data.get("track_id")
             if tid:
-                ids.add(tid)
-        return ids
+                swipes.append((tid, data.get("direction") == "like"))
+        return swipes
+
+    def iter_swipes_by_user(self, page_size: int = 5000) -> Iterator[tuple[str, list[tuple[str, bool]]]]:
+        """
+        Stream every user's swipes as ``(username, [(track_id, liked), ...])``.
+
+        Pages through the `swipes` collection group ordered by document path,
+        which keeps each user's swipes contiguous, so only one user's swipes
+        are held at a time.
+        """
+        current_user: str | None = None
+        current: list[tuple[str, bool]] = []
+        last_doc = None
+        while True:
+            query = (
+                self.db.collection_group("swipes")
+                .select(["track_id", "direction"])
+                .order_by("__name__")
+                .limit(page_size)
+            )
+            if last_doc is not None:
+                query = query.start_after(last_doc)
+            docs = list(query.stream())
+
+            for doc in docs:
+                username = doc.reference.parent.parent.id
+                if username != current_user:
+                    if current_user is not None and current:
+                        yield current_user, current
+                    current_user, current = username, []
+                data = doc.to_dict() or {}
+                if tid := data.get("track_id"):
+                    current.append((tid, data.get("direction") == "like"))
+
+            if len(docs) < page_size:
+                break
+            last_doc = docs[-1]
+
+        if current_user is not None and current:
+            yield current_user, current
 
     def get_top_genres(self, profile: UserProfile, top_n: int = 5) -> list[str]:
         """
@@ -130,6 +173,14 @@ class UserService:
         )
 
         # 2) Update aggregated counters on UserProfile
+        self.apply_swipe_to_profile(profile, track, liked)
+
+        # 3) Save profile back
+        self.save_user(profile)
+
+    @staticmethod
+    def apply_swipe_to_profile(profile: UserProfile, track: Track, liked: bool) -> None:
+        """Fold one swipe into the profile's counters, genre counts and feature sums (in memory)."""
         if liked:
             profile.likes_count += 1
         else:
@@ -152,6 +203,3 @@ class UserService:
                 profile.feature_sums_liked[feature] = profile.feature_sums_liked.get(feature, 0.0) + float(value)
             else:
                 profile.feature_sums_disliked[feature] = profile.feature_sums_disliked.get(feature, 0.0) + float(value)
-
-        # 3) Save profile back
-        self.save_user(profile)
@@ -0,0 +1,114 @@
+"""Weighted sampling in O(1) per draw with Vose's alias method."""
+from __future__ import annotations
+
+import random
+from typing import Callable
+
+import numpy as np
+
+
+class AliasTable:
+    """
+    Discrete distribution over ``range(len(weights))`` prepared for O(1) draws.
+
+    Built once in O(n): every slot keeps its own outcome with probability
+    ``prob[i]`` and otherwise yields ``alias[i]``. Tables are plain lists so a
+    draw costs two ``random()`` calls and two list reads.
+    """
+
+    __slots__ = ("prob", "alias")
+
+    def __init__(self, weights: np.ndarray) -> None:
+        weights = np.clip(np.asarray(weights, dtype=np.float64), 0.0, None)
+        n = weights.shape[0]
+        total = weights.sum()
+        if n == 0 or total <= 0:
+            # Degenerate input: fall back to uniform over the outcomes
+            self.prob = [1.0] * n
+            self.alias = list(range(n))
+            return
+
+        scaled = weights * (n / total)
+        prob = [1.0] * n
+        alias = list(range(n))
+        small = [i for i in range(n) if scaled[i] < 1.0]
+        large = [i for i in range(n) if scaled[i] >= 1.0]
+        scaled = scaled.tolist()
+        while small and large:
+            s, l = small.pop(), large.pop()
+            prob[s] = scaled[s]
+            alias[s] = l
+            scaled[l] -= 1.0 - scaled[s]
+            (small if scaled[l] < 1.0 else large).append(l)
+        # Leftovers are 1.0 up to rounding error
+        self.prob = prob
+        self.alias = alias
+
+    def __len__(self) -> int:
+        return len(self.prob)
+
+    def draw(self, rng: random.Random | None = None) -> int:
+        uniform = (rng or random).random
+        i = int(uniform() * len(self.prob))
+        return i if uniform() < self.prob[i] else self.alias[i]
+
+
+class GroupedAliasSampler:
+    """
+    One alias table per group over a fixed set of row ids.
+
+    ``sample`` visits the groups round-robin in a random order and draws one
+    row per visit, so results stay spread across groups while rows within a
+    group are picked proportionally to their weight. Rows rejected by
+    ``accept`` (or already taken) are redrawn up to ``max_rejections`` times
+    before the group is skipped for the rest of the call.
+    """
+
+    def __init__(self, rows: np.ndarray, weights: np.ndarray, groups: np.ndarray) -> None:
+        rows = np.asarray(rows)
+        groups = np.asarray(groups)
+        order = np.argsort(groups, kind="stable")
+        rows, weights, groups = rows[order], np.asarray(weights)[order], groups[order]
+        keys, starts = np.unique(groups, return_index=True)
+        bounds = np.append(starts, groups.shape[0])
+
+        self.groups: list = keys.tolist()
+        self._rows: list[list[int]] = []
+        self._tables: list[AliasTable] = []
+        for i in range(len(keys)):
+            lo, hi = bounds[i], bounds[i + 1]
+            self._rows.append(rows[lo:hi].tolist())
+            self._tables.append(AliasTable(weights[lo:hi]))
+
+    def __len__(self) -> int:
+        return sum(len(rows) for rows in self._rows)
+
+    def sample(
+        self,
+        limit: int,
+        accept: Callable[[int], bool] | None = None,
+        max_rejections: int = 8,
+        rng: random.Random | None = None,
+    ) -> list[int]:
+        rng = rng or random
+        active = list(range(len(self._tables)))
+        rng.shuffle(active)
+
+        selected: list[int] = []
+        taken: set[int] = set()
+        while len(selected) < limit and active:
+            still_active: list[int] = []
+            for g in active:
+                if len(selected) >= limit:
+                    still_active.append(g)
+                    continue
+                rows, table = self._rows[g], self._tables[g]
+                for _ in range(max_rejections):
+                    row = rows[table.draw(rng)]
+                    if row not in taken and (accept is None or accept(row)):
+                        taken.add(row)
+                        selected.append(row)
+                        still_active.append(g)
+                        break
+            active = still_active
+        return selected
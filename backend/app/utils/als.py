@@ -0,0 +1,159 @@
+"""Implicit-feedback ALS (Hu, Koren & Volinsky 2008) over like/dislike swipes."""
+from __future__ import annotations
+
+from typing import Iterable
+
+import numpy as np
+
+ALS_CHUNK_NNZ = 8192  # interactions per batched solve (~32 MB of outer products at 32 factors)
+
+
+def swipe_signals(liked: np.ndarray, alpha: float, dislike_weight: float) -> tuple[np.ndarray, np.ndarray]:
+    """
+    ``(confidence, preference)`` per swipe.
+
+    A like is a confident 1; a dislike is a (less) confident 0, which pushes
+    the pair apart harder than an unseen track does.
+    """
+    liked = np.asarray(liked, dtype=bool)
+    confidence = np.where(liked, 1.0 + alpha, 1.0 + alpha * dislike_weight).astype(np.float32)
+    return confidence, liked.astype(np.float32)
+
+
+def build_interactions(
+    user_swipes: Iterable[tuple[str, list[tuple[str, bool]]]],
+) -> tuple[list[str], np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Flatten ``(username, [(track_id, liked), ...])`` into COO arrays.
+
+    Repeated swipes on a track collapse to one interaction that counts as a
+    like if any of them was. Returns ``(usernames, track_ids, user_idx,
+    item_idx, liked)`` with ``track_ids`` sorted (bytes) so lookups can
+    binary-search it.
+    """
+    usernames: list[str] = []
+    item_lookup: dict[str, int] = {}
+    user_idx: list[int] = []
+    item_idx: list[int] = []
+    liked: list[bool] = []
+
+    for username, swipes in user_swipes:
+        merged: dict[str, bool] = {}
+        for track_id, is_like in swipes:
+            merged[track_id] = merged.get(track_id, False) or is_like
+        if not merged:
+            continue
+        u = len(usernames)
+        usernames.append(username)
+        for track_id, is_like in merged.items():
+            user_idx.append(u)
+            item_idx.append(item_lookup.setdefault(track_id, len(item_lookup)))
+            liked.append(is_like)
+
+    raw_ids = np.array([tid.encode("utf-8") for tid in item_lookup], dtype=bytes)
+    order = np.argsort(raw_ids, kind="stable")
+    remap = np.empty_like(order)
+    remap[order] = np.arange(order.size)
+    items = remap[np.asarray(item_idx, dtype=np.int64)] if item_idx else np.empty(0, dtype=np.int64)
+    return (
+        usernames,
+        raw_ids[order],
+        np.asarray(user_idx, dtype=np.int64),
+        items.astype(np.int64),
+        np.asarray(liked, dtype=bool),
+    )
+
+
+def _to_csr(rows: np.ndarray, cols: np.ndarray, n_rows: int, *values: np.ndarray):
+    order = np.argsort(rows, kind="stable")
+    indptr = np.zeros(n_rows + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=n_rows), out=indptr[1:])
+    return (indptr, cols[order], *(v[order] for v in values))
+
+
+def _least_squares(
+    fixed: np.ndarray,
+    indptr: np.ndarray,
+    indices: np.ndarray,
+    confidence: np.ndarray,
+    preference: np.ndarray,
+    reg: float,
+) -> np.ndarray:
+    """
+    Solve every row's ``(YtY + Yt(C - I)Y + reg I) x = Yt C p`` against the
+    ``fixed`` factors, batching rows so each batch touches ~ALS_CHUNK_NNZ
+    interactions.
+    """
+    n_rows = indptr.shape[0] - 1
+    factors = fixed.shape[1]
+    base = fixed.T @ fixed + reg * np.eye(factors, dtype=np.float32)
+    out = np.zeros((n_rows, factors), dtype=np.float32)
+
+    row = 0
+    while row < n_rows:
+        end = int(np.searchsorted(indptr, indptr[row] + ALS_CHUNK_NNZ, side="right")) - 1
+        end = min(max(end, row + 1), n_rows)
+        counts = np.diff(indptr[row : end + 1])
+        nonempty = np.flatnonzero(counts)
+        if nonempty.size:
+            s, e = indptr[row], indptr[end]
+            y = fixed[indices[s:e]]
+            c = confidence[s:e]
+            starts = (indptr[row:end] - s)[nonempty]
+
+            outer = np.einsum("mi,mj->mij", y * (c - 1.0)[:, None], y)
+            a = base + np.add.reduceat(outer, starts, axis=0)
+            b = np.add.reduceat(y * (c * preference[s:e])[:, None], starts, axis=0)
+            out[row + nonempty] = np.linalg.solve(a, b[..., None])[..., 0]
+        row = end
+    return out
+
+
+def train_implicit_als(
+    user_idx: np.ndarray,
+    item_idx: np.ndarray,
+    liked: np.ndarray,
+    n_users: int,
+    n_items: int,
+    factors: int = 32,
+    iterations: int = 10,
+    reg: float = 0.1,
+    alpha: float = 20.0,
+    dislike_weight: float = 0.5,
+    seed: int = 0,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Alternate exact least-squares solves; returns float32 ``(user_factors, item_factors)``."""
+    confidence, preference = swipe_signals(liked, alpha, dislike_weight)
+    by_user = _to_csr(user_idx, item_idx, n_users, confidence, preference)
+    by_item = _to_csr(item_idx, user_idx, n_items, confidence, preference)
+
+    rng = np.random.default_rng(seed)
+    users = (rng.standard_normal((n_users, factors)) * 0.01).astype(np.float32)
+    items = (rng.standard_normal((n_items, factors)) * 0.01).astype(np.float32)
+    for _ in range(iterations):
+        users = _least_squares(items, *by_user, reg=reg)
+        items = _least_squares(users, *by_item, reg=reg)
+    return users, items
+
+
+def fold_in_user(
+    item_factors: np.ndarray,
+    gram: np.ndarray,
+    item_rows: np.ndarray,
+    liked: np.ndarray,
+    reg: float,
+    alpha: float,
+    dislike_weight: float,
+) -> np.ndarray:
+    """
+    One user's vector from their swipes against fixed item factors, the same
+    solve as a training step. ``gram`` is the precomputed ``YtY``.
+    """
+    factors = item_factors.shape[1]
+    if item_rows.size == 0:
+        return np.zeros(factors, dtype=np.float32)
+    confidence, preference = swipe_signals(liked, alpha, dislike_weight)
+    y = np.asarray(item_factors[item_rows], dtype=np.float32)
+    a = gram + (y * (confidence - 1.0)[:, None]).T @ y + reg * np.eye(factors, dtype=np.float32)
+    b = y.T @ (confidence * preference)
+    return np.linalg.solve(a, b).astype(np.float32)
@@ -0,0 +1,105 @@
+"""Item-item co-like counts from swipe history, accumulated in bounded memory."""
+from __future__ import annotations
+
+import numpy as np
+
+MAX_LIKES_PER_USER = 500  # caps the per-user pair fan-out at ~125k pairs
+PAIR_BUFFER_SIZE = 4_000_000  # pending pair keys (int64) before compaction, ~32 MB
+
+
+class CoLikeAccumulator:
+    """
+    Counts how many users liked each pair of catalog rows.
+
+    Pairs are buffered as ``a * n + b`` int64 keys (``a < b``) and compacted
+    into sorted unique keys with counts whenever the buffer fills, so memory
+    tracks the number of distinct co-liked pairs rather than swipe volume.
+    """
+
+    def __init__(self, n_tracks: int, seed: int = 0) -> None:
+        self.n_tracks = n_tracks
+        self.like_counts = np.zeros(n_tracks, dtype=np.int64)
+        self.users = 0
+        self._keys = np.empty(0, dtype=np.int64)
+        self._counts = np.empty(0, dtype=np.int64)
+        self._buffer: list[np.ndarray] = []
+        self._buffered = 0
+        self._rng = np.random.default_rng(seed)
+
+    def add_user(self, liked_rows: np.ndarray) -> None:
+        rows = np.unique(np.asarray(liked_rows, dtype=np.int64))
+        if rows.size > MAX_LIKES_PER_USER:
+            rows = np.sort(self._rng.choice(rows, MAX_LIKES_PER_USER, replace=False))
+        if rows.size == 0:
+            return
+        self.users += 1
+        self.like_counts[rows] += 1
+        if rows.size < 2:
+            return
+
+        a, b = np.triu_indices(rows.size, k=1)
+        keys = rows[a] * self.n_tracks + rows[b]
+        self._buffer.append(keys)
+        self._buffered += keys.size
+        if self._buffered >= PAIR_BUFFER_SIZE:
+            self._compact()
+
+    def _compact(self) -> None:
+        if not self._buffer:
+            return
+        keys = np.concatenate([self._keys, *self._buffer])
+        counts = np.concatenate([self._counts, np.ones(self._buffered, dtype=np.int64)])
+        self._buffer, self._buffered = [], 0
+
+        order = np.argsort(keys, kind="stable")
+        keys, counts = keys[order], counts[order]
+        starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+        self._keys = keys[starts]
+        self._counts = np.add.reduceat(counts, starts)
+
+    def to_csr(self, min_count: int = 2) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Symmetric co-like matrix as CSR ``(indptr, indices, scores)``.
+
+        Pairs liked together by fewer than ``min_count`` users are dropped.
+        Scores are cosine-normalized counts, ``count / sqrt(likes_a * likes_b)``,
+        so very popular tracks do not dominate every row.
+        """
+        self._compact()
+        keep = self._counts >= min_count
+        keys, counts = self._keys[keep], self._counts[keep]
+        a, b = np.divmod(keys, self.n_tracks)
+        scores = counts / np.sqrt(self.like_counts[a] * self.like_counts[b])
+
+        rows = np.concatenate([a, b])
+        cols = np.concatenate([b, a])
+        data = np.concatenate([scores, scores]).astype(np.float32)
+        order = np.lexsort((-data, rows))
+        rows, cols, data = rows[order], cols[order], data[order]
+
+        indptr = np.zeros(self.n_tracks + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=self.n_tracks), out=indptr[1:])
+        return indptr, cols.astype(np.int32), data
+
+
+def build_colike_graph(
+    indptr: np.ndarray,
+    indices: np.ndarray,
+    scores: np.ndarray,
+    top_m: int,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Dense ``(N, top_m)`` neighbour table from a CSR matrix whose rows are
+    already sorted by score descending; short rows are padded with -1.
+    """
+    n = indptr.shape[0] - 1
+    graph_indices = np.full((n, top_m), -1, dtype=np.int32)
+    graph_scores = np.zeros((n, top_m), dtype=np.float16)
+
+    lengths = np.diff(indptr)
+    rows = np.repeat(np.arange(n), lengths)
+    rank = np.arange(indices.shape[0]) - np.repeat(indptr[:-1], lengths)
+    keep = rank < top_m
+    graph_indices[rows[keep], rank[keep]] = indices[keep]
+    graph_scores[rows[keep], rank[keep]] = scores[keep]
+    return graph_indices, graph_scores
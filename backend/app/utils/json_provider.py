@@ -0,0 +1,46 @@
+"""Flask JSON provider backed by orjson when it is installed."""
+from __future__ import annotations
+
+from typing import Any
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup, stdlib json otherwise
+    orjson = None
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """
+    Drop-in for Flask's default provider. With orjson available, responses
+    are encoded straight to bytes in one C call; output keeps Flask's
+    conventions (sorted keys, RFC 822 datetimes via ``default``, indented in
+    debug) except that non-ASCII text is sent as UTF-8 rather than escaped.
+    Without orjson it behaves exactly like DefaultJSONProvider.
+    """
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        if orjson is None or kwargs:
+            return super().dumps(obj, **kwargs)
+        return self._encode(obj).decode("utf-8")
+
+    def loads(self, s: str | bytes, **kwargs: Any) -> Any:
+        if orjson is None or kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args: Any, **kwargs: Any):
+        if orjson is None:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        return self._app.response_class(self._encode(obj, indent=indent) + b"\n", mimetype=self.mimetype)
+
+    def _encode(self, obj: Any, indent: bool = False) -> bytes:
+        option = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=self.default, option=option)
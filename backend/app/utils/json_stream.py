@@ -0,0 +1,106 @@
+"""Incremental extraction of string fields from a JSON object that arrives in chunks."""
+from __future__ import annotations
+
+from typing import Iterable
+
+_SIMPLE_ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+
+
+class JsonFieldStreamer:
+    """
+    Feed it the text of a JSON object piece by piece (e.g. LLM tokens) and
+    it returns the decoded characters of the watched top-level string fields
+    as soon as they arrive, without waiting for the object to be complete.
+
+    Only top-level ``"key": "string"`` pairs are surfaced; nested values and
+    anything before the opening brace (such as a code fence) are skipped.
+    Escapes split across chunks, including surrogate pairs, are handled.
+    """
+
+    def __init__(self, fields: Iterable[str]) -> None:
+        self.fields = set(fields)
+        self._depth = 0
+        self._expect_key = False
+        self._in_string = False
+        self._role: str | None = None  # "key" | "value" | None for strings we skip
+        self._key: list[str] = []
+        self._last_key: str | None = None
+        self._escape: str | None = None  # pending escape sequence after the backslash
+        self._high_surrogate: int | None = None
+
+    def feed(self, chunk: str) -> list[tuple[str, str]]:
+        """Consume ``chunk``; return ``(field, text)`` for new field text, in order."""
+        out: list[tuple[str, str]] = []
+        for ch in chunk:
+            if self._in_string:
+                self._string_char(ch, out)
+            else:
+                self._structural_char(ch)
+        return out
+
+    def _structural_char(self, ch: str) -> None:
+        if ch == '"':
+            self._in_string = True
+            if self._depth == 1 and self._expect_key:
+                self._role = "key"
+                self._key = []
+            elif self._depth == 1 and self._last_key in self.fields:
+                self._role = "value"
+            else:
+                self._role = None
+        elif ch in "{[":
+            self._depth += 1
+            if self._depth == 1:
+                self._expect_key = ch == "{"
+        elif ch in "}]":
+            self._depth -= 1
+        elif self._depth == 1 and ch == ":":
+            self._expect_key = False
+        elif self._depth == 1 and ch == ",":
+            self._expect_key = True
+
+    def _string_char(self, ch: str, out: list[tuple[str, str]]) -> None:
+        if self._escape is not None:
+            self._escape += ch
+            decoded = self._decode_escape()
+            if decoded is not None:
+                self._escape = None
+                self._emit(decoded, out)
+            return
+        if ch == "\\":
+            self._escape = ""
+        elif ch == '"':
+            self._in_string = False
+            if self._role == "key":
+                self._last_key = "".join(self._key)
+            self._role = None
+        else:
+            self._emit(ch, out)
+
+    def _decode_escape(self) -> str | None:
+        """The text for the pending escape, "" if it only buffered, None if incomplete."""
+        escape = self._escape or ""
+        if escape[0] != "u":
+            return _SIMPLE_ESCAPES.get(escape[0], escape[0])
+        if len(escape) < 5:
+            return None
+        code = int(escape[1:5], 16)
+        if 0xD800 <= code < 0xDC00:
+            self._high_surrogate = code
+            return ""
+        if 0xDC00 <= code < 0xE000 and self._high_surrogate is not None:
+            code = 0x10000 + ((self._high_surrogate - 0xD800) << 10) + (code - 0xDC00)
+        self._high_surrogate = None
+        return chr(code)
+
+    def _emit(self, text: str, out: list[tuple[str, str]]) -> None:
+        if not text:
+            return
+        if self._role == "key":
+            self._key.append(text)
+        elif self._role == "value":
+            field = self._last_key or ""
+            if out and out[-1][0] == field:
+                out[-1] = (field, out[-1][1] + text)
+            else:
+                out.append((field, text))
@@ -0,0 +1,122 @@
+"""KD-tree over the catalog's audio-feature matrix."""
+from __future__ import annotations
+
+from typing import Callable
+
+import numpy as np
+
+KD_LEAF_SIZE = 128
+KD_LEAVES_PER_SCAN = 8
+
+
+def build_kdtree(points: np.ndarray, leaf_size: int = KD_LEAF_SIZE) -> dict[str, np.ndarray]:
+    """
+    Partition ``points`` with median splits on the widest dimension until
+    leaves hold at most ``leaf_size`` rows.
+
+    Only the leaves are kept: ``kd_perm[kd_leaf_start[i]:kd_leaf_end[i]]``
+    are the rows of leaf ``i`` and ``kd_leaf_lo`` / ``kd_leaf_hi`` its
+    bounding box.
+    """
+    points = np.asarray(points, dtype=np.float32)
+    n, dims = points.shape
+    depth = max(0, int(np.ceil(np.log2(max(n, 1) / leaf_size))))
+
+    perm = np.arange(n, dtype=np.int32)
+    ranges = [(0, n)]
+    for _ in range(depth):
+        next_ranges: list[tuple[int, int]] = []
+        for s, e in ranges:
+            mid = s + (e - s) // 2
+            if e - s > 1:
+                block = points[perm[s:e]]
+                dim = int(np.argmax(block.max(axis=0) - block.min(axis=0)))
+                order = np.argpartition(block[:, dim], mid - s)
+                perm[s:e] = perm[s:e][order]
+            next_ranges.extend([(s, mid), (mid, e)])
+        ranges = next_ranges
+
+    ranges = [(s, e) for s, e in ranges if e > s]
+    leaf_start = np.array([s for s, _ in ranges], dtype=np.int32)
+    leaf_end = np.array([e for _, e in ranges], dtype=np.int32)
+    leaf_lo = np.empty((len(ranges), dims), dtype=np.float32)
+    leaf_hi = np.empty((len(ranges), dims), dtype=np.float32)
+    for i, (s, e) in enumerate(ranges):
+        block = points[perm[s:e]]
+        leaf_lo[i] = block.min(axis=0)
+        leaf_hi[i] = block.max(axis=0)
+
+    return {
+        "kd_perm": perm,
+        "kd_leaf_start": leaf_start,
+        "kd_leaf_end": leaf_end,
+        "kd_leaf_lo": leaf_lo,
+        "kd_leaf_hi": leaf_hi,
+    }
+
+
+class KDTree:
+    """
+    Read-only view over arrays produced by ``build_kdtree``.
+
+    Queries rank every leaf by its bounding-box distance in one vectorized
+    pass and scan leaves nearest-first, a few at a time, until the next box
+    is farther than the current k-th neighbour. With 8 dimensions this stays
+    exact and avoids walking internal nodes from Python.
+    """
+
+    def __init__(self, arrays: dict[str, np.ndarray], points: np.ndarray, scale: float = 1.0) -> None:
+        self.perm = arrays["kd_perm"]
+        self.leaf_start = arrays["kd_leaf_start"]
+        self.leaf_end = arrays["kd_leaf_end"]
+        self.leaf_lo = arrays["kd_leaf_lo"]
+        self.leaf_hi = arrays["kd_leaf_hi"]
+        self.points = points
+        self.scale = np.float32(scale)
+
+    def query(
+        self,
+        target: np.ndarray,
+        k: int,
+        row_filter: Callable[[np.ndarray], np.ndarray] | None = None,
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        ``k`` nearest rows to ``target`` by Euclidean distance.
+
+        ``row_filter`` maps a row array to a boolean keep-mask (genre
+        constraints, excluding the query track). Returns ``(rows, distances)``
+        sorted by distance.
+        """
+        target = np.asarray(target, dtype=np.float32)
+        gap = np.maximum(self.leaf_lo - target, 0.0) + np.maximum(target - self.leaf_hi, 0.0)
+        bounds = np.einsum("ij,ij->i", gap, gap)
+        order = np.argsort(bounds)
+
+        best_rows = np.empty(0, dtype=np.int64)
+        best_d2 = np.empty(0, dtype=np.float32)
+        worst = np.inf
+
+        for i in range(0, len(order), KD_LEAVES_PER_SCAN):
+            leaves = order[i : i + KD_LEAVES_PER_SCAN]
+            if bounds[leaves[0]] > worst:
+                break
+            rows = np.concatenate(
+                [self.perm[self.leaf_start[leaf] : self.leaf_end[leaf]] for leaf in leaves]
+            ).astype(np.int64)
+            if row_filter is not None:
+                rows = rows[row_filter(rows)]
+                if rows.size == 0:
+                    continue
+            diffs = self.points[rows].astype(np.float32) * self.scale - target
+            d2 = np.einsum("ij,ij->i", diffs, diffs)
+
+            best_rows = np.concatenate([best_rows, rows])
+            best_d2 = np.concatenate([best_d2, d2])
+            if best_d2.size > k:
+                keep = np.argpartition(best_d2, k - 1)[:k]
+                best_rows, best_d2 = best_rows[keep], best_d2[keep]
+            if best_d2.size == k:
+                worst = float(best_d2.max())
+
+        order = np.argsort(best_d2, kind="stable")
+        return best_rows[order], np.sqrt(best_d2[order])
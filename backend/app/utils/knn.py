@@ -0,0 +1,112 @@
+"""Exact top-K neighbour graph over the catalog feature matrix."""
+from __future__ import annotations
+
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+KNN_ROW_BLOCK = 512
+KNN_COL_BLOCK = 16384  # a row x column block of distances is 512 x 16384 float32 = 32 MB
+
+_worker_features: np.ndarray | None = None
+
+
+def knn_block(
+    features: np.ndarray,
+    start: int,
+    end: int,
+    k: int,
+    col_block: int = KNN_COL_BLOCK,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Top-``k`` neighbours of rows ``start:end`` against every row.
+
+    Distances come from ``|a|^2 + |b|^2 - 2ab`` with one matrix multiply per
+    column block, and a running top-k is kept, so memory is bounded by the
+    block sizes rather than the catalog size. Returns ``(indices, distances)``
+    sorted nearest first; a row never lists itself.
+    """
+    queries = np.asarray(features[start:end], dtype=np.float32)
+    query_norms = np.einsum("ij,ij->i", queries, queries)
+    own_rows = np.arange(start, end)
+    n = features.shape[0]
+
+    best_idx = np.empty((queries.shape[0], 0), dtype=np.int64)
+    best_d2 = np.empty((queries.shape[0], 0), dtype=np.float32)
+    for c0 in range(0, n, col_block):
+        columns = np.asarray(features[c0 : c0 + col_block], dtype=np.float32)
+        column_norms = np.einsum("ij,ij->i", columns, columns)
+        d2 = query_norms[:, None] + column_norms[None, :] - 2.0 * (queries @ columns.T)
+        np.maximum(d2, 0.0, out=d2)
+
+        inside = (own_rows >= c0) & (own_rows < c0 + columns.shape[0])
+        d2[np.flatnonzero(inside), own_rows[inside] - c0] = np.inf
+
+        column_idx = np.broadcast_to(np.arange(c0, c0 + columns.shape[0]), d2.shape)
+        cand_d2 = np.hstack([best_d2, d2])
+        cand_idx = np.hstack([best_idx, column_idx])
+        if cand_d2.shape[1] > k:
+            keep = np.argpartition(cand_d2, k - 1, axis=1)[:, :k]
+            cand_d2 = np.take_along_axis(cand_d2, keep, axis=1)
+            cand_idx = np.take_along_axis(cand_idx, keep, axis=1)
+        best_d2, best_idx = cand_d2, cand_idx
+
+    order = np.argsort(best_d2, axis=1, kind="stable")
+    best_idx = np.take_along_axis(best_idx, order, axis=1)
+    best_d2 = np.take_along_axis(best_d2, order, axis=1)
+    return best_idx, np.sqrt(best_d2)
+
+
+def _init_worker(features_path: str) -> None:
+    global _worker_features
+    _worker_features = np.load(features_path, mmap_mode="r")
+
+
+def _knn_task(start: int, end: int, k: int, col_block: int) -> tuple[np.ndarray, np.ndarray]:
+    assert _worker_features is not None
+    return knn_block(_worker_features, start, end, k, col_block)
+
+
+def build_knn_graph(
+    features: np.ndarray,
+    k: int,
+    workers: int | None = None,
+    row_block: int = KNN_ROW_BLOCK,
+    col_block: int = KNN_COL_BLOCK,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    ``(N, k)`` int32 neighbour rows and float16 similarities
+    (``1 / (1 + distance)``) for every row of ``features``.
+
+    Row blocks are spread over a process pool; workers memory-map one shared
+    copy of the (dequantized) feature matrix instead of each receiving it.
+    """
+    features = np.ascontiguousarray(features, dtype=np.float32)
+    n = features.shape[0]
+    k = max(0, min(k, n - 1))
+    indices = np.full((n, k), -1, dtype=np.int32)
+    scores = np.zeros((n, k), dtype=np.float16)
+    if k == 0:
+        return indices, scores
+
+    starts = list(range(0, n, row_block))
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        results = (knn_block(features, s, min(s + row_block, n), k, col_block) for s in starts)
+        for s, (idx, dist) in zip(starts, results):
+            indices[s : s + idx.shape[0]] = idx
+            scores[s : s + idx.shape[0]] = 1.0 / (1.0 + dist)
+        return indices, scores
+
+    with tempfile.TemporaryDirectory() as tmp:
+        features_path = os.path.join(tmp, "features.npy")
+        np.save(features_path, features)
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(features_path,)) as pool:
+            futures = [pool.submit(_knn_task, s, min(s + row_block, n), k, col_block) for s in starts]
+            for s, future in zip(starts, futures):
+                idx, dist = future.result()
+                indices[s : s + idx.shape[0]] = idx
+                scores[s : s + idx.shape[0]] = 1.0 / (1.0 + dist)
+    return indices, scores
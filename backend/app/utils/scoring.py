@@ -3,8 +3,13 @@ from __future__ import annotations
 import math
 from typing import Iterable, Mapping
 
+import numpy as np
+
 from app.models import NUMERIC_FEATURES
 
+FEATURE_DTYPES = ("float32", "float16", "uint8")
+SCORING_BLOCK_ROWS = 16384  # rows per pass; keeps block temporaries cache-resident
+
 
 def genre_rank_score(genre: str | None, top_genres: list[str]) -> float:
     if not genre:
@@ -40,6 +45,93 @@ def compute_feature_similarity(track_payload: Mapping[str, float], preferences:
     return 1.0 / (1.0 + distance)
 
 
+def quantize_features(values: np.ndarray, dtype: str) -> tuple[np.ndarray, float, float]:
+    """
+    Store [0, 1] feature values as float32, float16 or uint8.
+
+    Returns ``(array, scale, max_error)``: dequantize with ``array * scale``;
+    ``max_error`` is the largest absolute dequantization error measured on
+    ``values`` (at most 0.5/255 for uint8, 2**-12 for float16).
+    """
+    if dtype not in FEATURE_DTYPES:
+        raise ValueError(f"Unsupported feature dtype: {dtype}")
+    values = np.clip(np.asarray(values, dtype=np.float32), 0.0, 1.0)
+
+    if dtype == "uint8":
+        scale = 1.0 / 255.0
+        quantized = np.rint(values * 255.0).astype(np.uint8)
+    else:
+        scale = 1.0
+        quantized = values.astype(dtype)
+
+    error = float(np.max(np.abs(quantized.astype(np.float32) * np.float32(scale) - values), initial=0.0))
+    return quantized, scale, error
+
+
+def preference_vector(preferences: Mapping[str, float]) -> tuple[np.ndarray, np.ndarray]:
+    """Preferences as a (values, mask) pair in NUMERIC_FEATURES order."""
+    values = np.zeros(len(NUMERIC_FEATURES), dtype=np.float32)
+    mask = np.zeros(len(NUMERIC_FEATURES), dtype=bool)
+    for i, feature in enumerate(NUMERIC_FEATURES):
+        value = preferences.get(feature)
+        if value is None:
+            continue
+        values[i] = float(value)
+        mask[i] = True
+    return values, mask
+
+
+def _feature_diffs(block: np.ndarray, target: np.ndarray, scale: float) -> tuple[np.ndarray, float]:
+    """
+    Absolute per-feature differences for one block, in the block's own units.
+
+    Integer (quantized) blocks stay in integer arithmetic: the target is
+    snapped to the same grid, so no dequantized copy of the block is made.
+    Returns ``(diffs, unit)`` where ``diffs * unit`` is in feature units.
+    """
+    if np.issubdtype(block.dtype, np.integer):
+        target_q = np.rint(target / scale).astype(np.int16)
+        return np.abs(block.astype(np.int16) - target_q), scale
+    return np.abs(block.astype(np.float32, copy=False) - target), 1.0
+
+
+def feature_similarity_rows(
+    features: np.ndarray,
+    preferences: Mapping[str, float],
+    scale: float = 1.0,
+) -> np.ndarray:
+    """
+    Vectorized ``RecommendationService._feature_similarity`` over catalog rows.
+
+    Mean of ``1 - |track - pref|`` across the preferred features. Works on
+    float or quantized ``features`` directly; on uint8 data the result is
+    within 1/255 of the float computation.
+    """
+    target, mask = preference_vector(preferences)
+    return masked_feature_similarity(features, target, mask, scale)
+
+
+def masked_feature_similarity(
+    features: np.ndarray,
+    target: np.ndarray,
+    mask: np.ndarray,
+    scale: float = 1.0,
+) -> np.ndarray:
+    """``feature_similarity_rows`` for a preference already split by ``preference_vector``."""
+    out = np.zeros(features.shape[0], dtype=np.float32)
+    used = int(mask.sum())
+    if used == 0:
+        return out
+
+    target = target[mask]
+    for start in range(0, features.shape[0], SCORING_BLOCK_ROWS):
+        block = features[start : start + SCORING_BLOCK_ROWS][:, mask]
+        diffs, unit = _feature_diffs(block, target, scale)
+        total = diffs.sum(axis=1, dtype=np.float32) * np.float32(unit)
+        out[start : start + block.shape[0]] = 1.0 - total / used
+    return out
+
+
 def score_search_result(track_payload: Mapping[str, object], query_norm: str, top_genres: Iterable[str]) -> float:
     track_name = str(track_payload.get("track_name") or "")
     track_name_lower = track_name.lower()
@@ -1,6 +1,8 @@
 from __future__ import annotations
 
+from dataclasses import fields as dataclass_fields
 from datetime import datetime
+from typing import Any, Iterable
 
 
 def to_iso(dt: datetime | None) -> str | None:
@@ -9,3 +11,57 @@ def to_iso(dt: datetime | None) -> str | None:
     if isinstance(dt, datetime):
         return dt.isoformat()
     return str(dt)
+
+
+def _copy_expr(annotation: Any, attr: str) -> str:
+    """Source for one field's value: containers are copied one level (their items are scalars)."""
+    text = annotation if isinstance(annotation, str) else getattr(annotation, "__name__", "")
+    if text.startswith("list["):
+        return f"list({attr})"
+    if text.startswith("dict["):
+        return f"dict({attr})"
+    return attr
+
+
+def compiled_to_dict(cls: type) -> type:
+    """
+    Class decorator for flat dataclasses: generates ``to_dict(fields=None)``
+    as a single dict literal instead of ``dataclasses.asdict``'s recursive
+    deep copy. ``fields`` picks a subset of keys, in the given order, for
+    sparse responses.
+    """
+    exprs = {f.name: _copy_expr(f.type, f"self.{f.name}") for f in dataclass_fields(cls)}
+    body = ", ".join(f"{name!r}: {expr}" for name, expr in exprs.items())
+    getters = ", ".join(f"{name!r}: lambda self: {expr}" for name, expr in exprs.items())
+    source = (
+        f"def to_dict(self, fields=None):\n"
+        f"    if fields is None:\n"
+        f"        return {{{body}}}\n"
+        f"    return {{name: _GETTERS[name](self) for name in fields}}\n"
+        f"_GETTERS = {{{getters}}}\n"
+    )
+    namespace: dict[str, Any] = {}
+    exec(compile(source, f"<{cls.__name__}.to_dict>", "exec"), namespace)
+    to_dict = namespace["to_dict"]
+    to_dict.__qualname__ = f"{cls.__name__}.to_dict"
+    to_dict.__doc__ = f"Plain-dict form of {cls.__name__}; ``fields`` limits it to those keys."
+    cls.to_dict = to_dict
+    cls.FIELD_NAMES = tuple(exprs)
+    return cls
+
+
+def parse_fields(raw: str | None, allowed: Iterable[str]) -> tuple[str, ...] | None:
+    """
+    ``?fields=a,b,c`` as a tuple of field names, or None when absent (all fields).
+
+    Raises:
+        ValueError naming any unknown field.
+    """
+    names = tuple(dict.fromkeys(name.strip() for name in (raw or "").split(",") if name.strip()))
+    if not names:
+        return None
+    allowed = set(allowed)
+    unknown = [name for name in names if name not in allowed]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    return names
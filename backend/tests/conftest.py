@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+from typing import Any
+
+import pytest
+from firebase_admin import firestore
+
+
+class FakeSnapshot:
+    def __init__(self, reference: "FakeDocument", data: dict[str, Any] | None) -> None:
+        self.reference = reference
+        self.id = reference.id
+        self.exists = data is not None
+        self._data = data
+
+    def to_dict(self) -> dict[str, Any] | None:
+        return dict(self._data) if self._data is not None else None
+
+
+class FakeDocument:
+    def __init__(self, db: "FakeFirestore", path: str) -> None:
+        self.db = db
+        self.path = path
+        self.id = path.rsplit("/", 1)[-1]
+
+    def collection(self, name: str) -> "FakeQuery":
+        return FakeQuery(self.db, f"{self.path}/{name}")
+
+    def get(self, transaction=None, field_paths=None) -> FakeSnapshot:
+        self.db.reads += 1
+        data = self.db.docs.get(self.path)
+        if data is not None and field_paths is not None:
+            data = {k: v for k, v in data.items() if k in field_paths}
+        return FakeSnapshot(self, data)
+
+    def set(self, data: dict[str, Any], merge: bool = False) -> None:
+        base = self.db.docs.get(self.path, {}) if merge else {}
+        self.db.docs[self.path] = {**base, **data}
+
+    def update(self, data: dict[str, Any]) -> None:
+        if self.path not in self.db.docs:
+            raise KeyError(self.path)
+        self.db.docs[self.path].update(data)
+
+    def delete(self) -> None:
+        self.db.docs.pop(self.path, None)
+
+
+class FakeQuery:
+    """Collection reference and query in one; supports what the services use."""
+
+    def __init__(self, db: "FakeFirestore", path: str, filters=(), order=None, limit=None, after=None) -> None:
+        self.db = db
+        self.path = path
+        self._filters = filters
+        self._order = order
+        self._limit = limit
+        self._after = after
+
+    def _with(self, **changes) -> "FakeQuery":
+        state = dict(filters=self._filters, order=self._order, limit=self._limit, after=self._after)
+        state.update(changes)
+        return FakeQuery(self.db, self.path, **state)
+
+    def document(self, doc_id: str) -> FakeDocument:
+        return FakeDocument(self.db, f"{self.path}/{doc_id}")
+
+    def where(self, field: str, op: str, value) -> "FakeQuery":
+        return self._with(filters=self._filters + ((field, op, value),))
+
+    def order_by(self, field: str, direction: str = "ASCENDING") -> "FakeQuery":
+        return self._with(order=(field, direction))
+
+    def limit(self, count: int) -> "FakeQuery":
+        return self._with(limit=count)
+
+    def start_after(self, snapshot: FakeSnapshot) -> "FakeQuery":
+        return self._with(after=snapshot)
+
+    def select(self, _fields) -> "FakeQuery":
+        return self
+
+    def stream(self):
+        ops = {"<": lambda a, b: a < b, "<=": lambda a, b: a <= b, ">=": lambda a, b: a >= b, "==": lambda a, b: a == b}
+        prefix = self.path + "/"
+        docs = [
+            FakeDocument(self.db, path)
+            for path in self.db.docs
+            if path.startswith(prefix) and "/" not in path[len(prefix):]
+        ]
+        docs = [
+            d for d in docs
+            if all(f in self.db.docs[d.path] and ops[op](self.db.docs[d.path][f], v) for f, op, v in self._filters)
+        ]
+        if self._order is not None:
+            field, direction = self._order
+
+            def key(doc):
+                return doc.id if field == "__name__" else self.db.docs[doc.path].get(field)
+
+            docs.sort(key=key, reverse=direction == firestore.Query.DESCENDING)
+        if self._after is not None:
+            ids = [d.id for d in docs]
+            docs = docs[ids.index(self._after.id) + 1:]
+        if self._limit is not None:
+            docs = docs[: self._limit]
+        return iter([d.get() for d in docs])
+
+
+class FakeTransaction:
+    def set(self, ref: FakeDocument, data: dict[str, Any], merge: bool = False) -> None:
+        ref.set(data, merge=merge)
+
+    def update(self, ref: FakeDocument, data: dict[str, Any]) -> None:
+        ref.update(data)
+
+    def delete(self, ref: FakeDocument) -> None:
+        ref.delete()
+
+
+class FakeBatch(FakeTransaction):
+    def commit(self) -> None:
+        pass
+
+
+class FakeFirestore:
+    """Dict-backed stand-in for the Firestore client; transactions apply writes immediately."""
+
+    def __init__(self) -> None:
+        self.docs: dict[str, dict[str, Any]] = {}
+        self.reads = 0
+
+    def collection(self, name: str) -> FakeQuery:
+        return FakeQuery(self, name)
+
+    def transaction(self) -> FakeTransaction:
+        return FakeTransaction()
+
+    def batch(self) -> FakeBatch:
+        return FakeBatch()
+
+    def get_all(self, refs, field_paths=None, transaction=None):
+        return [ref.get(field_paths=field_paths) for ref in refs]
+
+
+@pytest.fixture
+def fake_db(monkeypatch) -> FakeFirestore:
+    """A FakeFirestore, with ``firestore.transactional`` reduced to a plain call."""
+    monkeypatch.setattr(firestore, "transactional", lambda fn: fn)
+    return FakeFirestore()
@@ -0,0 +1,51 @@
+import random
+from collections import Counter
+
+import numpy as np
+
+from app.utils.alias import AliasTable, GroupedAliasSampler
+
+
+def test_draws_follow_the_weights():
+    weights = np.array([5.0, 0.0, 1.0, 3.0, 1.0])
+    table = AliasTable(weights)
+    rng = random.Random(1)
+    draws = 200_000
+    counts = Counter(table.draw(rng) for _ in range(draws))
+
+    expected = weights / weights.sum() * draws
+    observed = np.array([counts[i] for i in range(len(weights))])
+    assert observed[1] == 0
+    nonzero = expected > 0
+    chi2 = (((observed - expected)[nonzero] ** 2) / expected[nonzero]).sum()
+    assert chi2 < 18.5  # p = 0.001 at 3 degrees of freedom
+
+
+def test_degenerate_weights_draw_uniformly():
+    table = AliasTable(np.zeros(4))
+    rng = random.Random(2)
+    counts = Counter(table.draw(rng) for _ in range(40_000))
+    assert set(counts) == {0, 1, 2, 3}
+    assert max(counts.values()) - min(counts.values()) < 800
+
+
+def test_grouped_sampler_spreads_across_groups_without_repeats():
+    rows = np.arange(40)
+    groups = rows % 4
+    sampler = GroupedAliasSampler(rows, np.ones(40), groups)
+    assert len(sampler) == 40
+
+    picked = sampler.sample(8, rng=random.Random(3))
+    assert len(set(picked)) == 8
+    assert Counter(row % 4 for row in picked) == {0: 2, 1: 2, 2: 2, 3: 2}
+
+
+def test_grouped_sampler_redraws_rejected_rows_and_gives_up_on_empty_groups():
+    rows = np.arange(30)
+    groups = rows // 10
+    weights = np.where(rows % 10 == 0, 100.0, 1.0)  # the rejected rows dominate each group
+    sampler = GroupedAliasSampler(rows, weights, groups)
+
+    accepted = sampler.sample(12, accept=lambda row: row % 10 != 0 and row < 20, max_rejections=64, rng=random.Random(4))
+    assert len(accepted) == 12
+    assert all(row % 10 != 0 and row < 20 for row in accepted)
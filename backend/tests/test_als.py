@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+
+from app.utils.als import build_interactions, fold_in_user, swipe_signals, train_implicit_als
+
+REG, ALPHA, DISLIKE_WEIGHT = 0.1, 20.0, 0.5
+
+
+@pytest.fixture(scope="module")
+def interactions():
+    rng = np.random.default_rng(9)
+    user_swipes = []
+    for u in range(60):
+        tracks = rng.choice(200, size=25, replace=False)
+        user_swipes.append((f"u{u}", [(f"t{t:03d}", bool(rng.random() < 0.6)) for t in tracks]))
+    return build_interactions(user_swipes)
+
+
+def test_repeated_swipes_collapse_to_one_interaction():
+    usernames, track_ids, user_idx, item_idx, liked = build_interactions(
+        [("a", [("x", False), ("y", True), ("x", True)]), ("empty", []), ("b", [("y", False)])]
+    )
+    assert usernames == ["a", "b"]
+    assert track_ids.tolist() == [b"x", b"y"]
+    pairs = {(usernames[u], track_ids[i].decode(), bool(l)) for u, i, l in zip(user_idx, item_idx, liked)}
+    assert pairs == {("a", "x", True), ("a", "y", True), ("b", "y", False)}
+
+
+def test_fold_in_reproduces_the_trained_user_vectors(interactions):
+    usernames, track_ids, user_idx, item_idx, liked = interactions
+    args = (user_idx, item_idx, liked, len(usernames), len(track_ids))
+    options = dict(factors=8, reg=REG, alpha=ALPHA, dislike_weight=DISLIKE_WEIGHT)
+    # The third iteration solves users against the item factors left by the second
+    _, items = train_implicit_als(*args, iterations=2, **options)
+    users, _ = train_implicit_als(*args, iterations=3, **options)
+    gram = items.T @ items
+
+    for u in range(len(usernames)):
+        mine = user_idx == u
+        folded = fold_in_user(items, gram, item_idx[mine], liked[mine], REG, ALPHA, DISLIKE_WEIGHT)
+        assert np.allclose(folded, users[u], rtol=1e-3, atol=1e-3)
+
+
+def test_fold_in_is_the_weighted_least_squares_solution(interactions):
+    _, track_ids, _, _, _ = interactions
+    rng = np.random.default_rng(1)
+    items = rng.standard_normal((len(track_ids), 6)).astype(np.float32)
+    rows = np.array([3, 17, 42, 99])
+    liked = np.array([True, False, True, True])
+
+    confidence, preference = swipe_signals(liked, ALPHA, DISLIKE_WEIGHT)
+    c = np.ones(len(track_ids))
+    p = np.zeros(len(track_ids))
+    c[rows], p[rows] = confidence, preference
+    a = items.T @ (c[:, None] * items) + REG * np.eye(6)
+    expected = np.linalg.solve(a, items.T @ (c * p))
+
+    folded = fold_in_user(items, items.T @ items, rows, liked, REG, ALPHA, DISLIKE_WEIGHT)
+    assert np.allclose(folded, expected, atol=1e-4)
+    assert not fold_in_user(items, items.T @ items, rows[:0], liked[:0], REG, ALPHA, DISLIKE_WEIGHT).any()
@@ -0,0 +1,64 @@
+import json
+
+import numpy as np
+import pytest
+
+from app.services.catalog_service import CatalogSnapshot, attach_catalog, publish_catalog, unlink_segment
+from test_scoring_service import catalog_of, random_tracks
+
+
+@pytest.fixture
+def manifest(tmp_path):
+    path = tmp_path / "catalog.json"
+    yield str(path)
+    if path.exists():
+        unlink_segment(json.loads(path.read_text())["segment"])
+
+
+@pytest.fixture(scope="module")
+def snapshot() -> CatalogSnapshot:
+    return catalog_of(random_tracks(500, seed=21), "uint8")
+
+
+def assert_same_catalog(left: CatalogSnapshot, right: CatalogSnapshot) -> None:
+    assert left.arrays.keys() == right.arrays.keys()
+    for name, array in left.arrays.items():
+        assert np.array_equal(array, right.arrays[name]), name
+    assert {k: v for k, v in left.meta.items() if k != "version"} == right.meta
+
+
+def test_attached_catalog_is_a_read_only_copy(snapshot, manifest):
+    assert attach_catalog(manifest) is None
+    assert publish_catalog(snapshot, manifest) == 1
+
+    attached, segment = attach_catalog(manifest)
+    assert attached.version == 1
+    assert_same_catalog(attached, snapshot)
+    assert attached.track_id_at(7) == snapshot.track_id_at(7)
+    with pytest.raises(ValueError):
+        attached.features[0, 0] = 1
+    del attached, segment
+
+
+def test_republishing_swaps_versions_without_breaking_open_views(snapshot, manifest):
+    publish_catalog(snapshot, manifest)
+    old, old_segment = attach_catalog(manifest)
+
+    rows = np.arange(len(snapshot))
+    graph = snapshot.with_graph("knn", np.stack([(rows + 1) % len(rows)] * 3, axis=1), np.ones((len(rows), 3)))
+    assert publish_catalog(graph, manifest) == 2
+
+    new, new_segment = attach_catalog(manifest)
+    assert new.version == 2 and new.has_graph() and not old.has_graph()
+    assert new.neighbours(4)[0].tolist() == [5, 5, 5]
+    # The first segment is unlinked but this view still maps it
+    assert_same_catalog(old, snapshot)
+    del old, old_segment, new, new_segment
+
+
+def test_snapshots_round_trip_through_disk(snapshot, tmp_path):
+    path = str(tmp_path / "catalog.npz")
+    snapshot.save(path)
+    loaded = CatalogSnapshot.load(path)
+    assert loaded.version == snapshot.version
+    assert_same_catalog(loaded, snapshot)
@@ -0,0 +1,85 @@
+import gzip
+from types import SimpleNamespace
+
+import pytest
+from flask import Blueprint, Flask, Response, jsonify
+
+from app import http_middleware
+from app.http_middleware import init_http_middleware
+
+BIG = {"rows": ["x" * 40] * 100}
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(http_middleware, "get_catalog", lambda: SimpleNamespace(version=7))
+    calls = []
+
+    tracks = Blueprint("tracks", __name__, url_prefix="/api/tracks")
+    search = Blueprint("search", __name__, url_prefix="/api/songs")
+    other = Blueprint("other", __name__, url_prefix="/api/other")
+
+    @tracks.get("/<track_id>/similar")
+    def similar(track_id):
+        calls.append(track_id)
+        return jsonify(BIG)
+
+    @tracks.get("/enriched")
+    def get_enriched_track():
+        return jsonify({"preview": "p"})
+
+    @search.get("/search")
+    def search_songs():
+        return jsonify(BIG)
+
+    @other.get("/stream")
+    def stream():
+        return Response(iter(["a" * 2000]), mimetype="text/plain")
+
+    app = Flask(__name__)
+    for blueprint in (tracks, search, other):
+        app.register_blueprint(blueprint)
+    init_http_middleware(app)
+    client = app.test_client()
+    client.calls = calls
+    return client
+
+
+def test_catalog_etag_answers_304_before_the_view_runs(client):
+    first = client.get("/api/tracks/a/similar")
+    assert first.headers["ETag"] == 'W/"catalog-7"'
+    assert first.headers["Cache-Control"].startswith("public")
+
+    again = client.get("/api/tracks/a/similar", headers={"If-None-Match": first.headers["ETag"]})
+    assert again.status_code == 304
+    assert client.calls == ["a"]
+
+
+def test_enrichment_is_private_with_a_body_etag(client):
+    first = client.get("/api/tracks/enriched")
+    assert first.headers["Cache-Control"] == "private, no-cache"
+    assert "catalog" not in first.headers["ETag"]
+    again = client.get("/api/tracks/enriched", headers={"If-None-Match": first.headers["ETag"]})
+    assert again.status_code == 304
+
+
+def test_search_is_never_cached(client):
+    response = client.get("/api/songs/search")
+    assert response.headers["Cache-Control"] == "no-store"
+    assert "ETag" not in response.headers
+
+
+def test_large_bodies_are_gzipped_when_accepted(client):
+    plain = client.get("/api/songs/search")
+    assert "Content-Encoding" not in plain.headers
+
+    compressed = client.get("/api/songs/search", headers={"Accept-Encoding": "gzip"})
+    assert compressed.headers["Content-Encoding"] == "gzip"
+    assert "Accept-Encoding" in compressed.headers["Vary"]
+    assert gzip.decompress(compressed.data) == plain.data
+
+
+def test_streamed_responses_are_left_alone(client):
+    response = client.get("/api/other/stream", headers={"Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in response.headers
+    assert response.data == b"a" * 2000
@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+
+from app.services.catalog_service import BRUTE_FORCE_ROWS
+from app.utils.kdtree import KDTree, build_kdtree
+from test_scoring_service import GENRES, catalog_of, random_tracks
+
+
+@pytest.fixture(scope="module")
+def catalog():
+    # Every genre slice is larger than BRUTE_FORCE_ROWS so filtered queries go through the tree too
+    tracks = random_tracks(len(GENRES) * (BRUTE_FORCE_ROWS + 500), seed=13)
+    return catalog_of(tracks, "float32")
+
+
+def brute_force(points: np.ndarray, target: np.ndarray, candidates: np.ndarray, k: int):
+    distances = np.sqrt(((points[candidates] - target) ** 2).sum(axis=1))
+    order = np.argsort(distances, kind="stable")[:k]
+    return candidates[order], distances[order]
+
+
+def test_tree_query_matches_brute_force():
+    rng = np.random.default_rng(2)
+    points = rng.random((3000, 8), dtype=np.float32)
+    tree = KDTree(build_kdtree(points, leaf_size=32), points)
+    everything = np.arange(points.shape[0])
+
+    for target in rng.random((20, 8), dtype=np.float32):
+        rows, distances = tree.query(target, 10)
+        expected_rows, expected = brute_force(points, target, everything, 10)
+        assert rows.tolist() == expected_rows.tolist()
+        assert np.allclose(distances, expected, atol=1e-5)
+
+        odd = everything[everything % 2 == 1]
+        rows, distances = tree.query(target, 10, row_filter=lambda r: r % 2 == 1)
+        expected_rows, expected = brute_force(points, target, odd, 10)
+        assert rows.tolist() == expected_rows.tolist()
+        assert np.allclose(distances, expected, atol=1e-5)
+
+
+def test_leaves_partition_every_row():
+    points = np.random.default_rng(4).random((1000, 8), dtype=np.float32)
+    arrays = build_kdtree(points, leaf_size=64)
+    assert sorted(arrays["kd_perm"].tolist()) == list(range(1000))
+    assert (arrays["kd_leaf_end"] - arrays["kd_leaf_start"]).max() <= 64
+
+
+@pytest.mark.parametrize("genres", [None, ["rock"], ["jazz", "metal"]])
+def test_catalog_neighbours_match_brute_force(catalog, genres):
+    points = catalog.dequantized_features()
+    allowed = np.ones(len(catalog), dtype=bool)
+    if genres:
+        codes = [catalog.genre_code(g) for g in genres]
+        groups = [catalog.genre_group_code(g) for g in genres]
+        allowed = np.isin(catalog.genre_codes, codes) | np.isin(catalog.genre_group_codes, groups)
+
+    for row in (0, 1234, len(catalog) - 1):
+        rows, similarity = catalog.nearest_rows(row, 15, genres)
+        candidates = np.flatnonzero(allowed & (np.arange(len(catalog)) != row))
+        expected_rows, distances = brute_force(points, points[row], candidates, 15)
+        assert rows.tolist() == expected_rows.tolist()
+        assert np.allclose(similarity, 1.0 / (1.0 + distances), atol=1e-5)
@@ -0,0 +1,33 @@
+import numpy as np
+
+from app.utils.knn import build_knn_graph, knn_block
+
+
+def brute_force(points: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+    d = np.sqrt(((points[:, None, :] - points[None, :, :]) ** 2).sum(axis=2))
+    np.fill_diagonal(d, np.inf)
+    order = np.argsort(d, axis=1, kind="stable")[:, :k]
+    return order, np.take_along_axis(d, order, axis=1)
+
+
+def test_blocks_match_brute_force_across_column_blocks():
+    points = np.random.default_rng(6).random((700, 8), dtype=np.float32)
+    expected_idx, expected_dist = brute_force(points, 12)
+
+    idx, dist = knn_block(points, 100, 300, 12, col_block=64)
+    assert idx.tolist() == expected_idx[100:300].tolist()
+    assert np.allclose(dist, expected_dist[100:300], atol=1e-3)
+
+
+def test_graph_lists_no_self_edges_and_caps_k():
+    points = np.random.default_rng(8).random((300, 8), dtype=np.float32)
+    expected_idx, expected_dist = brute_force(points, 5)
+
+    indices, scores = build_knn_graph(points, 5, workers=1, row_block=64, col_block=128)
+    assert indices.dtype == np.int32 and scores.dtype == np.float16
+    assert indices.tolist() == expected_idx.tolist()
+    assert np.allclose(scores, 1.0 / (1.0 + expected_dist), atol=1e-3)
+
+    indices, _ = build_knn_graph(points[:4], 10, workers=1)
+    assert indices.shape == (4, 3)
+    assert all(row not in indices[row] for row in range(4))
@@ -0,0 +1,176 @@
+import itertools
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.models import LibraryAggregates, Track
+from app.models.personality import AGGREGATE_TOP_TRACKS, REPRESENTATIVE_TRACKS
+from app.services import library_service as library_module
+from app.services.library_service import LibraryService
+from app.services.track_service import TrackService
+
+AGGREGATES_PATH = "users/mo/analytics/library_aggregates"
+
+
+def make_track(i: int, popularity: float) -> Track:
+    return Track(track_id=f"t{i:03d}", track_name=f"Song {i}", popularity_norm=popularity, energy=0.5)
+
+
+@pytest.fixture
+def service(fake_db, monkeypatch) -> LibraryService:
+    start = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    clock = itertools.count()
+    monkeypatch.setattr(library_module, "server_timestamp", lambda: start + timedelta(seconds=next(clock)))
+
+    service = LibraryService.__new__(LibraryService)
+    service.db = fake_db
+    service.track_service = TrackService.__new__(TrackService)
+    service.track_service.db = fake_db
+    for i in range(60):
+        track = make_track(i, popularity=round(i / 60, 4))
+        fake_db.docs[f"tracks/{track.track_id}"] = {k: v for k, v in track.to_dict().items() if v is not None}
+    return service
+
+
+def library_ids(fake_db) -> set[str]:
+    prefix = "users/mo/library/"
+    return {path[len(prefix):] for path in fake_db.docs if path.startswith(prefix)}
+
+
+# ---------- aggregates ----------
+
+
+def test_top_tracks_refilled_after_removals_are_not_trusted():
+    aggregates = LibraryAggregates()
+    for i in range(40):
+        aggregates.add(make_track(i, popularity=i / 40))
+    assert not aggregates.needs_rebuild
+
+    # Drop the whole top list, then add tracks less popular than the ones left out of it
+    for _, track_id in list(aggregates.top_tracks):
+        aggregates.remove(make_track(int(track_id[1:]), popularity=0.0))
+    for i in range(100, 100 + AGGREGATE_TOP_TRACKS):
+        aggregates.add(make_track(i, popularity=0.01))
+
+    assert len(aggregates.top_tracks) == AGGREGATE_TOP_TRACKS
+    assert aggregates.exact_top_tracks < REPRESENTATIVE_TRACKS
+    assert aggregates.needs_rebuild
+
+
+def test_aggregates_round_trip_and_legacy_docs_rebuild():
+    aggregates = LibraryAggregates()
+    for i in range(30):
+        aggregates.add(make_track(i, popularity=i / 30))
+    restored = LibraryAggregates.from_mapping(aggregates.to_dict())
+    assert restored.top_cutoff == aggregates.top_cutoff
+    assert not restored.needs_rebuild
+
+    legacy = aggregates.to_dict()
+    del legacy["top_cutoff"]
+    assert LibraryAggregates.from_mapping(legacy).needs_rebuild
+
+
+def test_rebuild_restores_the_true_top_tracks(service, fake_db):
+    for i in range(40):
+        service.add_to_library("mo", f"t{i:03d}")
+    service.get_library_aggregates("mo")  # first read builds the doc
+
+    for i in range(39, 39 - AGGREGATE_TOP_TRACKS, -1):
+        service.remove_from_library("mo", f"t{i:03d}")
+    for i in range(40, 46):
+        fake_db.docs[f"tracks/t{i:03d}"]["popularity_norm"] = 0.0
+        service.add_to_library("mo", f"t{i:03d}")
+
+    aggregates = service.get_library_aggregates("mo")
+    assert aggregates.top_track_ids() == [f"t{i:03d}" for i in range(15, 9, -1)]
+    assert aggregates.track_count == 22
+
+
+def test_write_while_aggregates_are_missing_invalidates_a_concurrent_rebuild(service, fake_db, monkeypatch):
+    for i in range(3):
+        service.add_to_library("mo", f"t{i:03d}")
+    assert fake_db.docs[AGGREGATES_PATH]["stale"]
+
+    iter_library_tracks = service.iter_library_tracks
+    raced = []
+
+    def racing_iter(username, *args, **kwargs):
+        tracks = list(iter_library_tracks(username, *args, **kwargs))
+        if not raced:
+            raced.append(True)
+            service.add_to_library("mo", "t010")  # lands after the rebuild read the library
+        return iter(tracks)
+
+    monkeypatch.setattr(service, "iter_library_tracks", racing_iter)
+    aggregates = service.get_library_aggregates("mo")
+    assert aggregates.track_count == 4
+    assert fake_db.docs[AGGREGATES_PATH]["track_count"] == 4
+    assert not fake_db.docs[AGGREGATES_PATH]["stale"]
+
+
+# ---------- bulk updates ----------
+
+
+def test_bulk_update_reports_a_status_per_id(service, fake_db):
+    service.add_to_library("mo", "t001")
+    service.add_to_library("mo", "t002")
+    service.get_library_aggregates("mo")
+
+    statuses = service.bulk_update_library(
+        "mo",
+        add_ids=["t003", "t001", "missing", "t005", "t003"],
+        remove_ids=["t002", "t004", "t005"],
+    )
+
+    assert statuses == [
+        {"trackId": "t003", "op": "add", "status": "added"},
+        {"trackId": "t001", "op": "add", "status": "already_in_library"},
+        {"trackId": "missing", "op": "add", "status": "not_found"},
+        {"trackId": "t005", "op": "add", "status": "conflict"},
+        {"trackId": "t002", "op": "remove", "status": "removed"},
+        {"trackId": "t004", "op": "remove", "status": "not_in_library"},
+        {"trackId": "t005", "op": "remove", "status": "conflict"},
+    ]
+    assert library_ids(fake_db) == {"t001", "t003"}
+    aggregates = LibraryAggregates.from_mapping(fake_db.docs[AGGREGATES_PATH])
+    assert aggregates.track_count == 2
+    assert aggregates.fingerprint == service.rebuild_library_aggregates("mo").fingerprint
+
+
+def test_bulk_update_rejects_oversized_requests(service):
+    with pytest.raises(ValueError):
+        service.bulk_update_library(
+            "mo", add_ids=[f"x{i}" for i in range(library_module.MAX_BULK_IDS + 1)], remove_ids=[]
+        )
+
+
+# ---------- paging and validators ----------
+
+
+def test_pages_walk_the_library_newest_first(service):
+    for i in range(7):
+        service.add_to_library("mo", f"t{i:03d}")
+
+    seen, cursor = [], None
+    while True:
+        tracks, cursor = service.get_library_page("mo", limit=3, after=cursor)
+        seen.extend(t.track_id for t in tracks)
+        if cursor is None:
+            break
+    assert seen == [f"t{i:03d}" for i in range(6, -1, -1)]
+
+    with pytest.raises(ValueError):
+        service.get_library_page("mo", limit=3, after="t050")
+
+
+def test_library_etag_follows_the_contents(service):
+    service.add_to_library("mo", "t001")
+    first = service.library_etag("mo")
+    assert service.library_etag("mo") == first
+
+    service.add_to_library("mo", "t002")
+    second = service.library_etag("mo")
+    assert second != first
+
+    service.add_to_library("mo", "t001")  # re-adding moves it to the front
+    assert service.library_etag("mo") != second
@@ -0,0 +1,56 @@
+from types import SimpleNamespace
+
+from app.models import PersonalityMetrics, Track
+from app.services.llm_governor import LLMGovernor, prompt_key
+from app.services.personality_service import PersonalityService, _is_json_object
+
+
+class FakeClient:
+    def __init__(self) -> None:
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def with_options(self, **_options):
+        return self
+
+    def _create(self, **_kwargs):
+        self.calls += 1
+        message = SimpleNamespace(content='{"shortDescription": "hi"}')
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+
+def _messages_for(username: str) -> list[dict[str, str]]:
+    service = PersonalityService.__new__(PersonalityService)  # prompt building needs no Firestore
+    return service._llm_messages(
+        username=username,
+        metrics=PersonalityMetrics(
+            avg_energy=0.7,
+            avg_valence=0.4,
+            avg_popularity_norm=0.8,
+            genre_diversity=0.5,
+            top_genres=["pop", "indie"],
+        ),
+        archetype_id="neon_night_drifter",
+        title="Neon Night Drifter",
+        base_short="short",
+        base_long="long",
+        representative_tracks=[Track(track_id="t1", track_name="Song", artists=["Artist"])],
+    )
+
+
+def test_prompt_leaves_out_username():
+    alice, bob = _messages_for("alice"), _messages_for("bob")
+    assert "alice" not in alice[1]["content"]
+    assert prompt_key("gpt-4o-mini", 0.8, alice) == prompt_key("gpt-4o-mini", 0.8, bob)
+
+
+def test_identical_inputs_hit_the_cache_across_users():
+    governor = LLMGovernor(max_in_flight=2, timeout=5)
+    client = FakeClient()
+
+    first = governor.complete(client, _messages_for("alice"), validate=_is_json_object)
+    second = governor.complete(client, _messages_for("bob"), validate=_is_json_object)
+
+    assert first == second
+    assert client.calls == 1
+    assert governor.stats()["cacheHits"] == 1
@@ -0,0 +1,74 @@
+from app.models import MatchSession
+from app.models.user import UserProfile
+from app.services.recommendation_service import RecommendationService
+from app.services.rerank_service import RerankService, _get_pool
+from app.services.scoring_service import ScoringRequest, score_batch
+from app.services.user_service import UserService
+
+from test_scoring_service import catalog_of, random_tracks
+
+
+def rerank_service() -> RerankService:
+    service = RerankService.__new__(RerankService)  # ranking needs no Firestore
+    service.recommendation_service = RecommendationService.__new__(RecommendationService)
+    service.user_service = UserService.__new__(UserService)
+    return service
+
+
+def profile() -> UserProfile:
+    return UserProfile(
+        username="mo",
+        likes_count=4,
+        dislikes_count=2,
+        liked_genres={"rock": 3, "jazz": 1},
+        feature_sums_liked={"energy": 3.2, "valence": 1.0, "danceability": 2.4},
+        feature_sums_disliked={"energy": 0.4, "acousticness": 1.6},
+    )
+
+
+def refined_queue(service: RerankService, tracks, user: UserProfile) -> list[str]:
+    """The queue ScoringService builds for ``user``."""
+    genre_weights = service.recommendation_service._build_genre_weight_map(service.user_service.get_top_genres(user))
+    request = ScoringRequest(
+        genre_weights=genre_weights,
+        feature_preferences=service.recommendation_service.build_feature_preferences(user),
+        exclude_track_ids=set(),
+        k=60,
+    )
+    (result,) = score_batch(catalog_of(tracks, "float32"), [request])
+    return [tid for tid, _ in result]
+
+
+def test_rerank_with_unchanged_preferences_keeps_the_scored_order():
+    service = rerank_service()
+    tracks = random_tracks(1500)
+    user = profile()
+    queue = refined_queue(service, tracks, user)
+    by_id = {t.track_id: t for t in tracks}
+
+    service.start_pool("mo", "s1", [by_id[tid] for tid in reversed(queue)], user, fallback_genres=[])
+    pool = _get_pool("mo", "s1")
+    assert service._rank_remaining(pool) == queue
+
+    # Unswiped pool: the read-time view leaves the stored queue as it is
+    pool.ranked = service._rank_remaining(pool)
+    session = MatchSession(session_id="s1", username="mo", refined_track_ids=list(queue), current_index=5)
+    assert service.refined_queue("mo", session) == queue
+
+
+def test_swipe_reorders_only_the_view():
+    service = rerank_service()
+    tracks = random_tracks(1500)
+    user = profile()
+    queue = refined_queue(service, tracks, user)
+    by_id = {t.track_id: t for t in tracks}
+    service.start_pool("mo", "s2", [by_id[tid] for tid in queue], user, fallback_genres=[])
+
+    session = MatchSession(session_id="s2", username="mo", refined_track_ids=list(queue), current_index=10)
+    disliked = by_id[queue[10]]
+    assert service.observe_swipe("mo", session, disliked, liked=False)
+
+    view = service.refined_queue("mo", session)
+    assert session.refined_track_ids == queue
+    assert view[:10] == queue[:10]
+    assert sorted(view) == sorted(queue)
@@ -0,0 +1,36 @@
+import numpy as np
+import pytest
+
+from app.models import NUMERIC_FEATURES
+from app.utils.scoring import feature_similarity_rows, quantize_features
+
+
+@pytest.fixture
+def features() -> np.ndarray:
+    return np.random.default_rng(11).random((5000, len(NUMERIC_FEATURES)), dtype=np.float32)
+
+
+@pytest.mark.parametrize("dtype, bound", [("float32", 0.0), ("float16", 2.0**-12), ("uint8", 0.5 / 255)])
+def test_quantization_error_is_bounded(features, dtype, bound):
+    quantized, scale, error = quantize_features(features, dtype)
+    assert quantized.dtype == np.dtype(dtype)
+    assert error <= bound + 1e-7
+    assert np.max(np.abs(quantized.astype(np.float32) * scale - features)) == pytest.approx(error)
+
+
+def test_quantized_similarity_matches_float(features):
+    preferences = {"energy": 0.8, "valence": 0.25, "tempo_norm": 0.5}
+    exact = feature_similarity_rows(features, preferences)
+
+    for dtype, tolerance in (("float16", 2.0**-11), ("uint8", 1.0 / 255)):
+        quantized, scale, _ = quantize_features(features, dtype)
+        approx = feature_similarity_rows(quantized, preferences, scale)
+        assert np.max(np.abs(approx - exact)) <= tolerance
+
+
+def test_similarity_matches_the_per_track_definition(features):
+    preferences = {"danceability": 0.1, "speechiness": 0.9}
+    columns = [NUMERIC_FEATURES.index(f) for f in preferences]
+    expected = 1.0 - np.abs(features[:, columns] - list(preferences.values())).mean(axis=1)
+    assert np.allclose(feature_similarity_rows(features, preferences), expected, atol=1e-6)
+    assert not feature_similarity_rows(features, {}).any()
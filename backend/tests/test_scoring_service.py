@@ -0,0 +1,103 @@
+import numpy as np
+import pytest
+
+from app.models import NUMERIC_FEATURES, Track
+from app.services.catalog_service import CatalogSnapshot
+from app.services.recommendation_service import RecommendationService
+from app.services.scoring_service import ScoringRequest, score_batch
+from app.services.track_service import CANDIDATE_MIN_POPULARITY
+
+GENRES = ["pop", "rock", "jazz", "metal"]
+
+
+def random_tracks(n: int, seed: int = 7) -> list[Track]:
+    rng = np.random.default_rng(seed)
+    tracks = []
+    for i in range(n):
+        values = dict(zip(NUMERIC_FEATURES, rng.random(len(NUMERIC_FEATURES)).tolist()))
+        tracks.append(
+            Track(
+                track_id=f"t{i:05d}",
+                track_name=f"Song {i}",
+                popularity_norm=float(rng.random()),
+                track_genre=GENRES[i % len(GENRES)],
+                track_genre_group=GENRES[i % len(GENRES)] if i % 3 else None,
+                **values,
+            )
+        )
+    return tracks
+
+
+def catalog_of(tracks: list[Track], feature_dtype: str) -> CatalogSnapshot:
+    return CatalogSnapshot.from_tracks((t.to_dict() for t in tracks), feature_dtype=feature_dtype)
+
+
+def brute_force(tracks, request: ScoringRequest) -> dict[str, float]:
+    service = RecommendationService.__new__(RecommendationService)  # scoring needs no Firestore
+    return {
+        t.track_id: service._score_track(t, request.feature_preferences, request.genre_weights)
+        for t in tracks
+        if t.popularity_norm >= CANDIDATE_MIN_POPULARITY and t.track_id not in request.exclude_track_ids
+    }
+
+
+def make_requests(tracks) -> list[ScoringRequest]:
+    rng = np.random.default_rng(3)
+    requests = []
+    for j in range(5):
+        preferences = dict(zip(NUMERIC_FEATURES, rng.random(len(NUMERIC_FEATURES)).tolist()))
+        if j == 4:
+            preferences = {"energy": 0.9, "valence": 0.2}
+        requests.append(
+            ScoringRequest(
+                genre_weights={GENRES[j % 4]: 1.0, GENRES[(j + 1) % 4]: 0.5},
+                feature_preferences=preferences,
+                exclude_track_ids={t.track_id for t in tracks[j::7]},
+                k=25,
+            )
+        )
+    return requests
+
+
+def test_float32_scores_match_brute_force():
+    tracks = random_tracks(2000)
+    requests = make_requests(tracks)
+    results = score_batch(catalog_of(tracks, "float32"), requests)
+
+    for request, result in zip(requests, results):
+        expected = brute_force(tracks, request)
+        best = sorted(expected, key=expected.get, reverse=True)[: request.k]
+        assert [tid for tid, _ in result] == best
+        for tid, score in result:
+            assert score == pytest.approx(expected[tid], abs=1e-5)
+
+
+def test_uint8_scores_stay_within_quantization_error():
+    tracks = random_tracks(2000)
+    requests = make_requests(tracks)
+    results = score_batch(catalog_of(tracks, "uint8"), requests)
+    tolerance = 0.45 / 255 + 1e-5
+
+    for request, result in zip(requests, results):
+        expected = brute_force(tracks, request)
+        kth = sorted(expected.values(), reverse=True)[request.k - 1]
+        assert len(result) == request.k
+        for tid, score in result:
+            assert tid not in request.exclude_track_ids
+            assert score == pytest.approx(expected[tid], abs=tolerance)
+            assert expected[tid] >= kth - 2 * tolerance
+
+
+def test_extra_tracks_are_scored_below_the_popularity_floor():
+    tracks = random_tracks(200)
+    unpopular = next(t for t in tracks if t.popularity_norm < CANDIDATE_MIN_POPULARITY)
+    request = ScoringRequest(
+        genre_weights={"pop": 1.0},
+        feature_preferences={"energy": 0.5},
+        exclude_track_ids=set(),
+        k=5,
+        extra_track_ids=[unpopular.track_id],
+    )
+    (result,) = score_batch(catalog_of(tracks, "float32"), [request])
+    assert unpopular.track_id in dict(result)
+    assert len(result) == 6
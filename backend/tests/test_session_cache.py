@@ -0,0 +1,127 @@
+import time
+
+import pytest
+
+from app.services import session_cache as cache_module
+from app.services.session_cache import SessionCache
+
+SESSION_PATH = "users/mo/sessions/s1"
+
+
+@pytest.fixture
+def cache(fake_db, monkeypatch):
+    monkeypatch.setattr(cache_module, "_store_changes", cache_module._store_changes.to_wrap)
+    monkeypatch.setattr(cache_module, "_apply_if", cache_module._apply_if.to_wrap)
+    cache = SessionCache()
+    cache._db = lambda: fake_db
+    cache._ensure_flusher = lambda app: None
+    fake_db.docs[SESSION_PATH] = {
+        "phase": "seed",
+        "status": "active",
+        "current_index": 3,
+        "refinement_status": "ready",
+        "refined_track_ids": ["a", "b", "c"],
+        "version": 5,
+    }
+    return cache
+
+
+def _load(cache, fake_db):
+    snap = fake_db.collection("users").document("mo").collection("sessions").document("s1").get()
+    return cache.load(None, "mo", "s1", snap)
+
+
+def test_flush_writes_changed_fields_and_bumps_version(cache, fake_db):
+    entry = _load(cache, fake_db)
+    entry.session.current_index = 4
+    assert cache.commit("mo", entry.session, immediate=True)
+
+    stored = fake_db.docs[SESSION_PATH]
+    assert stored["current_index"] == 4
+    assert stored["version"] == 6
+    assert entry.session.version == 6
+    assert cache.get("mo", "s1") is entry
+
+
+def test_conflicting_flush_keeps_the_other_writers_fields(cache, fake_db):
+    entry = _load(cache, fake_db)
+    # Another worker advanced the pointer and rebuilt the queue meanwhile
+    fake_db.docs[SESSION_PATH].update({"current_index": 9, "refined_track_ids": ["x", "y"], "version": 6})
+
+    entry.session.current_index = 4
+    entry.session.status = "completed"
+    cache.commit("mo", entry.session, immediate=True)
+
+    stored = fake_db.docs[SESSION_PATH]
+    assert stored["current_index"] == 9
+    assert stored["refined_track_ids"] == ["x", "y"]
+    assert stored["status"] == "completed"
+    assert stored["version"] == 7
+    assert cache.get("mo", "s1") is None
+
+
+def test_change_made_during_a_flush_stays_dirty(cache, fake_db, monkeypatch):
+    entry = _load(cache, fake_db)
+    entry.session.current_index = 4
+    cache.commit("mo", entry.session)
+
+    store = cache_module._store_changes
+
+    def racing_store(*args):
+        # A swipe lands after the snapshot was taken
+        entry.session.current_index = 5
+        cache.commit("mo", entry.session)
+        return store(*args)
+
+    monkeypatch.setattr(cache_module, "_store_changes", racing_store)
+    cache.flush_all()
+    assert fake_db.docs[SESSION_PATH]["current_index"] == 4
+    assert entry.dirty_since is not None
+
+    monkeypatch.setattr(cache_module, "_store_changes", store)
+    cache.flush_all()
+    assert fake_db.docs[SESSION_PATH]["current_index"] == 5
+
+
+def test_reads_do_not_touch_firestore_and_the_flusher_revalidates(cache, fake_db, monkeypatch):
+    monkeypatch.setattr(cache_module, "SESSION_REVALIDATE_SECONDS", 0)
+    entry = _load(cache, fake_db)
+    reads = fake_db.reads
+    time.sleep(0.001)
+    assert cache.get("mo", "s1") is entry
+    assert fake_db.reads == reads
+
+    cache.flush_due()
+    assert cache.get("mo", "s1") is entry
+
+    fake_db.docs[SESSION_PATH]["version"] = 6
+    time.sleep(0.001)
+    cache.get("mo", "s1")
+    cache.flush_due()
+    assert cache.get("mo", "s1") is None
+
+
+def test_conditional_apply_is_skipped_once_the_cached_session_left_the_seed_phase(cache, fake_db):
+    entry = _load(cache, fake_db)
+    entry.session.phase = "refined"  # /next refined synchronously
+    assert not cache.apply("mo", "s1", {"refined_track_ids": ["bg"]}, only_if={"phase": "seed"})
+    assert entry.session.refined_track_ids == ["a", "b", "c"]
+
+
+def test_conditional_apply_is_skipped_once_the_stored_session_left_the_seed_phase(cache, fake_db):
+    fake_db.docs[SESSION_PATH]["phase"] = "refined"
+    assert not cache.apply("mo", "s1", {"refined_track_ids": ["bg"]}, only_if={"phase": "seed"})
+    assert fake_db.docs[SESSION_PATH]["refined_track_ids"] == ["a", "b", "c"]
+
+
+def test_conditional_apply_writes_while_the_condition_holds(cache, fake_db):
+    ready = {"refined_track_ids": ["bg"], "refinement_status": "ready"}
+    assert cache.apply("mo", "s1", ready, only_if={"phase": "seed"})
+    stored = fake_db.docs[SESSION_PATH]
+    assert stored["refined_track_ids"] == ["bg"]
+    assert stored["version"] == 6
+
+    entry = _load(cache, fake_db)
+    assert cache.apply("mo", "s1", {"refinement_status": "failed"}, only_if={"phase": "seed"})
+    assert entry.session.refinement_status == "failed"
+    assert entry.dirty_since is not None
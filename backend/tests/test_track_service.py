@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+
+from app.models import Track
+from app.services import track_service as track_module
+from app.services.catalog_service import CatalogSnapshot
+from app.services.track_service import CANDIDATE_MIN_POPULARITY, SEED_MIN_POPULARITY, TrackService
+
+GENRES = ["pop", "rock", "jazz", "metal", "folk"]
+
+
+def make_tracks(n: int = 600) -> list[Track]:
+    rng = np.random.default_rng(5)
+    return [
+        Track(
+            track_id=f"t{i:04d}",
+            track_name=f"Song {i}",
+            popularity_norm=float(rng.random()),
+            track_genre=GENRES[i % len(GENRES)],
+        )
+        for i in range(n)
+    ]
+
+
+@pytest.fixture
+def service(fake_db) -> TrackService:
+    service = TrackService.__new__(TrackService)
+    service.db = fake_db
+    for track in make_tracks():
+        fake_db.docs[f"tracks/{track.track_id}"] = {k: v for k, v in track.to_dict().items() if v is not None}
+    return service
+
+
+@pytest.fixture
+def with_catalog(service, fake_db, monkeypatch):
+    tracks = [Track.from_mapping(path.split("/")[1], data) for path, data in fake_db.docs.items()]
+    catalog = CatalogSnapshot.from_tracks(t.to_dict() for t in tracks)
+    monkeypatch.setattr(track_module, "get_catalog", lambda: catalog)
+    return catalog
+
+
+def test_seed_query_uses_the_seed_floor(service, monkeypatch):
+    monkeypatch.setattr(track_module, "get_catalog", lambda: None)
+    seeds = service.get_seed_tracks(exclude_track_ids=set(), limit=50)
+    assert len(seeds) == 50
+    assert min(t.popularity_norm for t in seeds) >= SEED_MIN_POPULARITY
+
+
+def test_catalog_seeds_use_the_seed_floor(service, with_catalog):
+    seeds = service.get_seed_tracks(exclude_track_ids=set(), limit=50)
+    assert len(seeds) == 50
+    assert min(t.popularity_norm for t in seeds) >= SEED_MIN_POPULARITY
+
+
+@pytest.mark.parametrize("catalog", [False, True])
+def test_candidates_respect_the_popularity_floor(service, monkeypatch, request, catalog):
+    if catalog:
+        request.getfixturevalue("with_catalog")
+    else:
+        monkeypatch.setattr(track_module, "get_catalog", lambda: None)
+
+    excluded = {"t0001", "t0006"}
+    candidates = service.get_candidate_tracks(["rock"], exclude_track_ids=excluded, limit=500)
+    above_floor = [t for t in make_tracks() if t.popularity_norm >= CANDIDATE_MIN_POPULARITY]
+
+    ids = {t.track_id for t in candidates}
+    assert ids == {t.track_id for t in above_floor} - excluded
+    rock = [t for t in candidates if t.track_genre == "rock"]
+    assert candidates[: len(rock)] == rock
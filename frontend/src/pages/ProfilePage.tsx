@@ -12,6 +12,8 @@ import { useUserId } from "../useUserId";
 
 const API_BASE = import.meta.env.VITE_API_BASE
 const CARD_HEIGHT_PX = 670; // keep both rectangles same height
+const PERSONALITY_POLL_MS = 1000;
+const PERSONALITY_POLL_ATTEMPTS = 90; // give up on a background job after ~90s
 
 type PersonalityMetrics = {
   avg_energy: number;
@@ -92,6 +94,9 @@ function ProfilePage() {
   useEffect(() => {
     if (!username) return;
 
+    // Stops the personality poll when the page unmounts or the user changes
+    const controller = new AbortController();
+
     const fetchPersonality = async () => {
       setPersonalityLoading(true);
       setPersonalityError(null);
@@ -100,19 +105,42 @@ function ProfilePage() {
           method: "POST",
           headers: { "Content-Type": "application/json" },
           body: JSON.stringify({ username }),
+          signal: controller.signal,
         });
 
         if (!res.ok) {
           throw new Error(`Personality failed (${res.status})`);
         }
 
-        const data = (await res.json()) as PersonalityResponse;
-        setPersonality(data);
+        // 200 = already computed; 202 = background job to poll
+        let data = await res.json();
+        let attempts = 0;
+        while (res.status === 202 && data.status !== "done") {
+          if (data.status === "failed") {
+            throw new Error(data.error || "Personality job failed");
+          }
+          if (++attempts > PERSONALITY_POLL_ATTEMPTS) {
+            throw new Error("Personality job timed out");
+          }
+          await new Promise((resolve) => setTimeout(resolve, PERSONALITY_POLL_MS));
+          const jobRes = await fetch(
+            `${API_BASE}/api/personality/${encodeURIComponent(data.jobId)}`,
+            { signal: controller.signal }
+          );
+          if (!jobRes.ok) {
+            throw new Error(`Personality job failed (${jobRes.status})`);
+          }
+          data = await jobRes.json();
+        }
+        setPersonality(
+          (res.status === 202 ? data.result : data) as PersonalityResponse
+        );
       } catch (err) {
+        if (controller.signal.aborted) return;
         console.error("Failed to fetch personality:", err);
         setPersonalityError("Could not load your personality yet.");
       } finally {
-        setPersonalityLoading(false);
+        if (!controller.signal.aborted) setPersonalityLoading(false);
       }
     };
 
@@ -174,6 +202,8 @@ function ProfilePage() {
 
     fetchPersonality();
     fetchLibrary();
+
+    return () => controller.abort();
   }, [username]);
 
   // Optional: remove from UI only (no backend delete wired)